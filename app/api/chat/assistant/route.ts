@@ -34,7 +34,7 @@ export async function POST(request: NextRequest) {
           
           // Call your existing lyrics analysis API
           try {
-            const analysisResponse = await fetch('http://localhost:8000/api/analyze/simple', {
+            const analysisResponse = await fetch('http://localhost:8000/api/analyze/simple?fields=complexity,energy,flow,dashboard,insights', {
               method: 'POST',
               headers: {
                 'Content-Type': 'application/json',
@@ -0,0 +1,164 @@
+"""
+Managed executor that keeps CPU-bound analysis off the asyncio event loop
+Process pool sized to the cores, preloaded workers and a bounded queue
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from metrics import collect_stages, record_stages
+
+# "process" (default), "thread", or "inline" (run on the event loop, for debugging)
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "process")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "64"))
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the analysis queue is full"""
+
+
+def preload_worker() -> None:
+    """Import the analysis dependencies once per worker instead of per request"""
+    import syllable_engine  # noqa: F401  opens the memory-mapped syllable table
+    import rhyme_engine  # noqa: F401  opens the memory-mapped rhyme key table
+    import emotion_lexicon  # noqa: F401
+
+
+def _worker_id() -> int:
+    return os.getpid()
+
+
+def _timed_call(func: Callable[..., Any], args: Sequence[Any], submitted_at: float):
+    """Run ``func`` in the worker; report how long it waited and its stage timings"""
+    wait = max(0.0, time.time() - submitted_at)
+    with collect_stages() as stages:
+        result = func(*args)
+    return wait, stages, result
+
+
+class AnalysisExecutor:
+    """Bounded async front end over a process (or thread) pool"""
+
+    def __init__(self, mode: str = ANALYSIS_EXECUTOR, max_workers: int = ANALYSIS_WORKERS,
+                 max_queue: int = ANALYSIS_QUEUE_SIZE):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Tasks allowed in flight: one per worker plus the queue"""
+        return self.max_workers + self.max_queue
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.mode == "process":
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=preload_worker)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="analysis")
+        return self._pool
+
+    def start(self) -> None:
+        """Create the pool eagerly so the first request does not pay for it"""
+        if self.mode != "inline":
+            self._get_pool()
+
+    async def warmup(self) -> int:
+        """Start every worker now, so no request pays for spawning and preloading one
+
+        One task per worker is submitted at once; the pool adds a process for
+        each task that finds no idle worker, so all of them are spawned.
+        Returns the number of distinct workers that answered.
+        """
+        if self.mode == "inline":
+            return 0
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        workers = await asyncio.gather(*(
+            loop.run_in_executor(pool, _worker_id) for _ in range(self.max_workers)
+        ))
+        return len(set(workers)) if self.mode == "process" else self.max_workers
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    async def run(self, func: Callable[..., Any], *args: Any, wait_for_slot: bool = False) -> Any:
+        """Run ``func(*args)`` in the pool and await the result
+
+        Raises ExecutorBusyError when the queue is full, unless ``wait_for_slot``
+        is set (used by callers that already bound their own concurrency).
+        """
+        if not wait_for_slot and self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ExecutorBusyError("Analysis queue is full")
+
+        self.in_flight += 1
+        try:
+            if self.mode == "inline":
+                wait, stages, result = _timed_call(func, args, time.time())
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    wait, stages, result = await loop.run_in_executor(
+                        self._get_pool(), _timed_call, func, args, time.time()
+                    )
+                except BrokenProcessPool:
+                    # A worker died; replace the pool for the next caller
+                    self._pool = None
+                    raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        record_stages({"queue": wait, **stages})
+        self.total_wait += wait
+        self.last_wait = wait
+        self.max_wait = max(self.max_wait, wait)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time figures for health endpoints"""
+        finished = self.completed
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "inFlight": self.in_flight,
+            "queueDepth": max(0, self.in_flight - self.max_workers),
+            "maxQueue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self.total_wait / finished * 1000, 3) if finished else 0.0,
+            "maxWaitMs": round(self.max_wait * 1000, 3),
+            "lastWaitMs": round(self.last_wait * 1000, 3),
+        }
+
+
+# Shared executor used by the API handlers
+analysis_executor = AnalysisExecutor()
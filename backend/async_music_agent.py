@@ -0,0 +1,387 @@
+"""
+Async Music Research Agent
+Queries Wikipedia, SongBPM and MusicBrainz concurrently within one overall deadline
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from itertools import count
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from music_agent import (
+    GPT_AVAILABLE, MUSICBRAINZ_API_URL, SONGBPM_API_URL, USER_AGENT,
+    WIKIPEDIA_API_URL, MusicProfile, MusicResearchAgent,
+)
+from outbound_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, OutboundScheduler
+from research_cache import CONFIG_ERRORS, ResearchCache, song_key
+from wikipedia_resolver import WikipediaResolver, lead_section, page_params, search_params
+
+# Seconds one source may take, all of its requests included
+RESEARCH_SOURCE_TIMEOUT = float(os.getenv("RESEARCH_SOURCE_TIMEOUT", "6"))
+# Seconds for a whole research_song call, GPT synthesis included
+RESEARCH_DEADLINE = float(os.getenv("RESEARCH_DEADLINE", "12"))
+# Part of the deadline kept for GPT synthesis; sources still running when only
+# this much is left are cut off
+RESEARCH_GPT_BUDGET = float(os.getenv("RESEARCH_GPT_BUDGET", "4"))
+# Requests each source (and GPT) may have open at once, per agent
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", "4"))
+# Songs research_many works on at once
+RESEARCH_MAX_IN_FLIGHT = int(os.getenv("RESEARCH_MAX_IN_FLIGHT", "32"))
+
+SOURCES = ("wikipedia", "songbpm", "musicbrainz")
+SOURCE_NAMES = {"wikipedia": "Wikipedia", "songbpm": "SongBPM", "musicbrainz": "MusicBrainz"}
+
+# Scheduler priority of the current task's requests; research_many() marks its songs as bulk
+_request_priority: ContextVar[int] = ContextVar("research_priority", default=PRIORITY_INTERACTIVE)
+
+
+@dataclass
+class ResearchItem:
+    """One distinct song of a research_many run and the input indices it answers"""
+    indices: List[int]
+    title: str
+    artist: str
+    profile: Optional[MusicProfile] = None
+    error: Optional[str] = None
+    cached: bool = False
+    progress: Dict[str, Any] = field(default_factory=dict)
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-ready form, as streamed by the batch research endpoint"""
+        record: Dict[str, Any] = {
+            "status": "error" if self.error is not None else "ok",
+            "indices": self.indices,
+            "title": self.title,
+            "artist": self.artist,
+            "cached": self.cached,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        else:
+            record["profile"] = asdict(self.profile)
+        record["progress"] = self.progress
+        return record
+
+
+@dataclass
+class ResearchProgress:
+    """Aggregate progress and failures of a research_many run"""
+    songs: int
+    duplicates: int = 0
+    completed: int = 0
+    failed: int = 0
+    cached: int = 0
+    no_data: int = 0
+    source_errors: Dict[str, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    def add(self, item: ResearchItem, search_results: List[Dict[str, Any]]) -> None:
+        self.completed += 1
+        if item.error is not None:
+            self.failed += 1
+            return
+        self.cached += item.cached
+        self.no_data += not item.profile.sources
+        for result in search_results:
+            error = result.get('error')
+            if error is not None and not str(error).startswith(CONFIG_ERRORS):
+                source = result.get('source', 'unknown')
+                self.source_errors[source] = self.source_errors.get(source, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "songs": self.songs,
+            "duplicates": self.duplicates,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cached": self.cached,
+            "noData": self.no_data,
+            "sourceErrors": dict(self.source_errors),
+            "elapsedMs": round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+
+class AsyncMusicResearchAgent(MusicResearchAgent):
+    """MusicResearchAgent whose sources run concurrently on one aiohttp session
+
+    Each source gets its own timeout, and the call as a whole a deadline.
+    When the deadline is reached, sources that have not answered are
+    cancelled and whatever has arrived is synthesized into the profile.
+    research_many() researches a whole playlist with bounded concurrency per
+    source. Use it as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, songbpm_api_key: Optional[str] = None, acousticbrainz_enabled: bool = True,
+                 deadline: float = RESEARCH_DEADLINE, source_timeouts: Optional[Dict[str, float]] = None,
+                 gpt_budget: float = RESEARCH_GPT_BUDGET, endpoints: Optional[Dict[str, str]] = None,
+                 cache: Optional[ResearchCache] = None, concurrency: Optional[Dict[str, int]] = None,
+                 scheduler: Optional[OutboundScheduler] = None):
+        super().__init__(songbpm_api_key, acousticbrainz_enabled, cache, scheduler)
+        self.deadline = deadline
+        self.gpt_budget = gpt_budget
+        self.source_timeouts = {source: RESEARCH_SOURCE_TIMEOUT for source in SOURCES}
+        self.source_timeouts.update(source_timeouts or {})
+        self.endpoints = {
+            "wikipedia": WIKIPEDIA_API_URL,
+            "songbpm": SONGBPM_API_URL,
+            "musicbrainz": MUSICBRAINZ_API_URL,
+        }
+        self.endpoints.update(endpoints or {})
+        limits = {source: RESEARCH_CONCURRENCY for source in (*SOURCES, "gpt")}
+        limits.update(concurrency or {})
+        self._slots = {source: asyncio.Semaphore(limit) for source, limit in limits.items()}
+        self._http: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncMusicResearchAgent":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    def _client(self) -> aiohttp.ClientSession:
+        """The shared HTTP session, opened on first use inside the running loop"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(headers={'User-Agent': USER_AGENT})
+        return self._http
+
+    async def _get_json(self, source: str, params: Dict[str, Any]) -> Tuple[int, Optional[Any]]:
+        """GET a source endpoint; returns (status, JSON body or None unless 200)
+
+        Requests wait for the host's rate limit in the shared scheduler, and
+        throttled, failed or dropped requests are retried with backoff.
+        """
+        url = self.endpoints[source]
+        host = urlsplit(url).netloc
+        for attempt in count():
+            await self.scheduler.acquire(host, _request_priority.get())
+            try:
+                async with self._client().get(url, params=params) as response:
+                    delay = self.scheduler.retry_delay(host, response.status, attempt,
+                                                       response.headers.get('Retry-After'))
+                    if delay is None:
+                        if response.status != 200:
+                            return response.status, None
+                        return response.status, await response.json(content_type=None)
+            except aiohttp.ClientConnectionError:
+                delay = self.scheduler.retry_delay(host, None, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    async def search_wikipedia(self, title: str, artist: str = "") -> Dict[str, Any]:
+        """Search Wikipedia for song information, as MusicResearchAgent.search_wikipedia"""
+        try:
+            resolver = WikipediaResolver(title, artist)
+            for query in resolver.queries(self._wikipedia_queries(title, artist)):
+                status, data = await self._get_json("wikipedia", search_params(query))
+                if status != 200:
+                    return self._status_error('wikipedia', status, 'No relevant Wikipedia page found')
+                titles = resolver.rank(data)
+                if titles:
+                    status, data = await self._get_json("wikipedia", page_params(titles))
+                    if status != 200:
+                        return self._status_error('wikipedia', status, 'No relevant Wikipedia page found')
+                    resolver.add_pages(data)
+
+            if resolver.match is None:
+                return {'source': 'wikipedia', 'error': 'No relevant Wikipedia page found'}
+            return self._wikipedia_result(resolver.match)
+
+        except Exception as e:
+            return {'source': 'wikipedia', 'error': str(e)}
+
+    async def search_songbpm(self, title: str, artist: str = "") -> Dict[str, Any]:
+        """Search SongBPM.com for BPM and key information"""
+        if not self.songbpm_api_key:
+            return {'source': 'songbpm', 'error': 'API key not provided'}
+
+        try:
+            params = self._songbpm_params(title, artist)
+            status, data = await self._get_json("songbpm", params)
+            if status == 200:
+                return self._parse_songbpm(data, params['lookup'])
+            return self._status_error('songbpm', status, f"No results found for {params['lookup']}")
+
+        except Exception as e:
+            return {'source': 'songbpm', 'error': str(e)}
+
+    async def search_musicbrainz(self, title: str, artist: str = "") -> Dict[str, Any]:
+        """Search MusicBrainz for additional metadata"""
+        try:
+            status, data = await self._get_json("musicbrainz", self._musicbrainz_params(title, artist))
+            if status == 200:
+                return self._parse_musicbrainz(data)
+            return self._status_error('musicbrainz', status, 'No results found')
+
+        except Exception as e:
+            return {'source': 'musicbrainz', 'error': str(e)}
+
+    async def _search_source(self, source: str, title: str, artist: str) -> Dict[str, Any]:
+        """One source's result, or an error result once its timeout passes"""
+        cached = self._cached_result(source, title, artist)
+        if cached is not None:
+            return cached
+        search = getattr(self, f"search_{source}")
+        timeout = self.source_timeouts[source]
+        # The timeout starts once the source has a free slot
+        async with self._slots[source]:
+            try:
+                result = await asyncio.wait_for(search(title, artist), timeout)
+            except asyncio.TimeoutError:
+                result = {'source': source, 'error': f'Timed out after {timeout:g}s'}
+        self._store_result(title, artist, result)
+        return result
+
+    async def search_sources(self, title: str, artist: str = "",
+                             timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Results of every source, in SOURCES order, within ``timeout`` seconds
+
+        Sources still running when ``timeout`` passes are cancelled and get
+        an error result.
+        """
+        tasks = [asyncio.ensure_future(self._search_source(source, title, artist)) for source in SOURCES]
+        if timeout is not None and timeout <= 0:
+            done, pending = set(), set(tasks)
+        else:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        return [
+            task.result() if task in done else {'source': source, 'error': 'Deadline exceeded'}
+            for source, task in zip(SOURCES, tasks)
+        ]
+
+    async def _research(self, title: str, artist: str, use_gpt_fallback: bool,
+                        deadline: Optional[float]) -> Tuple[MusicProfile, Optional[List[Dict[str, Any]]]]:
+        """(profile, search results) within ``deadline`` seconds (None: no deadline)
+
+        The search results are None when the profile came from the cache.
+        """
+        use_gpt = use_gpt_fallback and GPT_AVAILABLE
+        cached = self._cached_profile(title, artist, use_gpt)
+        if cached is not None:
+            return cached, None
+
+        loop = asyncio.get_running_loop()
+        if deadline is None:
+            deadline_at = sources_until = None
+            search_results = await self.search_sources(title, artist)
+        else:
+            deadline_at = loop.time() + deadline
+            sources_until = deadline_at - (self.gpt_budget if use_gpt else 0.0)
+            search_results = await self.search_sources(title, artist, timeout=sources_until - loop.time())
+
+        # GPT synthesis (if enabled), in whatever time is left
+        gpt_data = {}
+        if use_gpt:
+            remaining = None if deadline_at is None else deadline_at - loop.time()
+            cached = self._cached_result('gpt', title, artist)
+            if cached is not None:
+                gpt_data = cached
+            elif remaining is None or remaining > 0:
+                try:
+                    async with self._slots['gpt']:
+                        gpt_data = await asyncio.wait_for(
+                            asyncio.to_thread(self.gpt_extract_metadata, search_results, title, artist), remaining
+                        )
+                    self._store_result(title, artist, gpt_data)
+                except asyncio.TimeoutError:
+                    gpt_data = {'source': 'gpt', 'error': 'Deadline exceeded'}
+            else:
+                gpt_data = {'source': 'gpt', 'error': 'Deadline exceeded'}
+            search_results.append(gpt_data)
+
+        profile = self._synthesize_profile(title, artist, search_results, gpt_data)
+        self._store_profile(title, artist, use_gpt, profile, search_results)
+        return profile, search_results
+
+    async def research_song(self, title: str, artist: str = "", use_gpt_fallback: bool = True) -> MusicProfile:
+        """Research a song from all sources at once and return a MusicProfile"""
+        print("🔍 Searching " + ", ".join(SOURCE_NAMES.values()) + "...")
+        profile, search_results = await self._research(title, artist, use_gpt_fallback, self.deadline)
+        if search_results is None:
+            print(f"⚡ Cached research. Confidence: {profile.confidence_score:.1%}")
+        else:
+            print(f"✅ Research complete! Confidence: {profile.confidence_score:.1%}")
+        return profile
+
+    async def _research_item(self, item: ResearchItem, use_gpt_fallback: bool,
+                             deadline: Optional[float]) -> Tuple[ResearchItem, List[Dict[str, Any]]]:
+        # Runs in its own task, so only this song's requests queue behind interactive ones
+        _request_priority.set(PRIORITY_BULK)
+        try:
+            item.profile, search_results = await self._research(item.title, item.artist, use_gpt_fallback, deadline)
+        except Exception as e:
+            item.error = str(e)
+            return item, []
+        item.cached = search_results is None
+        return item, search_results or []
+
+    async def research_many(self, songs: Iterable[Tuple[str, str]], use_gpt_fallback: bool = True,
+                            deadline: Optional[float] = None,
+                            max_in_flight: int = RESEARCH_MAX_IN_FLIGHT) -> AsyncIterator[ResearchItem]:
+        """Research a list of (title, artist) songs, yielding each as it completes
+
+        Songs that normalize to the same cache key are researched once; the
+        item lists every input index it answers. Up to ``max_in_flight`` songs
+        run at once, and each source never has more than its concurrency
+        limit of requests open, so a large batch runs at the pace of the
+        slowest source. Their requests have bulk priority in the outbound
+        scheduler, so single lookups are not stuck behind a playlist. Songs
+        queue for sources, so by default there is no per-song deadline, only
+        the per-source timeouts. Every item carries a snapshot of the run's
+        progress.
+        """
+        items: Dict[str, ResearchItem] = {}
+        total = 0
+        for index, (title, artist) in enumerate(songs):
+            total += 1
+            item = items.setdefault(song_key(title, artist), ResearchItem([], title, artist))
+            item.indices.append(index)
+        progress = ResearchProgress(songs=len(items), duplicates=total - len(items))
+
+        queued = iter(items.values())
+        pending: Set[asyncio.Future] = set()
+        try:
+            while True:
+                while len(pending) < max_in_flight:
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    pending.add(asyncio.ensure_future(self._research_item(item, use_gpt_fallback, deadline)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item, search_results = task.result()
+                    progress.add(item, search_results)
+                    item.progress = progress.snapshot()
+                    yield item
+        finally:
+            # The consumer stopped early: stop the songs still in flight
+            for task in pending:
+                task.cancel()
+
+
+async def research_records(songs: Iterable[Tuple[str, str]], use_gpt_fallback: bool = True,
+                           **agent_options) -> AsyncIterator[Dict[str, Any]]:
+    """Records of research_many on a fresh agent, then a "done" record with the final progress"""
+    progress: Dict[str, Any] = {}
+    async with AsyncMusicResearchAgent(**agent_options) as agent:
+        async for item in agent.research_many(songs, use_gpt_fallback):
+            progress = item.progress
+            yield item.to_record()
+    yield {"status": "done", "summary": progress}
@@ -0,0 +1,129 @@
+"""
+Batch analysis helpers: fan-out over the analysis executor and byte-based quotas
+Used by the /api/analyze/batch endpoints
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from analysis_executor import AnalysisExecutor, analysis_executor
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_BYTES_PER_MINUTE = int(os.getenv("BATCH_BYTES_PER_MINUTE", str(5 * 1024 * 1024)))
+# Largest slice of a batch handed to one worker by run_corpus_batch
+CORPUS_CHUNK_SIZE = int(os.getenv("CORPUS_CHUNK_SIZE", "256"))
+
+
+async def run_batch(func: Callable[[Any], Any], payloads: Sequence[Any],
+                    executor: Optional[AnalysisExecutor] = None) -> List[Tuple[bool, Any]]:
+    """Run ``func`` over every payload on the analysis executor
+
+    Returns ``(True, result)`` or ``(False, exception)`` per payload, in input order.
+    At most one task per worker is in flight for a batch, so a large batch
+    waits its turn instead of filling the queue ahead of single requests.
+    ``func`` must be a picklable module-level function.
+    """
+    executor = executor or analysis_executor
+    slots = asyncio.Semaphore(executor.max_workers)
+
+    async def run_one(payload: str):
+        async with slots:
+            return await executor.run(func, payload, wait_for_slot=True)
+
+    outcomes = await asyncio.gather(*(run_one(payload) for payload in payloads), return_exceptions=True)
+    return [
+        (False, outcome) if isinstance(outcome, BaseException) else (True, outcome)
+        for outcome in outcomes
+    ]
+
+
+async def run_corpus_batch(func: Callable[[List[str]], List[Any]], payloads: Sequence[str],
+                           chunk_size: int = CORPUS_CHUNK_SIZE,
+                           executor: Optional[AnalysisExecutor] = None) -> List[Tuple[bool, Any]]:
+    """Like run_batch, for a ``func`` that analyzes a list of payloads at once
+
+    Payloads are split into at most one slice per worker (capped at
+    ``chunk_size``); a failing slice fails each of its payloads.
+    """
+    executor = executor or analysis_executor
+    if not payloads:
+        return []
+    size = max(1, min(chunk_size, math.ceil(len(payloads) / executor.max_workers)))
+    chunks = [list(payloads[start:start + size]) for start in range(0, len(payloads), size)]
+    outcomes: List[Tuple[bool, Any]] = []
+    for chunk, (ok, value) in zip(chunks, await run_batch(func, chunks, executor)):
+        if ok:
+            outcomes.extend((True, result) for result in value)
+        else:
+            outcomes.extend((False, value) for _ in chunk)
+    return outcomes
+
+
+class ByteQuota:
+    """Quota on bytes submitted per client
+
+    With a ``storage`` that keeps token buckets (rate_limit_store.SQLiteStorage)
+    each client has a bucket of ``limit_bytes`` refilled over ``window_seconds``,
+    shared by every worker. Without one, usage is a sliding window in this process.
+    """
+
+    def __init__(self, limit_bytes: int = BATCH_BYTES_PER_MINUTE, window_seconds: float = 60.0,
+                 storage: Optional[Any] = None):
+        self.limit_bytes = limit_bytes
+        self.window_seconds = window_seconds
+        self.storage = storage
+        self._usage: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, key: str, now: float) -> None:
+        usage = self._usage.get(key)
+        if not usage:
+            return
+        cutoff = now - self.window_seconds
+        while usage and usage[0][0] <= cutoff:
+            _, size = usage.popleft()
+            self._totals[key] -= size
+        if not usage:
+            del self._usage[key]
+            del self._totals[key]
+
+    def consume(self, key: str, size: int) -> Tuple[bool, float]:
+        """Record ``size`` bytes for ``key`` if they fit in the window
+
+        Returns ``(allowed, retry_after_seconds)``.
+        """
+        if self.storage is not None:
+            rate = self.limit_bytes / self.window_seconds
+            granted, tokens = self.storage.acquire_bucket(f"batch-bytes:{key}", self.limit_bytes, rate, size)
+            if granted:
+                return True, 0.0
+            if size > self.limit_bytes:
+                return False, self.window_seconds
+            return False, (size - tokens) / rate
+        now = time.monotonic()
+        with self._lock:
+            self._expire(key, now)
+            used = self._totals.get(key, 0)
+            if used + size > self.limit_bytes:
+                usage = self._usage.get(key)
+                retry_after = self.window_seconds
+                if usage:
+                    retry_after = max(0.0, usage[0][0] + self.window_seconds - now)
+                return False, retry_after
+            self._usage.setdefault(key, deque()).append((now, size))
+            self._totals[key] = used + size
+            return True, 0.0
+
+    def remaining(self, key: str) -> int:
+        if self.storage is not None:
+            rate = self.limit_bytes / self.window_seconds
+            return int(self.storage.bucket_tokens(f"batch-bytes:{key}", self.limit_bytes, rate))
+        with self._lock:
+            self._expire(key, time.monotonic())
+            return max(0, self.limit_bytes - self._totals.get(key, 0))
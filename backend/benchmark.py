@@ -0,0 +1,341 @@
+"""
+Benchmarks for the analysis functions and /api/analyze with baseline regression checks
+Run with --save to record a baseline and --check to fail on p50/p99 regressions
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "benchmark_baseline.json")
+LYRIC_SIZES = (100, 1_000, 10_000, 50_000)
+
+# A case regresses when p50 exceeds the baseline by BENCHMARK_P50_THRESHOLD
+# (a ratio) or p99 by BENCHMARK_P99_THRESHOLD, and by more than
+# BENCHMARK_MIN_DELTA_MS, so sub-microsecond noise never fails a run
+BENCHMARK_P50_THRESHOLD = float(os.getenv("BENCHMARK_P50_THRESHOLD", "1.5"))
+BENCHMARK_P99_THRESHOLD = float(os.getenv("BENCHMARK_P99_THRESHOLD", "2.0"))
+BENCHMARK_MIN_DELTA_MS = float(os.getenv("BENCHMARK_MIN_DELTA_MS", "0.1"))
+# Each round of a case runs until it has BENCHMARK_MIN_RUNS samples and
+# BENCHMARK_MIN_TIME seconds of samples, capped at BENCHMARK_MAX_RUNS. The
+# median of BENCHMARK_ROUNDS rounds is kept, which filters out background noise
+BENCHMARK_MIN_RUNS = int(os.getenv("BENCHMARK_MIN_RUNS", "30"))
+BENCHMARK_MAX_RUNS = int(os.getenv("BENCHMARK_MAX_RUNS", "1000"))
+BENCHMARK_MIN_TIME = float(os.getenv("BENCHMARK_MIN_TIME", "0.1"))
+BENCHMARK_ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", "2"))
+# Fresh interpreters the suite runs in; timings shift by tens of percent with
+# each process's memory layout and hash seed, so the median across processes
+# is what gets compared
+BENCHMARK_PROCESSES = int(os.getenv("BENCHMARK_PROCESSES", "3"))
+# Regressed cases are measured again this many times; only a regression that
+# shows up every time fails the check
+BENCHMARK_CONFIRMATIONS = int(os.getenv("BENCHMARK_CONFIRMATIONS", "1"))
+
+VOCABULARY = (
+    "love night light fire desire higher heart dream stream money honey pain rain "
+    "dance chance feel real broken open shine time mind alone home road soul gold "
+    "running gunning city pretty fighting lightning forever never together weather "
+    "the a to and in my you we I'm they're can't won't it's through though"
+).split()
+
+
+def synthetic_lyrics(size: int, seed: int = 0) -> str:
+    """Deterministic lyrics of at most ``size`` bytes, in stanzas of four lines"""
+    rng = random.Random(f"{seed}:{size}")
+    lines: List[str] = []
+    length = 0
+    while length < size:
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(5, 10))]
+        if rng.random() < 0.1:
+            words[-1] = words[-1].upper()
+        line = ' '.join(words) + rng.choice(["", "", "", "!", "?", ","])
+        if lines and len(lines) % 5 == 4:
+            line = ""
+        lines.append(line)
+        length += len(line) + 1
+    text = '\n'.join(lines)
+    return text[:text.rfind(' ', 0, size)] if len(text) > size else text
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``samples`` (q in 0..100)"""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing summary of one case, in milliseconds"""
+    runs: int
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[float]) -> "BenchmarkResult":
+        return cls(
+            runs=len(samples),
+            p50_ms=round(percentile(samples, 50) * 1000, 4),
+            p99_ms=round(percentile(samples, 99) * 1000, 4),
+            mean_ms=round(sum(samples) / len(samples) * 1000, 4),
+        )
+
+
+def median_of(rounds: Sequence[BenchmarkResult]) -> BenchmarkResult:
+    """Combine rounds: the median of each figure, the runs of all rounds"""
+    def median(values: List[float]) -> float:
+        return sorted(values)[(len(values) - 1) // 2]
+    return BenchmarkResult(
+        runs=sum(result.runs for result in rounds),
+        p50_ms=median([result.p50_ms for result in rounds]),
+        p99_ms=median([result.p99_ms for result in rounds]),
+        mean_ms=median([result.mean_ms for result in rounds]),
+    )
+
+
+def _sample_round(func: Callable[[], Any], min_runs: int, max_runs: int, min_time: float) -> BenchmarkResult:
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return BenchmarkResult.from_samples(samples)
+
+
+def measure(func: Callable[[], Any], min_runs: int = BENCHMARK_MIN_RUNS, max_runs: int = BENCHMARK_MAX_RUNS,
+            min_time: float = BENCHMARK_MIN_TIME, rounds: int = BENCHMARK_ROUNDS) -> BenchmarkResult:
+    """Time ``func`` after one warm-up call, with the garbage collector paused like timeit"""
+    func()
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        return median_of([_sample_round(func, min_runs, max_runs, min_time) for _ in range(rounds)])
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure_async(func: Callable[[], Any], min_runs: int = BENCHMARK_MIN_RUNS, max_runs: int = BENCHMARK_MAX_RUNS,
+                  min_time: float = BENCHMARK_MIN_TIME, rounds: int = BENCHMARK_ROUNDS) -> BenchmarkResult:
+    """Time the coroutine function ``func`` on one event loop"""
+    async def sample_round() -> BenchmarkResult:
+        samples: List[float] = []
+        started = time.perf_counter()
+        while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_time):
+            t0 = time.perf_counter()
+            await func()
+            samples.append(time.perf_counter() - t0)
+        return BenchmarkResult.from_samples(samples)
+
+    async def timed() -> BenchmarkResult:
+        await func()
+        return median_of([await sample_round() for _ in range(rounds)])
+
+    return asyncio.run(timed())
+
+
+def function_cases(module: Any, name: str, sizes: Sequence[int]) -> Dict[str, Callable[[], Any]]:
+    """Analysis function cases for one app module"""
+    from lyric_document import LyricDocument
+
+    cases: Dict[str, Callable[[], Any]] = {}
+    for size in sizes:
+        text = synthetic_lyrics(size)
+        doc = LyricDocument(text)
+        words = doc.cleaned
+        cases[f"{name}.count_syllables/{size}"] = lambda words=words: [module.count_syllables(w) for w in words]
+        cases[f"{name}.detect_rhymes/{size}"] = lambda doc=doc: module.detect_rhymes(module.rhyme_keys(doc))
+        cases[f"{name}.analyze_emotion/{size}"] = lambda doc=doc: module.analyze_emotion(doc)
+        cases[f"{name}.advanced_analysis/{size}"] = lambda text=text: module.advanced_analysis(text)
+    return cases
+
+
+def endpoint_cases(module: Any, name: str, sizes: Sequence[int]) -> Dict[str, Callable[[], Any]]:
+    """POST /api/analyze through an in-process ASGI client, with and without the result cache"""
+    import httpx
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=module.app), base_url="http://localhost")
+
+    def post(text: str, cold: bool) -> Callable[[], Any]:
+        async def call() -> None:
+            if cold:
+                module.result_cache.clear()
+            response = await client.post("/api/analyze", json={"lyrics": text})
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/analyze returned {response.status_code}: {response.text[:200]}")
+        return call
+
+    cases: Dict[str, Callable[[], Any]] = {}
+    for size in sizes:
+        text = synthetic_lyrics(size)
+        cases[f"{name}./api/analyze/{size}"] = post(text, cold=True)
+        cases[f"{name}./api/analyze:cached/{size}"] = post(text, cold=False)
+    return cases
+
+
+def run_suite(sizes: Sequence[int] = LYRIC_SIZES, include_endpoints: bool = True,
+              only: Optional[Sequence[str]] = None, **measure_options: Any) -> Dict[str, BenchmarkResult]:
+    """Run every case (or the cases named in ``only``) and return results keyed by case name"""
+    import main
+    import main_secure
+
+    results: Dict[str, BenchmarkResult] = {}
+    limiter_enabled = main_secure.limiter.enabled
+    # The per-client rate limits would turn repeated calls into 429s
+    main_secure.limiter.enabled = False
+    try:
+        for module, name in ((main, "main"), (main_secure, "main_secure")):
+            for case, func in function_cases(module, name, sizes).items():
+                if only is None or case in only:
+                    results[case] = measure(func, **measure_options)
+            if include_endpoints:
+                module.analysis_executor.start()
+                for case, func in endpoint_cases(module, name, sizes).items():
+                    if only is None or case in only:
+                        results[case] = measure_async(func, **measure_options)
+    finally:
+        main_secure.limiter.enabled = limiter_enabled
+        if include_endpoints:
+            main.analysis_executor.shutdown()
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def run_processes(processes: int, sizes: Sequence[int], include_endpoints: bool = True,
+                  only: Optional[Sequence[str]] = None) -> Dict[str, BenchmarkResult]:
+    """Run the suite in ``processes`` fresh interpreters and take the median of each case"""
+    runs: List[Dict[str, BenchmarkResult]] = []
+    for _ in range(processes):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            command = [sys.executable, os.path.abspath(__file__), "--worker", output,
+                       "--sizes", *map(str, sizes)]
+            if not include_endpoints:
+                command.append("--no-endpoints")
+            if only is not None:
+                command += ["--cases", *only]
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            runs.append(load_baseline(output))
+    return {case: median_of([run[case] for run in runs]) for case in runs[0]}
+
+
+def save_baseline(path: str, results: Dict[str, BenchmarkResult]) -> None:
+    data = {"environment": environment(), "results": {case: asdict(result) for case, result in results.items()}}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def load_baseline(path: str) -> Dict[str, BenchmarkResult]:
+    with open(path) as f:
+        data = json.load(f)
+    return {case: BenchmarkResult(**result) for case, result in data["results"].items()}
+
+
+def compare(results: Dict[str, BenchmarkResult], baseline: Dict[str, BenchmarkResult],
+            p50_threshold: float = BENCHMARK_P50_THRESHOLD, p99_threshold: float = BENCHMARK_P99_THRESHOLD,
+            min_delta_ms: float = BENCHMARK_MIN_DELTA_MS) -> Dict[str, List[str]]:
+    """Cases whose p50 or p99 regressed past its threshold, with a description of each"""
+    regressions: Dict[str, List[str]] = {}
+    for case, result in sorted(results.items()):
+        base = baseline.get(case)
+        if base is None:
+            continue
+        for label, current, previous, threshold in (
+            ("p50", result.p50_ms, base.p50_ms, p50_threshold),
+            ("p99", result.p99_ms, base.p99_ms, p99_threshold),
+        ):
+            if current > previous * threshold and current - previous > min_delta_ms:
+                regressions.setdefault(case, []).append(
+                    f"{label} {current:.3f} ms vs baseline {previous:.3f} ms "
+                    f"(x{current / previous:.2f}, limit x{threshold:.2f})"
+                )
+    return regressions
+
+
+def format_table(results: Dict[str, BenchmarkResult], baseline: Optional[Dict[str, BenchmarkResult]] = None) -> str:
+    baseline = baseline or {}
+    width = max((len(case) for case in results), default=4)
+    rows = [f"{'case':<{width}}  {'runs':>6}  {'p50 ms':>10}  {'p99 ms':>10}  {'p50 vs base':>11}"]
+    for case, result in results.items():
+        base = baseline.get(case)
+        ratio = f"x{result.p50_ms / base.p50_ms:.2f}" if base and base.p50_ms else "-"
+        rows.append(f"{case:<{width}}  {result.runs:>6}  {result.p50_ms:>10.3f}  {result.p99_ms:>10.3f}  {ratio:>11}")
+    return '\n'.join(rows)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="baseline JSON path")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a case regressed past its threshold")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(LYRIC_SIZES), help="lyric sizes in bytes")
+    parser.add_argument("--no-endpoints", action="store_true", help="skip the /api/analyze cases")
+    parser.add_argument("--processes", type=int, default=BENCHMARK_PROCESSES,
+                        help="interpreters to run the suite in (1 runs it in this process)")
+    parser.add_argument("--cases", nargs="+", help="run only these case names")
+    parser.add_argument("--worker", metavar="OUTPUT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    def run(only: Optional[Sequence[str]]) -> Dict[str, BenchmarkResult]:
+        if args.processes > 1:
+            return run_processes(args.processes, args.sizes, not args.no_endpoints, only)
+        return run_suite(args.sizes, not args.no_endpoints, only)
+
+    if args.worker:
+        save_baseline(args.worker, run_suite(args.sizes, not args.no_endpoints, args.cases))
+        return 0
+    results = run(args.cases)
+    baseline = load_baseline(args.baseline) if os.path.exists(args.baseline) else {}
+    print(format_table(results, baseline))
+
+    if args.save:
+        # A partial run updates its cases and keeps the rest of the baseline
+        save_baseline(args.baseline, {**baseline, **results} if args.cases else results)
+        print(f"Wrote baseline to {args.baseline}")
+    if args.check:
+        if not baseline:
+            print(f"No baseline at {args.baseline}; run with --save first")
+            return 1
+        regressions = compare(results, baseline)
+        for _ in range(BENCHMARK_CONFIRMATIONS):
+            if not regressions:
+                break
+            print(f"Confirming {len(regressions)} regressed case(s)")
+            regressions = compare(run(sorted(regressions)), baseline)
+        for case, messages in regressions.items():
+            for message in messages:
+                print(f"REGRESSION {case}: {message}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Build the prebuilt rhyme key table shipped in data/rhymes.bin
+Rhyme keys and vowel sequences come from the first pronunciation of each CMU dictionary word
+
+Usage: pip install cmudict && python build_rhyme_table.py [output_path]
+"""
+
+import re
+import sys
+from typing import Dict, Tuple
+
+from rhyme_engine import DEFAULT_RHYME_TABLE_PATH, phonetic_rhyme_key, phonetic_vowels, write_rhyme_table
+
+
+def build_table() -> Dict[str, Tuple[str, str]]:
+    import cmudict
+
+    table = {}
+    for line in cmudict.dict_stream():
+        line = line.decode("latin-1").strip()
+        if not line or line.startswith(";;;"):
+            continue
+        word, *phones = line.split()
+        if re.search(r'\(\d+\)$', word):
+            continue  # alternate pronunciation
+        key = phonetic_rhyme_key(phones)
+        if key is None:
+            continue
+        entry = (key, phonetic_vowels(phones))
+        word = word.lower()
+        table.setdefault(word, entry)
+        # Words are looked up with non-word characters removed ("don't" -> "dont")
+        table.setdefault(re.sub(r'[^\w]', '', word), entry)
+    table.pop('', None)
+    return table
+
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RHYME_TABLE_PATH
+    table = build_table()
+    write_rhyme_table(output_path, table)
+    print(f"Wrote {len(table)} words ({len({key for key, _ in table.values()})} rhyme keys) to {output_path}")
@@ -0,0 +1,54 @@
+"""
+Build the prebuilt syllable table shipped in data/syllables.bin
+Merges the CMU Pronouncing Dictionary with syllapy's word list (syllapy wins)
+
+Usage: pip install cmudict && python build_syllable_table.py [output_path]
+"""
+
+import re
+import sys
+from typing import Dict
+
+import syllapy
+
+from syllable_engine import DEFAULT_TABLE_PATH, normalize_word, write_table
+
+NUMBERS = re.compile(r'\d')
+
+
+def cmudict_syllables() -> Dict[str, int]:
+    """Syllable counts from the first pronunciation of every CMU dictionary word"""
+    import cmudict
+
+    table = {}
+    for line in cmudict.dict_stream():
+        line = line.decode("latin-1").strip()
+        if not line or line.startswith(";;;"):
+            continue
+        word, *phones = line.split()
+        if re.search(r'\(\d+\)$', word):
+            continue  # alternate pronunciation
+        word = normalize_word(word)
+        if not word or NUMBERS.search(word):
+            continue
+        count = sum(1 for phone in phones if phone[-1].isdigit())
+        table.setdefault(word, count)
+        # The analyzers strip non-word characters ("don't" -> "dont")
+        table.setdefault(re.sub(r'[^\w]', '', word), count)
+    return table
+
+
+def build_table() -> Dict[str, int]:
+    table = cmudict_syllables()
+    for word, count in syllapy.WORD_DICT.items():
+        word = normalize_word(word)
+        if word and not NUMBERS.search(word):
+            table[word] = count
+    return table
+
+
+if __name__ == "__main__":
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE_PATH
+    table = build_table()
+    write_table(output_path, table)
+    print(f"Wrote {len(table)} words to {output_path}")
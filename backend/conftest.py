@@ -0,0 +1,23 @@
+"""
+Shared test setup: rate limits live in a throwaway database and start empty in every test
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Read when rate_limit_store is imported, so set before any test module imports the apps;
+# a running server keeps its own database
+os.environ["RATE_LIMIT_STORAGE_URI"] = "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="lyric_analysis_tests_"), "rate_limits.db"
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    main_secure = sys.modules.get("main_secure")
+    if main_secure is not None:
+        main_secure.limiter.reset()
+    yield
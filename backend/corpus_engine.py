@@ -0,0 +1,183 @@
+"""
+NumPy-vectorized feature extraction for whole lyric corpora
+Tokens become integer IDs once; per-song figures are array reductions
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from lyric_document import WORD_RUN
+from rhyme_engine import RHYME_WINDOW, rhyme_engine, stanza_schemes
+
+# Distinct tokens kept in the ID tables before they are rebuilt from scratch
+CORPUS_MAX_VOCABULARY = int(os.getenv("CORPUS_MAX_VOCABULARY", "1000000"))
+
+
+@dataclass
+class CorpusFeatures:
+    """Per-song feature arrays, aligned with the input texts"""
+    word_count: np.ndarray
+    unique_words: np.ndarray
+    total_syllables: np.ndarray
+    line_count: np.ndarray
+    flow_variance: np.ndarray  # NaN with fewer than two lines
+    rhyme_score: np.ndarray
+    rhyme_schemes: List[List[str]]
+    emotion: np.ndarray
+    exclamations: np.ndarray
+    questions: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.word_count)
+
+
+class CorpusEngine:
+    """Token-ID tables shared across batches of texts
+
+    Every distinct raw token is analyzed once (syllables, vocabulary key,
+    emotion weight, rhyme key); a batch is then a handful of bincounts
+    over integer arrays. Figures match LyricDocument-based extraction.
+    """
+
+    def __init__(self, syllable_counter: Callable[[str], int],
+                 vocabulary_key: Callable[[str], str],
+                 emotion_score: Callable[[List[str]], float],
+                 rhyme_key: Callable[[str], Optional[Hashable]] = rhyme_engine.key,
+                 max_vocabulary: int = CORPUS_MAX_VOCABULARY):
+        self.syllable_counter = syllable_counter
+        self.vocabulary_key = vocabulary_key
+        self.emotion_score = emotion_score
+        self.rhyme_key = rhyme_key
+        self.max_vocabulary = max_vocabulary
+        self.clear()
+
+    def clear(self) -> None:
+        self._token_ids: Dict[str, int] = {}
+        self._key_ids: Dict[str, int] = {}
+        self._rhyme_ids: Dict[Hashable, int] = {}
+        self._syllables: List[int] = []
+        self._keys: List[int] = []
+        self._emotion: List[float] = []
+        self._rhymes: List[int] = []
+        self._tables: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._token_ids)
+
+    def _register(self, token: str) -> None:
+        runs = WORD_RUN.findall(token)
+        cleaned = ''.join(runs)
+        rhyme = self.rhyme_key(cleaned.lower())
+        self._token_ids[token] = len(self._token_ids)
+        self._syllables.append(self.syllable_counter(cleaned))
+        self._keys.append(self._key_ids.setdefault(self.vocabulary_key(token), len(self._key_ids)))
+        self._emotion.append(self.emotion_score([run.lower() for run in runs]))
+        self._rhymes.append(-1 if rhyme is None else self._rhyme_ids.setdefault(rhyme, len(self._rhyme_ids)))
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        if self._tables is None or len(self._tables["syllables"]) != len(self._syllables):
+            self._tables = {
+                "syllables": np.array(self._syllables, dtype=np.int64),
+                "keys": np.array(self._keys, dtype=np.int64),
+                "emotion": np.array(self._emotion, dtype=np.float64),
+                "rhymes": np.array(self._rhymes, dtype=np.int64),
+            }
+        return self._tables
+
+    def extract(self, texts: Sequence[str]) -> CorpusFeatures:
+        """Feature arrays for ``texts``; new tokens are added to the tables"""
+        n_songs = len(texts)
+        tokens: List[str] = []
+        line_lengths: List[int] = []
+        song_lines: List[int] = []
+        song_stanzas: List[List[int]] = []
+        for text in texts:
+            lines = 0
+            stanza_starts: List[int] = []
+            new_stanza = True
+            for raw_line in text.split('\n'):
+                # str.split() and str.strip() agree on whitespace, so this is
+                # the token list of the stripped line and empty only for blanks
+                line_tokens = raw_line.split()
+                if not line_tokens:
+                    new_stanza = True
+                    continue
+                if new_stanza:
+                    stanza_starts.append(lines)
+                    new_stanza = False
+                tokens += line_tokens
+                line_lengths.append(len(line_tokens))
+                lines += 1
+            song_lines.append(lines)
+            song_stanzas.append(stanza_starts)
+
+        new_tokens = set(tokens).difference(self._token_ids)
+        if len(self._token_ids) + len(new_tokens) > self.max_vocabulary:
+            self.clear()
+            new_tokens = set(tokens)
+        for token in new_tokens:
+            self._register(token)
+        tables = self._arrays()
+
+        ids = np.fromiter(map(self._token_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        line_count = np.array(song_lines, dtype=np.int64)
+        lengths = np.array(line_lengths, dtype=np.int64)
+        n_lines = len(lengths)
+        line_song = np.repeat(np.arange(n_songs), line_count)
+        token_line = np.repeat(np.arange(n_lines), lengths)
+        token_song = line_song[token_line]
+
+        word_count = np.bincount(token_song, minlength=n_songs)
+        syllables = tables["syllables"][ids]
+        total_syllables = np.bincount(token_song, weights=syllables, minlength=n_songs).astype(np.int64)
+
+        # Distinct vocabulary keys per song: unique (song, key) pairs
+        key_count = max(len(self._key_ids), 1)
+        pairs = np.unique(token_song * key_count + tables["keys"][ids])
+        unique_words = np.bincount(pairs // key_count, minlength=n_songs)
+
+        # Population variance of syllables per line, two-pass like flow_variance()
+        line_syllables = np.bincount(token_line, weights=syllables, minlength=n_lines)
+        safe_lines = np.maximum(line_count, 1)
+        mean = total_syllables / safe_lines
+        deviations = (line_syllables - mean[line_song]) ** 2
+        flow_variance = np.bincount(line_song, weights=deviations, minlength=n_songs) / safe_lines
+        flow_variance[line_count < 2] = np.nan
+
+        # A line rhymes when an earlier line of the same song within the
+        # window shares its rhyme key, as in rhyme_engine.rhyming_lines()
+        line_ends = ids[np.cumsum(lengths) - 1] if n_lines else ids[:0]
+        rhyme = tables["rhymes"][line_ends]
+        rhyming = np.zeros(n_lines, dtype=bool)
+        for distance in range(1, RHYME_WINDOW + 1):
+            same_song = line_song[distance:] == line_song[:-distance]
+            rhyming[distance:] |= same_song & (rhyme[distance:] >= 0) & (rhyme[distance:] == rhyme[:-distance])
+        rhyme_lines = np.bincount(line_song[rhyming], minlength=n_songs)
+        rhyme_score = np.where(line_count >= 2, rhyme_lines / np.maximum(line_count - 1, 1) * 100, 0)
+
+        # Schemes are per-stanza strings, lettered from the same key IDs
+        end_keys = [None if key < 0 else key for key in rhyme.tolist()]
+        first_lines = np.cumsum(line_count) - line_count
+        rhyme_schemes = [
+            stanza_schemes(end_keys[first:first + lines], stanza_starts)
+            for first, lines, stanza_starts in zip(first_lines.tolist(), song_lines, song_stanzas)
+        ]
+
+        emotion = np.bincount(token_song, weights=tables["emotion"][ids], minlength=n_songs)
+
+        return CorpusFeatures(
+            word_count=word_count,
+            unique_words=unique_words,
+            total_syllables=total_syllables,
+            line_count=line_count,
+            flow_variance=flow_variance,
+            rhyme_score=rhyme_score,
+            rhyme_schemes=rhyme_schemes,
+            emotion=emotion,
+            exclamations=np.fromiter((text.count('!') for text in texts), dtype=np.int64, count=n_songs),
+            questions=np.fromiter((text.count('?') for text in texts), dtype=np.int64, count=n_songs),
+        )
@@ -0,0 +1,112 @@
+"""
+Compiled emotion lexicon matcher
+Scores every category in one pass over a document's words with O(1) lookups
+"""
+
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CATEGORIES: Dict[str, List[str]] = {
+    'positive': ['love', 'joy', 'happy', 'smile', 'dream', 'hope', 'light', 'peace', 'free', 'win'],
+    'negative': ['hate', 'pain', 'sad', 'cry', 'fear', 'dark', 'lost', 'hurt', 'broken', 'mad'],
+    'intense': ['fire', 'burn', 'rage', 'passion', 'wild', 'crazy', 'insane', 'extreme']
+}
+
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    'positive': 10,
+    'negative': 10,
+    'intense': 15
+}
+
+# Optional TSV lexicon merged over the defaults: word<TAB>category[<TAB>weight]
+LEXICON_PATH_ENV = "EMOTION_LEXICON_PATH"
+
+
+@dataclass
+class EmotionMatch:
+    """Per-category hit counts and the weighted score for one document"""
+    counts: Dict[str, int] = field(default_factory=dict)
+    score: float = 0
+
+    def hits(self, *categories: str) -> int:
+        """Total hits, optionally restricted to the given categories"""
+        if not categories:
+            return sum(self.counts.values())
+        return sum(self.counts.get(category, 0) for category in categories)
+
+
+class EmotionLexicon:
+    """Word -> (category, weight) table compiled once and shared across requests"""
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[str, float]]] = None):
+        self.entries: Dict[str, Tuple[str, float]] = dict(entries or {})
+
+    @classmethod
+    def from_categories(cls, categories: Dict[str, List[str]],
+                        weights: Optional[Dict[str, float]] = None) -> "EmotionLexicon":
+        weights = weights or {}
+        entries = {}
+        for category, words in categories.items():
+            weight = weights.get(category, 1)
+            for word in words:
+                entries[word.lower()] = (category, weight)
+        return cls(entries)
+
+    def load(self, path: str, weights: Optional[Dict[str, float]] = None) -> int:
+        """Merge a TSV lexicon file into this lexicon and return the entry count read
+
+        Lines are ``word<TAB>category[<TAB>weight]``; blank lines and ``#`` comments
+        are skipped. A missing weight falls back to the category's default weight.
+        """
+        weights = weights or {}
+        loaded = 0
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split('\t')
+                if len(parts) < 2:
+                    raise ValueError(f"{path}:{line_number}: expected word<TAB>category[<TAB>weight]")
+                word, category = parts[0].strip().lower(), parts[1].strip()
+                weight = float(parts[2]) if len(parts) > 2 and parts[2].strip() else weights.get(category, 1)
+                self.entries[word] = (category, weight)
+                loaded += 1
+        return loaded
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.entries
+
+    def match(self, words: Iterable[str]) -> EmotionMatch:
+        """Score lowercased words in a single pass; cost is independent of lexicon size"""
+        counts: Dict[str, int] = {}
+        score = 0
+        entries = self.entries
+        for word, n in Counter(words).items():
+            entry = entries.get(word)
+            if entry is not None:
+                category, weight = entry
+                counts[category] = counts.get(category, 0) + n
+                score += weight * n
+        return EmotionMatch(counts=counts, score=score)
+
+
+def load_default_lexicon() -> EmotionLexicon:
+    """Built-in lexicon, extended by the file named in EMOTION_LEXICON_PATH if set"""
+    lexicon = EmotionLexicon.from_categories(DEFAULT_CATEGORIES, DEFAULT_WEIGHTS)
+    path = os.getenv(LEXICON_PATH_ENV)
+    if path:
+        try:
+            lexicon.load(path, DEFAULT_WEIGHTS)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load emotion lexicon {path}: {e}")
+    return lexicon
+
+
+# Shared lexicon compiled at import time
+emotion_lexicon = load_default_lexicon()
@@ -0,0 +1,43 @@
+"""
+Pre-encoded JSON responses for analysis results
+Uses orjson when installed, otherwise the standard library with Starlette's JSONResponse settings
+"""
+
+import json
+import os
+from typing import Any
+
+from starlette.responses import Response
+
+# Return analyses as pre-encoded JSON without per-request model validation;
+# the response shape is checked once by test_fast_json.py instead. Set to
+# false to validate every response against its response model again.
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("Warning: orjson not available. Fast responses use the json module.")
+
+
+def _json_dumps(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(content: Any) -> bytes:
+    # Corpus-engine results may carry NumPy scalars
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+dumps = _orjson_dumps if orjson is not None else _json_dumps
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered straight from plain dicts and lists"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,266 @@
+"""
+Incremental line-level re-analysis for live editor sessions
+Only lines that changed since the previous revision are analyzed again
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rhyme_engine import RHYME_WINDOW, stanza_schemes
+
+INCREMENTAL_LINE_CACHE = int(os.getenv("INCREMENTAL_LINE_CACHE", "20000"))
+INCREMENTAL_MAX_SESSIONS = int(os.getenv("INCREMENTAL_MAX_SESSIONS", "1000"))
+INCREMENTAL_SESSION_TTL = float(os.getenv("INCREMENTAL_SESSION_TTL", "1800"))
+
+
+@dataclass(frozen=True)
+class LineStats:
+    """Cached analysis of a single stripped, non-empty line"""
+    word_count: int
+    syllables: int
+    rhyme_key: Optional[str]     # phonetic rhyme key of the line's end word
+    vocabulary: Tuple[str, ...]  # lexical-diversity keys of the line's tokens
+    emotion: float               # lexicon score or hit count, per analyzer
+    exclamations: int = 0
+    questions: int = 0
+    caps_words: int = 0
+
+
+@dataclass(frozen=True)
+class SessionTotals:
+    """Immutable snapshot of a session after an update"""
+    revision: int
+    line_count: int
+    word_count: int
+    unique_words: int
+    total_syllables: int
+    flow_variance: Optional[float]
+    rhyme_score: float
+    emotion: float
+    exclamations: int
+    questions: int
+    caps_words: int
+    changed_lines: int
+    recomputed_lines: int
+    rhyme_schemes: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "revision": self.revision,
+            "lines": self.line_count,
+            "changedLines": self.changed_lines,
+            "recomputedLines": self.recomputed_lines,
+        }
+
+
+class EditorSession:
+    """Running aggregates for one document, updated by diffing line lists"""
+
+    def __init__(self, analyzer: "IncrementalAnalyzer"):
+        self.analyzer = analyzer
+        self.lines: List[str] = []
+        self.stanza_starts: List[int] = []
+        self.stats: List[LineStats] = []
+        self.vocabulary: Counter = Counter()
+        self.word_count = 0
+        self.total_syllables = 0
+        self.syllable_squares = 0
+        self.emotion = 0.0
+        self.exclamations = 0
+        self.questions = 0
+        self.caps_words = 0
+        self.rhyming_lines = 0
+        self.revision = 0
+        self.changed_lines = 0
+        self.recomputed_lines = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def line_count(self) -> int:
+        return len(self.lines)
+
+    @property
+    def unique_words(self) -> int:
+        return len(self.vocabulary)
+
+    @property
+    def flow_variance(self) -> Optional[float]:
+        """Population variance of line syllables, from running sums"""
+        n = len(self.lines)
+        if n < 2:
+            return None
+        # Exact integer arithmetic; no drift however many edits are applied
+        return (n * self.syllable_squares - self.total_syllables ** 2) / (n * n)
+
+    @property
+    def rhyme_score(self) -> float:
+        n = len(self.lines)
+        if n < 2:
+            return 0
+        return (self.rhyming_lines / max(n - 1, 1)) * 100
+
+    def _apply(self, stats: LineStats, sign: int) -> None:
+        self.word_count += sign * stats.word_count
+        self.total_syllables += sign * stats.syllables
+        self.syllable_squares += sign * stats.syllables * stats.syllables
+        self.emotion += sign * stats.emotion
+        self.exclamations += sign * stats.exclamations
+        self.questions += sign * stats.questions
+        self.caps_words += sign * stats.caps_words
+        if sign > 0:
+            self.vocabulary.update(stats.vocabulary)
+        else:
+            self.vocabulary.subtract(stats.vocabulary)
+            for key in stats.vocabulary:
+                if self.vocabulary[key] <= 0:
+                    del self.vocabulary[key]
+
+    def _count_rhymes(self, start: int, end: int) -> int:
+        """Rhyming lines whose window of earlier lines overlaps [start, end)"""
+        stats = self.stats
+        count = 0
+        for i in range(max(start, 1), min(end + RHYME_WINDOW, len(stats))):
+            key = stats[i].rhyme_key
+            if key is not None and any(stats[j].rhyme_key == key for j in range(max(0, i - RHYME_WINDOW), i)):
+                count += 1
+        return count
+
+    def update(self, lyrics: str) -> "EditorSession":
+        """Bring the aggregates in line with ``lyrics``, re-analyzing changed lines only"""
+        new_lines, stanza_starts = self.analyzer.split_lines(lyrics)
+        old_lines = self.lines
+
+        # Unchanged prefix and suffix; everything in between is the edit
+        limit = min(len(old_lines), len(new_lines))
+        prefix = 0
+        while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+
+        old_end = len(old_lines) - suffix
+        new_end = len(new_lines) - suffix
+
+        self.rhyming_lines -= self._count_rhymes(prefix, old_end)
+        for stats in self.stats[prefix:old_end]:
+            self._apply(stats, -1)
+
+        recomputed_before = self.analyzer.recomputed
+        replacement = [self.analyzer.line_stats(line) for line in new_lines[prefix:new_end]]
+        for stats in replacement:
+            self._apply(stats, 1)
+        self.stats[prefix:old_end] = replacement
+        self.lines = new_lines
+        self.stanza_starts = stanza_starts
+        self.rhyming_lines += self._count_rhymes(prefix, new_end)
+
+        self.revision += 1
+        self.changed_lines = new_end - prefix
+        self.recomputed_lines = self.analyzer.recomputed - recomputed_before
+        self.last_used = time.monotonic()
+        return self
+
+    def totals(self) -> SessionTotals:
+        return SessionTotals(
+            revision=self.revision,
+            line_count=self.line_count,
+            word_count=self.word_count,
+            unique_words=self.unique_words,
+            total_syllables=self.total_syllables,
+            flow_variance=self.flow_variance,
+            rhyme_score=self.rhyme_score,
+            emotion=self.emotion,
+            exclamations=self.exclamations,
+            questions=self.questions,
+            caps_words=self.caps_words,
+            changed_lines=self.changed_lines,
+            recomputed_lines=self.recomputed_lines,
+            rhyme_schemes=stanza_schemes([stats.rhyme_key for stats in self.stats], self.stanza_starts),
+        )
+
+
+class IncrementalAnalyzer:
+    """Shared per-line result cache plus the editor sessions that use it"""
+
+    def __init__(self, analyze_line: Callable[[str], LineStats],
+                 preprocess: Optional[Callable[[str], str]] = None,
+                 line_cache_size: int = INCREMENTAL_LINE_CACHE,
+                 max_sessions: int = INCREMENTAL_MAX_SESSIONS,
+                 session_ttl: float = INCREMENTAL_SESSION_TTL):
+        self.analyze_line = analyze_line
+        self.preprocess = preprocess
+        self.line_cache_size = line_cache_size
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self._lines: "OrderedDict[str, LineStats]" = OrderedDict()
+        self._sessions: "OrderedDict[str, EditorSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.recomputed = 0
+        self.line_hits = 0
+
+    def split_lines(self, lyrics: str) -> Tuple[List[str], List[int]]:
+        """Stripped, non-empty lines after preprocessing, and where each stanza starts"""
+        if self.preprocess is not None:
+            lyrics = self.preprocess(lyrics)
+        lines: List[str] = []
+        stanza_starts: List[int] = []
+        new_stanza = True
+        for raw_line in lyrics.split('\n'):
+            line = raw_line.strip()
+            if not line:
+                new_stanza = True
+                continue
+            if new_stanza:
+                stanza_starts.append(len(lines))
+                new_stanza = False
+            lines.append(line)
+        return lines, stanza_starts
+
+    def line_stats(self, line: str) -> LineStats:
+        """Per-line analysis, keyed by the line's text"""
+        stats = self._lines.get(line)
+        if stats is not None:
+            self._lines.move_to_end(line)
+            self.line_hits += 1
+            return stats
+        stats = self.analyze_line(line)
+        self.recomputed += 1
+        self._lines[line] = stats
+        if len(self._lines) > self.line_cache_size:
+            self._lines.popitem(last=False)
+        return stats
+
+    def _expire_sessions(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.session_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def update(self, session_id: str, lyrics: str) -> SessionTotals:
+        """Apply a new revision of ``lyrics`` to the session, creating it if needed"""
+        with self._lock:
+            now = time.monotonic()
+            session = self._sessions.pop(session_id, None)
+            if session is None or now - session.last_used >= self.session_ttl:
+                session = EditorSession(self)
+            self._sessions[session_id] = session
+            self._expire_sessions(now)
+            return session.update(lyrics).totals()
+
+    def end(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "cachedLines": len(self._lines),
+            "lineHits": self.line_hits,
+            "recomputedLines": self.recomputed,
+        }
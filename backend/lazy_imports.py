@@ -0,0 +1,80 @@
+"""
+Deferred imports for optional, slow-to-import dependencies
+Availability is checked without importing; the module itself loads on first use
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+
+def module_available(name: str) -> bool:
+    """Whether ``name`` can be imported, found without executing the module"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        """Import the module now (once) and return it"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self.load_seconds = time.perf_counter() - started
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+_lazy_modules: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Shared LazyModule for ``name``; importing happens on first use"""
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules.setdefault(name, LazyModule(name))
+    return module
+
+
+def warm_modules(*names: str) -> Dict[str, float]:
+    """Import the named lazy modules now; returns each one's import time in ms
+    (0 when it was already loaded, -1 when the import failed)"""
+    timings: Dict[str, float] = {}
+    for name in names:
+        module = lazy_import(name)
+        if module.loaded:
+            timings[name] = 0.0
+            continue
+        try:
+            module.load()
+            timings[name] = round(module.load_seconds * 1000, 3)
+        except ImportError as e:
+            print(f"Warning: {name} failed to import ({e})")
+            timings[name] = -1.0
+    return timings
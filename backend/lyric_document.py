@@ -0,0 +1,142 @@
+"""
+Tokenize-once lyric document shared by every analysis stage
+Lines, tokens, cleaned words and syllables are computed in a single pass
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# A maximal run of word characters, i.e. what \bword\b matches against
+WORD_RUN = re.compile(r'\w+')
+
+
+class LyricDocument:
+    """Single-pass tokenized view of a lyric
+
+    tokens        whitespace-separated tokens, identical to lyrics.split()
+    lines         stripped, non-empty lines
+    line_offsets  index of each line's first token (plus a final sentinel)
+    stanza_starts index of the first line of every blank-line separated stanza
+    cleaned       tokens with non-word characters removed
+    words         lowercased word runs, the units \\bword\\b regexes match
+    syllables     per-token syllable counts (when a counter is supplied)
+    """
+
+    __slots__ = (
+        'text', 'lines', 'tokens', 'line_offsets', 'stanza_starts', 'cleaned', 'words',
+        'syllables', 'exclamations', 'questions',
+        '_lower_tokens', '_line_syllables',
+    )
+
+    def __init__(self, text: str, syllable_counter: Optional[Callable[[str], int]] = None):
+        self.text = text
+        self.lines: List[str] = []
+        self.tokens: List[str] = []
+        self.line_offsets: List[int] = []
+        self.stanza_starts: List[int] = []
+        self.cleaned: List[str] = []
+        self.words: List[str] = []
+
+        findall = WORD_RUN.findall
+        new_stanza = True
+        for raw_line in text.split('\n'):
+            line = raw_line.strip()
+            if not line:
+                new_stanza = True
+                continue
+            if new_stanza:
+                self.stanza_starts.append(len(self.lines))
+                new_stanza = False
+            self.line_offsets.append(len(self.tokens))
+            self.lines.append(line)
+            for token in line.split():
+                runs = findall(token)
+                self.tokens.append(token)
+                self.cleaned.append(''.join(runs))
+                for run in runs:
+                    self.words.append(run.lower())
+        self.line_offsets.append(len(self.tokens))
+
+        self.exclamations = text.count('!')
+        self.questions = text.count('?')
+
+        self._lower_tokens: Optional[List[str]] = None
+        self._line_syllables: Optional[List[int]] = None
+        self.syllables: List[int] = []
+        if syllable_counter is not None:
+            self.syllables = self._count_syllables(syllable_counter)
+
+    def _count_syllables(self, syllable_counter: Callable[[str], int]) -> List[int]:
+        """Count syllables once per distinct cleaned token"""
+        seen: Dict[str, int] = {}
+        counts = []
+        for word in self.cleaned:
+            count = seen.get(word)
+            if count is None:
+                count = seen[word] = syllable_counter(word)
+            counts.append(count)
+        return counts
+
+    @property
+    def word_count(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def total_syllables(self) -> int:
+        return sum(self.syllables)
+
+    @property
+    def lower_tokens(self) -> List[str]:
+        """Lowercased raw tokens, equivalent to lyrics.lower().split()"""
+        if self._lower_tokens is None:
+            self._lower_tokens = [token.lower() for token in self.tokens]
+        return self._lower_tokens
+
+    @property
+    def line_syllables(self) -> List[int]:
+        """Syllable totals per line, sliced from the per-token counts"""
+        if self._line_syllables is None:
+            offsets = self.line_offsets
+            syllables = self.syllables
+            self._line_syllables = [
+                sum(syllables[offsets[i]:offsets[i + 1]])
+                for i in range(len(self.lines))
+            ]
+        return self._line_syllables
+
+    def line_tokens(self, index: int) -> List[str]:
+        """Raw tokens belonging to line ``index``"""
+        return self.tokens[self.line_offsets[index]:self.line_offsets[index + 1]]
+
+    def end_words(self) -> List[str]:
+        """Cleaned, lowercased final word of every line"""
+        cleaned = self.cleaned
+        return [cleaned[end - 1].lower() for end in self.line_offsets[1:]]
+
+
+def flow_variance(line_syllables: List[int]) -> float:
+    """Population variance of syllables per line"""
+    avg = sum(line_syllables) / len(line_syllables)
+    return sum((x - avg) ** 2 for x in line_syllables) / len(line_syllables)
+
+
+@dataclass
+class AnalysisFeatures:
+    """Document-level figures every score is derived from
+
+    Produced by a full pass over a LyricDocument or maintained incrementally
+    by an editor session; the scoring code does not care which.
+    """
+    word_count: int
+    unique_words: int
+    total_syllables: int
+    line_count: int
+    flow_variance: Optional[float]  # None with fewer than two lines
+    rhyme_score: float
+    emotion_score: float
+    rhyme_schemes: List[str] = field(default_factory=list)  # one per stanza, e.g. "ABAB"
+    exclamations: int = 0
+    caps_words: int = 0
+    analysis_hash: str = ""
+    readability: Optional[Dict[str, float]] = None  # readability_scores(), when that stage ran
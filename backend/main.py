@@ -3,26 +3,77 @@ FastAPI Python Backend for Advanced Lyric Analysis
 Alternative to Next.js API routes for NLP-heavy processing
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
+import os
 import re
 import json
-from typing import Dict, List, Any
-import syllapy
+import time
+from dataclasses import dataclass
+from typing import AbstractSet, Dict, FrozenSet, List, Any, Optional, Sequence, Tuple
 from datetime import datetime
+from lyric_document import AnalysisFeatures, LyricDocument, flow_variance
+from syllable_engine import syllable_engine
+from rhyme_engine import rhyme_engine, rhyming_lines, stanza_schemes
+from rhyme_index import build_rhyme_index
+from readability import document_counts, readability_scores
+from emotion_lexicon import emotion_lexicon
+from batch_analysis import BATCH_MAX_ITEMS, run_corpus_batch
+from analysis_executor import ExecutorBusyError, analysis_executor
+from result_cache import ResultCache, content_key, etag_for, etag_matches
+from fast_json import FAST_RESPONSES, FastJSONResponse
+from incremental import IncrementalAnalyzer, LineStats, SessionTotals
+from lazy_imports import lazy_import, module_available, warm_modules
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry, install_metrics, mark_stage, stage, timed_stage
+from outbound_scheduler import outbound_scheduler
+from streaming import (
+    NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, DuplexStreamingResponse, error_result, iter_records,
+    ndjson_stream, ok_result, parse_record, sse_stream, stream_results
+)
+
+# Optional dependency for enhanced analysis; checked without importing it,
+# since it takes a large share of startup time
+ENHANCED_ANALYSIS = module_available("nltk")
+if not ENHANCED_ANALYSIS:
+    print("Warning: nltk not available. Using basic analysis only.")
 
-# Optional imports for enhanced analysis
+# Optional NumPy engine for scoring whole corpora at once
 try:
-    import nltk
-    from textstat import flesch_reading_ease, flesch_kincaid_grade
-    ENHANCED_ANALYSIS = True
+    import numpy as np
+    from corpus_engine import CorpusEngine, CorpusFeatures
+    CORPUS_ENGINE = True
 except ImportError:
-    ENHANCED_ANALYSIS = False
-    print("Warning: nltk and textstat not available. Using basic analysis only.")
+    CORPUS_ENGINE = False
+    print("Warning: numpy not available. Corpus analysis falls back to per-song analysis.")
+
+# Song research (aiohttp and the agent) loads on the first research request
+research_agent = lazy_import("async_music_agent")
+# Deferred imports /warmup loads ahead of the first request that needs them
+WARMUP_MODULES = ["async_music_agent"] + (["openai"] if module_available("openai") else [])
+# This app has no authentication or rate limits, so playlists are kept short and
+# the paid GPT fallback is off unless a request asks for it
+OPEN_RESEARCH_BATCH_MAX_SONGS = int(os.getenv("OPEN_RESEARCH_BATCH_MAX_SONGS", "25"))
+
+# Analysis model identity; bump ANALYSIS_REVISION whenever scoring changes so
+# cached results and client ETags are invalidated
+MODEL_NAME = "python-fastapi-v1"
+MODEL_VERSION = "1.0.0"
+ANALYSIS_REVISION = 3
+CACHE_NAMESPACE = f"{MODEL_NAME}/{MODEL_VERSION}/{ANALYSIS_REVISION}/{ENHANCED_ANALYSIS}"
+
+# Results keyed by normalized lyrics, so repeated analyses are a dict lookup
+result_cache = ResultCache()
+
+# Request, stage and cache metrics served at /metrics
+app_metrics = MetricsRegistry()
 
 app = FastAPI(title="Lyric Analysis API", version="1.0.0")
 
+# Fully upper-case words, counted towards energy
+CAPS_WORD = re.compile(r'\b[A-Z]{2,}\b')
+
 # CORS middleware for Next.js frontend
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +83,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost middleware: Server-Timing header and request/stage metrics
+install_metrics(app, app_metrics)
+
 class LyricsRequest(BaseModel):
     lyrics: str
     title: str = "Untitled"
@@ -46,104 +100,191 @@ class AnalysisResponse(BaseModel):
     insights: Dict[str, List[str]]
     metadata: Dict[str, str]
 
+def response_document(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """``analysis`` typed as AnalysisResponse would type it; fast responses skip the model"""
+    return {**analysis, "complexity": {name: float(value) for name, value in analysis["complexity"].items()}}
+
+class BatchLyricsRequest(BaseModel):
+    items: List[LyricsRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class ResearchSong(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    artist: str = Field("", max_length=200)
+
+class ResearchBatchRequest(BaseModel):
+    songs: List[ResearchSong] = Field(..., min_length=1, max_length=OPEN_RESEARCH_BATCH_MAX_SONGS)
+    useGptFallback: bool = False
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    analysis: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResult]
+    summary: Dict[str, int]
+
 def count_syllables(word: str) -> int:
-    """Count syllables in a word using syllapy"""
-    try:
-        return syllapy.count(word)
-    except:
-        # Fallback method
-        word = word.lower()
-        vowels = "aeiouy"
-        count = 0
-        prev_was_vowel = False
-        
-        for char in word:
-            is_vowel = char in vowels
-            if is_vowel and not prev_was_vowel:
-                count += 1
-            prev_was_vowel = is_vowel
-        
-        # Handle silent e
-        if word.endswith('e') and count > 1:
-            count -= 1
-        
-        return max(1, count)
+    """Count syllables in a word (memoized table lookup, syllapy fallback)"""
+    return syllable_engine.count(word)
 
-def detect_rhymes(lines: List[str]) -> float:
-    """Basic rhyme detection"""
-    if len(lines) < 2:
+def rhyme_keys(doc: LyricDocument) -> List[Optional[str]]:
+    """Phonetic rhyme key of every line's end word"""
+    return list(map(rhyme_engine.key, doc.end_words()))
+
+def detect_rhymes(keys: List[Optional[str]]) -> float:
+    """Share of lines rhyming with one of the few lines before them"""
+    if len(keys) < 2:
         return 0
     
-    end_words = []
-    for line in lines:
-        words = line.strip().split()
-        if words:
-            clean_word = re.sub(r'[^\w]', '', words[-1]).lower()
-            end_words.append(clean_word)
-    
-    rhyme_count = 0
-    for i in range(1, len(end_words)):
-        current = end_words[i]
-        previous = end_words[i-1]
-        
-        if len(current) > 2 and len(previous) > 2:
-            # Check for suffix similarity (basic rhyme detection)
-            if current[-2:] == previous[-2:] or current[-3:] == previous[-3:]:
-                rhyme_count += 1
-    
-    return (rhyme_count / max(len(end_words) - 1, 1)) * 100
+    return (rhyming_lines(keys) / max(len(keys) - 1, 1)) * 100
 
-def analyze_emotion(lyrics: str) -> float:
+def analyze_emotion(doc: LyricDocument) -> float:
     """Analyze emotional content"""
-    emotional_words = {
-        'positive': ['love', 'joy', 'happy', 'smile', 'dream', 'hope', 'light', 'peace', 'free', 'win'],
-        'negative': ['hate', 'pain', 'sad', 'cry', 'fear', 'dark', 'lost', 'hurt', 'broken', 'mad'],
-        'intense': ['fire', 'burn', 'rage', 'passion', 'wild', 'crazy', 'insane', 'extreme']
-    }
-    
-    lyrics_lower = lyrics.lower()
-    emotion_score = 0
-    
-    for category, words in emotional_words.items():
-        for word in words:
-            count = len(re.findall(r'\b' + word + r'\b', lyrics_lower))
-            if category == 'intense':
-                emotion_score += count * 15
-            else:
-                emotion_score += count * 10
+    # All lexicon categories are scored in one pass over the document's words
+    emotion_score = emotion_lexicon.match(doc.words).score
     
     # Add intensity from punctuation
-    emotion_score += len(re.findall(r'[!]', lyrics)) * 5
-    emotion_score += len(re.findall(r'[?]', lyrics)) * 3
+    emotion_score += doc.exclamations * 5
+    emotion_score += doc.questions * 3
     
     return min(100, emotion_score)
 
-def advanced_analysis(lyrics: str) -> Dict[str, Any]:
-    """Perform advanced lyrical analysis"""
+def lexical_key(token: str) -> str:
+    """Normalization used when counting unique words"""
+    return token.lower().strip('.,!?";')
+
+# Feature stages of extract_features; tokenizing the document always runs
+FEATURE_STAGES = frozenset({"unique", "syllables", "rhymes", "emotion", "caps", "readability"})
+
+# Response sections in response order, with the feature stages each one reads
+SECTION_STAGES: Dict[str, FrozenSet[str]] = {
+    "complexity": frozenset({"unique", "syllables", "emotion"}),
+    "energy": frozenset({"unique", "syllables", "emotion", "caps"}),
+    "flow": frozenset({"syllables", "rhymes"}),
+    "dashboard": frozenset({"unique", "syllables", "emotion", "caps", "rhymes"}),
+    "insights": frozenset({"unique", "syllables", "emotion", "caps", "rhymes"}),
+    "metadata": frozenset(),
+    "readability": frozenset({"readability"}),
+}
+
+# Sections only a selection returns; the full analysis is unchanged without them
+OPT_IN_SECTIONS = frozenset({"readability"})
+FULL_ANALYSIS_SECTIONS = tuple(name for name in SECTION_STAGES if name not in OPT_IN_SECTIONS)
+
+# The stages a full analysis renders
+FULL_ANALYSIS_STAGES: FrozenSet[str] = frozenset().union(*(SECTION_STAGES[name] for name in FULL_ANALYSIS_SECTIONS))
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Sections named by a ``fields=flow,energy`` parameter, in response order
+
+    None (or an empty value) selects the full analysis. Raises ValueError for
+    an unknown section name.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - SECTION_STAGES.keys()
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(SECTION_STAGES)}"
+        )
+    return tuple(name for name in SECTION_STAGES if name in requested) or None
+
+def analysis_plan(sections: Sequence[str]) -> FrozenSet[str]:
+    """The feature stages needed to render ``sections``"""
+    return frozenset().union(*(SECTION_STAGES[name] for name in sections))
+
+@timed_stage("features")
+def extract_features(lyrics: str, stages: AbstractSet[str] = FULL_ANALYSIS_STAGES) -> AnalysisFeatures:
+    """Tokenize once and collect the document-level figures the scores use
+
+    Only the feature ``stages`` given run; figures of the others stay zero.
+    """
+    counted = "syllables" in stages or "readability" in stages
+    doc = LyricDocument(lyrics, count_syllables if counted else None)
+    line_syllables = doc.line_syllables
+    keys = rhyme_keys(doc) if "rhymes" in stages else []
+    
+    features = AnalysisFeatures(
+        word_count=doc.word_count,
+        unique_words=len(set(map(lexical_key, doc.tokens))) if "unique" in stages else 0,
+        total_syllables=doc.total_syllables,
+        line_count=len(doc.lines),
+        flow_variance=flow_variance(line_syllables) if len(line_syllables) > 1 and "syllables" in stages else None,
+        rhyme_score=detect_rhymes(keys),
+        rhyme_schemes=stanza_schemes(keys, doc.stanza_starts) if "rhymes" in stages else [],
+        emotion_score=analyze_emotion(doc) if "emotion" in stages else 0,
+        exclamations=doc.exclamations,
+        caps_words=len(CAPS_WORD.findall(lyrics)) if "caps" in stages else 0
+    )
+    
+    if "readability" in stages:
+        # From the document's own words, sentences and syllables
+        features.readability = readability_scores(document_counts(doc))
+    
+    return features
+
+def select_sections(analysis: Dict[str, Any], sections: Sequence[str]) -> Dict[str, Any]:
+    return {name: analysis[name] for name in sections}
+
+def advanced_analysis(lyrics: str, sections: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Perform advanced lyrical analysis, or only what ``sections`` need"""
+    if sections is None:
+        return build_analysis(extract_features(lyrics))
+    features = extract_features(lyrics, analysis_plan(sections))
+    analysis = build_analysis(features)
+    if features.readability is not None:
+        analysis["readability"] = features.readability
+    return select_sections(analysis, sections)
+
+@dataclass
+class AnalysisScores:
+    """Scored figures for one song, before rendering into the response"""
+    word_count: int
+    unique_words: int
+    total_syllables: int
+    line_count: int
+    lexical_diversity: float
+    avg_syllables: float
+    energy_level: float
+    emotion_score: float
+    rhyme_score: float
+    complexity_score: float
+    flow_consistency: float
+    persona: str
+    intensity: str
+    rhyme_variety: str
+    rhyme_schemes: List[str]
+
+def build_analysis(features: AnalysisFeatures) -> Dict[str, Any]:
+    """Score extracted features into the analysis response"""
+    return render_analysis(score_features(features))
+
+@timed_stage("scores")
+def score_features(features: AnalysisFeatures) -> AnalysisScores:
+    """Scores and labels for one song"""
     
     # Basic text processing
-    words = lyrics.split()
-    word_count = len(words)
-    unique_words = len(set(word.lower().strip('.,!?";') for word in words))
+    word_count = features.word_count
+    unique_words = features.unique_words
     lexical_diversity = (unique_words / word_count * 100) if word_count > 0 else 0
     
     # Syllable analysis
-    total_syllables = sum(count_syllables(re.sub(r'[^\w]', '', word)) for word in words)
+    total_syllables = features.total_syllables
     avg_syllables = total_syllables / word_count if word_count > 0 else 0
     
-    # Line analysis
-    lines = [line.strip() for line in lyrics.split('\n') if line.strip()]
-    
     # Energy calculation
-    exclamation_count = len(re.findall(r'[!]', lyrics))
-    caps_words = len(re.findall(r'\b[A-Z]{2,}\b', lyrics))
+    exclamation_count = features.exclamations
+    caps_words = features.caps_words
     energy_level = min(100, exclamation_count * 8 + caps_words * 5 + (15 if avg_syllables > 2.5 else 0))
     
     # Emotion analysis
-    emotion_score = analyze_emotion(lyrics)
+    emotion_score = features.emotion_score
     
     # Rhyme analysis
-    rhyme_score = detect_rhymes(lines)
+    rhyme_score = features.rhyme_score
     
     # Complexity calculation
     complexity_score = min(100, 
@@ -153,15 +294,8 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     )
     
     # Flow consistency
-    line_syllables = [
-        sum(count_syllables(re.sub(r'[^\w]', '', word)) for word in line.split())
-        for line in lines
-    ]
-    
-    if len(line_syllables) > 1:
-        avg_line_syllables = sum(line_syllables) / len(line_syllables)
-        variance = sum((x - avg_line_syllables) ** 2 for x in line_syllables) / len(line_syllables)
-        flow_consistency = max(0, 100 - (variance * 2))
+    if features.flow_variance is not None:
+        flow_consistency = max(0, 100 - (features.flow_variance * 2))
     else:
         flow_consistency = 75
     
@@ -193,6 +327,37 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     else:
         rhyme_variety = "Simple"
     
+    return AnalysisScores(
+        word_count=word_count,
+        unique_words=unique_words,
+        total_syllables=total_syllables,
+        line_count=features.line_count,
+        lexical_diversity=lexical_diversity,
+        avg_syllables=avg_syllables,
+        energy_level=energy_level,
+        emotion_score=emotion_score,
+        rhyme_score=rhyme_score,
+        complexity_score=complexity_score,
+        flow_consistency=flow_consistency,
+        persona=persona,
+        intensity=intensity,
+        rhyme_variety=rhyme_variety,
+        rhyme_schemes=features.rhyme_schemes
+    )
+
+@timed_stage("render")
+def render_analysis(scores: AnalysisScores) -> Dict[str, Any]:
+    """Insights and the response document for one song's scores"""
+    word_count = scores.word_count
+    lexical_diversity = scores.lexical_diversity
+    avg_syllables = scores.avg_syllables
+    energy_level = scores.energy_level
+    emotion_score = scores.emotion_score
+    rhyme_score = scores.rhyme_score
+    complexity_score = scores.complexity_score
+    flow_consistency = scores.flow_consistency
+    persona = scores.persona
+    
     # Enhanced insights with NLTK (if available)
     themes = ["Theme analysis requires NLTK"]
     metaphors = ["Metaphor detection requires advanced NLP"]
@@ -200,10 +365,6 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     suggestions = []
     
     if ENHANCED_ANALYSIS:
-        # Additional analysis with nltk and textstat
-        readability = flesch_reading_ease(lyrics)
-        grade_level = flesch_kincaid_grade(lyrics)
-        
         if lexical_diversity > 70:
             strengths.append("High vocabulary diversity")
         if rhyme_score > 60:
@@ -244,18 +405,19 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
             "creativity": round(complexity_score * 0.8 + lexical_diversity * 0.2),
             "diversity": round(lexical_diversity),
             "emotion": round(emotion_score),
-            "structure": round(flow_consistency * 0.7 + (20 if len(lines) > 4 else len(lines) * 5))
+            "structure": round(flow_consistency * 0.7 + (20 if scores.line_count > 4 else scores.line_count * 5))
         },
         "energy": {
             "persona": persona,
             "level": round(energy_level),
-            "intensity": intensity
+            "intensity": scores.intensity
         },
         "flow": {
             "consistency": round(flow_consistency),
             "avgSyllables": round(avg_syllables, 2),
             "stressPoints": int(avg_syllables * 1.4),
-            "rhymeVariety": rhyme_variety
+            "rhymeVariety": scores.rhyme_variety,
+            "rhymeSchemes": scores.rhyme_schemes
         },
         "dashboard": {
             "sessions": 1,
@@ -264,8 +426,8 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
             "avgEnergy": round(energy_level),
             "favoritePersona": persona,
             "lexicalDiversity": round(lexical_diversity),
-            "uniqueWords": unique_words,
-            "totalSyllables": total_syllables,
+            "uniqueWords": scores.unique_words,
+            "totalSyllables": scores.total_syllables,
             "rhymeScore": round(rhyme_score),
             "emotionScore": round(emotion_score)
         },
@@ -277,41 +439,399 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
         },
         "metadata": {
             "analysisDate": datetime.now().isoformat(),
-            "model": "python-fastapi-v1",
-            "version": "1.0.0",
+            "model": MODEL_NAME,
+            "version": MODEL_VERSION,
             "enhancedAnalysis": str(ENHANCED_ANALYSIS)
         }
     }
 
+def lexicon_score(words: List[str]) -> float:
+    return emotion_lexicon.match(words).score
+
+# Token tables persist per process, so each new batch only analyzes unseen tokens
+corpus_engine = CorpusEngine(count_syllables, lexical_key, lexicon_score) if CORPUS_ENGINE else None
+
+def corpus_scores(corpus: "CorpusFeatures", caps_words: "np.ndarray") -> List[AnalysisScores]:
+    """score_features for every song of a corpus with array operations"""
+    word_count = corpus.word_count
+    unique_words = corpus.unique_words
+    has_words = word_count > 0
+    safe_count = np.maximum(word_count, 1)
+    lexical_diversity = np.where(has_words, unique_words / safe_count * 100, 0)
+    avg_syllables = np.where(has_words, corpus.total_syllables / safe_count, 0)
+    
+    energy_level = np.minimum(100, corpus.exclamations * 8 + caps_words * 5 + np.where(avg_syllables > 2.5, 15, 0))
+    emotion_score = np.minimum(100, corpus.emotion + corpus.exclamations * 5 + corpus.questions * 3)
+    rhyme_score = corpus.rhyme_score
+    complexity_score = np.minimum(100, 
+        lexical_diversity * 0.6 + 
+        np.select([avg_syllables > 2, avg_syllables > 1.5], [20, 10], 0) +
+        np.where(unique_words > word_count * 0.7, 20, 0)
+    )
+    flow_consistency = np.where(
+        np.isnan(corpus.flow_variance), 75, np.maximum(0, 100 - corpus.flow_variance * 2)
+    )
+    
+    persona = np.select(
+        [energy_level > 80, energy_level < 30, emotion_score > 70, complexity_score > 80],
+        ["Energetic", "Calm", "Emotional", "Intellectual"],
+        "Balanced"
+    )
+    intensity = np.select([energy_level > 85, energy_level > 60], ["High", "Moderate"], "Low")
+    rhyme_variety = np.select([rhyme_score > 70, rhyme_score > 40], ["Complex", "Moderate"], "Simple")
+    
+    columns = zip(
+        word_count.tolist(), unique_words.tolist(), corpus.total_syllables.tolist(),
+        corpus.line_count.tolist(), lexical_diversity.tolist(), avg_syllables.tolist(),
+        energy_level.tolist(), emotion_score.tolist(), rhyme_score.tolist(),
+        complexity_score.tolist(), flow_consistency.tolist(),
+        persona.tolist(), intensity.tolist(), rhyme_variety.tolist(), corpus.rhyme_schemes
+    )
+    return [
+        AnalysisScores(
+            word_count=words,
+            unique_words=unique,
+            total_syllables=syllables,
+            line_count=lines,
+            # The scalar path yields int 0 for empty songs; keep the JSON identical
+            lexical_diversity=diversity if words else 0,
+            avg_syllables=avg if words else 0,
+            energy_level=energy,
+            emotion_score=emotion,
+            rhyme_score=rhyme if lines >= 2 else 0,
+            complexity_score=complexity,
+            flow_consistency=flow,
+            persona=persona_label,
+            intensity=intensity_label,
+            rhyme_variety=variety,
+            rhyme_schemes=schemes
+        )
+        for (words, unique, syllables, lines, diversity, avg, energy, emotion, rhyme,
+             complexity, flow, persona_label, intensity_label, variety, schemes) in columns
+    ]
+
+@timed_stage("corpus")
+def analyze_corpus(lyrics_list: Sequence[str]) -> List[Dict[str, Any]]:
+    """advanced_analysis for many songs at once, with identical results"""
+    if not CORPUS_ENGINE:
+        return [advanced_analysis(lyrics) for lyrics in lyrics_list]
+    
+    corpus = corpus_engine.extract(lyrics_list)
+    caps_words = np.fromiter(
+        (len(CAPS_WORD.findall(lyrics)) for lyrics in lyrics_list), dtype=np.int64, count=len(lyrics_list)
+    )
+    return [render_analysis(scores) for scores in corpus_scores(corpus, caps_words)]
+
+def refresh_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached analysis with its per-request fields regenerated"""
+    refreshed = dict(analysis)
+    if "metadata" in analysis:
+        refreshed["metadata"] = {**analysis["metadata"], "analysisDate": datetime.now().isoformat()}
+    return refreshed
+
+def analysis_key(lyrics: str, sections: Optional[Sequence[str]] = None) -> str:
+    """Cache key of a full analysis, or of a selection of its sections"""
+    if sections is None:
+        return content_key(lyrics, CACHE_NAMESPACE)
+    return content_key(lyrics, f"{CACHE_NAMESPACE}/{','.join(sections)}")
+
+async def cached_analysis(lyrics: str, key: Optional[str] = None,
+                          wait_for_slot: bool = False,
+                          sections: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """advanced_analysis through the result cache, computing misses on the executor"""
+    with stage("cache"):
+        key = key or analysis_key(lyrics, sections)
+        analysis = result_cache.get(key)
+        if analysis is None and sections is not None:
+            # A cached full analysis answers any selection of its sections
+            full = result_cache.get(analysis_key(lyrics))
+            if full is not None and OPT_IN_SECTIONS.isdisjoint(sections):
+                analysis = select_sections(full, sections)
+    if analysis is None:
+        analysis = await analysis_executor.run(advanced_analysis, lyrics, sections, wait_for_slot=wait_for_slot)
+        result_cache.put(key, analysis)
+    return refresh_analysis(analysis)
+
+def analyze_rhymes(lyrics: str) -> Dict[str, Any]:
+    """Multisyllabic rhyme chains and internal rhymes, positioned in ``lyrics``"""
+    return build_rhyme_index(lyrics).to_dict()
+
+def analyze_line(line: str) -> LineStats:
+    """Per-line figures an editor session sums into document features"""
+    doc = LyricDocument(line, count_syllables)
+    return LineStats(
+        word_count=doc.word_count,
+        syllables=doc.total_syllables,
+        rhyme_key=rhyme_engine.key(doc.end_words()[0]),
+        vocabulary=tuple(map(lexical_key, doc.tokens)),
+        emotion=emotion_lexicon.match(doc.words).score,
+        exclamations=doc.exclamations,
+        questions=doc.questions,
+        caps_words=len(CAPS_WORD.findall(line))
+    )
+
+# Sessions share one line cache, so unchanged lines are never re-analyzed
+incremental_analyzer = IncrementalAnalyzer(analyze_line)
+
+def session_features(session: SessionTotals, lyrics: str) -> AnalysisFeatures:
+    """Document features from a session's running totals"""
+    return AnalysisFeatures(
+        word_count=session.word_count,
+        unique_words=session.unique_words,
+        total_syllables=session.total_syllables,
+        line_count=session.line_count,
+        flow_variance=session.flow_variance,
+        rhyme_score=session.rhyme_score,
+        rhyme_schemes=session.rhyme_schemes,
+        emotion_score=min(100, session.emotion + session.exclamations * 5 + session.questions * 3),
+        exclamations=session.exclamations,
+        caps_words=session.caps_words
+    )
+
 @app.get("/")
 async def root():
-    return {"message": "Lyric Analysis API", "version": "1.0.0", "enhanced": ENHANCED_ANALYSIS}
+    return {
+        "message": "Lyric Analysis API",
+        "version": "1.0.0",
+        "enhanced": ENHANCED_ANALYSIS,
+        "executor": analysis_executor.stats(),
+        "result_cache": result_cache.stats(),
+        "sessions": incremental_analyzer.stats()
+    }
 
 @app.post("/api/analyze", response_model=AnalysisResponse)
-async def analyze_lyrics(request: LyricsRequest):
-    """Analyze lyrics for complexity, flow, energy, and insights"""
+async def analyze_lyrics(request: LyricsRequest, http_request: Request, response: Response,
+                         fields: Optional[str] = None):
+    """Analyze lyrics for complexity, flow, energy, and insights
+
+    ``fields`` (e.g. ``flow,energy``) returns only those sections, and only the
+    analysis stages they need are run.
+    """
+    mark_stage("validate")
     
     if not request.lyrics or len(request.lyrics.strip()) == 0:
         raise HTTPException(status_code=400, detail="Lyrics content is required")
+    try:
+        sections = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    key = analysis_key(request.lyrics, sections)
+    etag = etag_for(key)
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
     try:
-        analysis = advanced_analysis(request.lyrics)
-        return AnalysisResponse(**analysis)
+        analysis = await cached_analysis(request.lyrics, key, sections=sections)
+        if sections is not None:
+            # A partial analysis does not fit AnalysisResponse
+            return FastJSONResponse(analysis, headers={"ETag": etag})
+        with stage("response_model"):
+            if FAST_RESPONSES:
+                # The shape is checked once by the contract test, not per request
+                return FastJSONResponse(response_document(analysis), headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            return AnalysisResponse(**analysis)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @app.post("/api/analyze/simple")
-async def analyze_lyrics_simple(request: LyricsRequest):
-    """Simple lyrics analysis without response model validation"""
+async def analyze_lyrics_simple(request: LyricsRequest, http_request: Request, response: Response,
+                                fields: Optional[str] = None):
+    """Simple lyrics analysis without response model validation; ``fields`` as for /api/analyze"""
+    mark_stage("validate")
+    
+    if not request.lyrics or len(request.lyrics.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Lyrics content is required")
+    try:
+        sections = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    key = analysis_key(request.lyrics, sections)
+    etag = etag_for(key)
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    try:
+        analysis = await cached_analysis(request.lyrics, key, sections=sections)
+        if FAST_RESPONSES:
+            return FastJSONResponse(analysis, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return analysis
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@app.post("/api/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_lyrics_batch(request: BatchLyricsRequest):
+    """Analyze many songs in one request across the worker pool"""
+    mark_stage("validate")
+    
+    items = request.items
+    results: List[Optional[BatchItemResult]] = [None] * len(items)
+    # Cache misses grouped by key so duplicate songs are analyzed once
+    pending: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        if not item.lyrics or not item.lyrics.strip():
+            results[index] = BatchItemResult(index=index, status="error", error="Lyrics content is required")
+            continue
+        key = content_key(item.lyrics, CACHE_NAMESPACE)
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[index] = BatchItemResult(index=index, status="ok", analysis=refresh_analysis(cached))
+        else:
+            pending.setdefault(key, []).append(index)
+    
+    # Misses are scored a slice at a time by the vectorized corpus engine
+    outcomes = await run_corpus_batch(analyze_corpus, [items[indices[0]].lyrics for indices in pending.values()])
+    for (key, indices), (ok, value) in zip(pending.items(), outcomes):
+        if ok:
+            result_cache.put(key, value)
+        for index in indices:
+            if ok:
+                results[index] = BatchItemResult(index=index, status="ok", analysis=refresh_analysis(value))
+            else:
+                results[index] = BatchItemResult(index=index, status="error", error=f"Analysis failed: {str(value)}")
+    
+    succeeded = sum(1 for result in results if result.status == "ok")
+    return BatchAnalysisResponse(
+        results=results,
+        summary={"total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}
+    )
+
+async def analyze_stream_record(index: int, line: bytes) -> Dict[str, Any]:
+    """Analyze one NDJSON record, reporting failures as an error record"""
+    try:
+        with stage("validate"):
+            item = LyricsRequest(**parse_record(line))
+    except ValidationError as e:
+        return error_result(index, "; ".join(error["msg"] for error in e.errors()))
+    except ValueError as e:
+        return error_result(index, str(e))
+    
+    if not item.lyrics or not item.lyrics.strip():
+        return error_result(index, "Lyrics content is required")
+    
+    try:
+        return ok_result(index, await cached_analysis(item.lyrics, wait_for_slot=True))
+    except Exception as e:
+        return error_result(index, f"Analysis failed: {str(e)}")
+
+@app.post("/api/analyze/stream")
+async def analyze_lyrics_stream(request: Request):
+    """Analyze an NDJSON body of lyrics records, streaming one result line per record"""
+    results = stream_results(iter_records(request.stream()), analyze_stream_record)
+    return DuplexStreamingResponse(ndjson_stream(results), media_type=NDJSON_MEDIA_TYPE)
+
+@app.post("/api/analyze/stream/events")
+async def analyze_lyrics_events(request: Request):
+    """Server-Sent Events variant of /api/analyze/stream with progress events"""
+    results = stream_results(iter_records(request.stream()), analyze_stream_record)
+    return DuplexStreamingResponse(
+        sse_stream(results), 
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/research/batch")
+async def research_batch(batch_request: ResearchBatchRequest):
+    """Research a playlist, streaming one NDJSON line per distinct song as it completes"""
+    songs = [(song.title, song.artist) for song in batch_request.songs]
+    records = research_agent.research_records(songs, batch_request.useGptFallback)
+    return StreamingResponse(ndjson_stream(records), media_type=NDJSON_MEDIA_TYPE)
+
+@app.post("/api/analyze/rhymes")
+async def analyze_lyrics_rhymes(request: LyricsRequest):
+    """Internal and multisyllabic rhymes across the whole lyric, with line/column positions"""
+    mark_stage("validate")
+    
+    if not request.lyrics or len(request.lyrics.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Lyrics content is required")
+    
+    try:
+        return await analysis_executor.run(analyze_rhymes, request.lyrics)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@app.post("/api/analyze/session/{session_id}")
+def analyze_session(session_id: str, request: LyricsRequest):
+    """Re-analyze an editor's document, recomputing only the lines that changed"""
+    mark_stage("validate")
     
     if not request.lyrics or len(request.lyrics.strip()) == 0:
         raise HTTPException(status_code=400, detail="Lyrics content is required")
     
     try:
-        return advanced_analysis(request.lyrics)
+        session = incremental_analyzer.update(session_id, request.lyrics)
+        analysis = build_analysis(session_features(session, request.lyrics))
+        analysis["session"] = session.summary()
+        return analysis
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.delete("/api/analyze/session/{session_id}")
+def end_session(session_id: str):
+    """Drop an editor session's state"""
+    if not incremental_analyzer.end(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "closed", "session": session_id}
+
+app_metrics.add_stats("result_cache", result_cache.stats,
+                      counters=("hits", "misses", "evictions"), gauges=("entries", "bytes"))
+app_metrics.add_stats("executor", analysis_executor.stats,
+                      counters=("completed", "failed", "rejected"), gauges=("inFlight", "queueDepth"))
+app_metrics.add_stats("sessions", incremental_analyzer.stats,
+                      counters=("lineHits", "recomputedLines"), gauges=("sessions", "cachedLines"))
+app_metrics.add_stats("outbound", outbound_scheduler.stats,
+                      counters=("requests", "retries", "throttled"), gauges=("queued",))
+app_metrics.add_metric(outbound_scheduler.queue_wait)
+app_metrics.add_metric(outbound_scheduler.responses)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of request, stage, cache and executor metrics"""
+    return PlainTextResponse(app_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/warmup")
+async def warmup():
+    """Start every analysis worker and load the deferred imports; deploys call
+    this before routing traffic so the first request is not a cold start"""
+    started = time.perf_counter()
+    workers = await analysis_executor.warmup()
+    modules = warm_modules(*WARMUP_MODULES)
+    return {
+        "status": "warm",
+        "workers": workers,
+        "modules": modules,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+@app.on_event("startup")
+def start_workers():
+    analysis_executor.start()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    analysis_executor.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -4,12 +4,12 @@ Enhanced with authentication, rate limiting, and security features
 """
 
 import os
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, validator
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, validator
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -17,24 +17,41 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-import re
 import json
-import syllapy
 import hashlib
+import math
 import secrets
+import time
 from dotenv import load_dotenv
+from lyric_document import AnalysisFeatures, LyricDocument, flow_variance
+from syllable_engine import syllable_engine
+from rhyme_engine import rhyme_engine, rhyming_lines, stanza_schemes
+from rhyme_index import build_rhyme_index
+from emotion_lexicon import emotion_lexicon
+from batch_analysis import BATCH_MAX_ITEMS, ByteQuota, run_batch
+from analysis_executor import ExecutorBusyError, analysis_executor
+from result_cache import ResultCache, content_key, etag_for, etag_matches
+from rate_limit_store import RATE_LIMIT_STORAGE_URI, RATE_LIMIT_STRATEGY, SQLiteStorage
+from token_cache import ApiKeySet, TokenRevoked, VerifiedTokenCache
+from fast_json import FAST_RESPONSES, FastJSONResponse
+from incremental import IncrementalAnalyzer, LineStats, SessionTotals
+from input_scanner import is_suspicious, strip_tags, strip_xss
+from lazy_imports import lazy_import, module_available, warm_modules
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry, install_metrics, mark_stage, stage, timed_stage
+from outbound_scheduler import outbound_scheduler
+from streaming import (
+    NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, DuplexStreamingResponse, error_result, iter_records,
+    ndjson_stream, ok_result, parse_record, sse_stream, stream_results
+)
 
 # Load environment variables
 load_dotenv()
 
-# Optional imports for enhanced analysis
-try:
-    import nltk
-    import textstat
-    ENHANCED_ANALYSIS = True
-except ImportError:
-    ENHANCED_ANALYSIS = False
-    print("Warning: nltk and textstat not available. Using basic analysis only.")
+# Optional dependency for enhanced analysis; checked without importing it,
+# since importing it takes a large share of startup time
+ENHANCED_ANALYSIS = module_available("nltk")
+if not ENHANCED_ANALYSIS:
+    print("Warning: nltk not available. Using basic analysis only.")
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
@@ -42,9 +59,65 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 API_KEY_HEADER = "X-API-Key"
 API_KEY = os.getenv("API_KEY", "your-secure-api-key-here")
-
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
+# Additional accepted keys, comma-separated (e.g. while rotating API_KEY)
+API_KEYS = [key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()]
+
+# Batch byte quotas and token revocations go in the rate-limit database too,
+# so every worker on the host shares them, when it is a SQLite file
+shared_store = SQLiteStorage(RATE_LIMIT_STORAGE_URI) if RATE_LIMIT_STORAGE_URI.startswith("sqlite://") else None
+
+# Verified credentials: a token or key seen before is checked by digest
+token_cache = VerifiedTokenCache(revocations=shared_store)
+api_keys = ApiKeySet([API_KEY, *API_KEYS])
+
+# Rate limiting; buckets are shared by every worker on the host. Clients are
+# limited per address ("ip") unless per-user keys are enabled ("user")
+RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "ip").lower()
+# Subject of the tokens /token hands to anyone; never a rate-limit identity
+DEMO_SUBJECT = "demo_user"
+
+def rate_limit_key(request: Request) -> str:
+    """Identity a request's rate limits are counted against"""
+    if RATE_LIMIT_KEY == "user":
+        authorization = request.headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                username = token_subject(token)
+            except (JWTError, TokenRevoked):
+                username = None
+            if username and username != DEMO_SUBJECT:
+                return f"user:{username}"
+        identity = api_keys.identity(request.headers.get(API_KEY_HEADER))
+        if identity:
+            return f"api-key:{identity}"
+    # Unauthenticated, an invalid token or the shared demo subject: fall back to the client address
+    return get_remote_address(request)
+
+limiter = Limiter(key_func=rate_limit_key, strategy=RATE_LIMIT_STRATEGY, storage_uri=RATE_LIMIT_STORAGE_URI)
+
+# Batch requests are accounted by submitted bytes rather than request count,
+# per rate-limit identity and, with a SQLite store, across every worker
+batch_quota = ByteQuota(storage=shared_store)
+
+# Song research (aiohttp and the agent) loads on the first research request
+research_agent = lazy_import("async_music_agent")
+# Deferred imports /warmup loads ahead of the first request that needs them
+WARMUP_MODULES = ["async_music_agent"] + (["openai"] if module_available("openai") else [])
+RESEARCH_BATCH_MAX_SONGS = int(os.getenv("RESEARCH_BATCH_MAX_SONGS", "1000"))
+
+# Analysis model identity; bump ANALYSIS_REVISION whenever scoring changes so
+# cached results and client ETags are invalidated
+MODEL_NAME = "secure-fastapi-v2"
+MODEL_VERSION = "2.0.0"
+ANALYSIS_REVISION = 3
+CACHE_NAMESPACE = f"{MODEL_NAME}/{MODEL_VERSION}/{ANALYSIS_REVISION}"
+
+# Results keyed by normalized lyrics, so repeated analyses are a dict lookup
+result_cache = ResultCache()
+
+# Request, stage and cache metrics served at /metrics
+app_metrics = MetricsRegistry()
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -60,10 +133,11 @@ app = FastAPI(
 
 # Add rate limiting
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, lambda request, exc: JSONResponse(
-    status_code=429,
-    content={"detail": "Rate limit exceeded"}
-))
+def rate_limit_exceeded(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    app_metrics.count("rate_limited")
+    return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded)
 
 # Add trusted host middleware
 app.add_middleware(
@@ -91,14 +165,18 @@ app.add_middleware(
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
     response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Content-Security-Policy"] = "default-src 'self'"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+    with stage("security_headers"):
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
     return response
 
+# Outermost middleware: Server-Timing header and request/stage metrics
+install_metrics(app, app_metrics)
+
 # Pydantic models with enhanced validation
 class LyricsRequest(BaseModel):
     lyrics: str = Field(..., min_length=10, max_length=50000, description="Song lyrics")
@@ -111,7 +189,7 @@ class LyricsRequest(BaseModel):
         if not v.strip():
             raise ValueError('Lyrics cannot be empty')
         # Remove potential script tags or malicious content
-        cleaned = re.sub(r'<[^>]*>', '', v)
+        cleaned = strip_tags(v)
         if len(cleaned.strip()) < 10:
             raise ValueError('Lyrics must contain at least 10 characters of text')
         return cleaned
@@ -119,7 +197,7 @@ class LyricsRequest(BaseModel):
     @validator('title', 'artist')
     def validate_text_fields(cls, v):
         # Remove potential XSS vectors
-        return re.sub(r'[<>"\'\&]', '', v).strip()
+        return strip_xss(v).strip()
 
 class AnalysisResponse(BaseModel):
     complexity: Dict[str, float]
@@ -130,6 +208,10 @@ class AnalysisResponse(BaseModel):
     metadata: Dict[str, str]
     security: Dict[str, str] = Field(default_factory=dict)
 
+def response_document(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """``analysis`` typed as AnalysisResponse would type it; fast responses skip the model"""
+    return {**analysis, "complexity": {name: float(value) for name, value in analysis["complexity"].items()}}
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -137,13 +219,57 @@ class User(BaseModel):
     username: str
     disabled: Optional[bool] = None
 
+class ResearchSong(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    artist: str = Field("", max_length=200)
+
+class ResearchBatchRequest(BaseModel):
+    songs: List[ResearchSong] = Field(..., min_length=1, max_length=RESEARCH_BATCH_MAX_SONGS)
+    useGptFallback: bool = True
+
+class BatchLyricsRequest(BaseModel):
+    items: List[LyricsRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS, description="Songs to analyze")
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    analysis: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResult]
+    summary: Dict[str, int]
+
 # Security functions
 def verify_api_key(request: Request) -> bool:
     """Verify API key from header"""
-    api_key = request.headers.get(API_KEY_HEADER)
-    if not api_key:
-        return False
-    return secrets.compare_digest(api_key, API_KEY)
+    return request.headers.get(API_KEY_HEADER) in api_keys
+
+def token_subject(token: str) -> Optional[str]:
+    """Subject of a valid JWT, verifying the signature only on first sight
+
+    Raises JWTError for an invalid token and TokenRevoked for a revoked one.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    username = payload.get("sub")
+    if username is not None:
+        token_cache.put(token, username, subject=username, expires_at=payload.get("exp"))
+    return username
+
+def revoke_token(token: str) -> None:
+    """Reject a token from now until it expires"""
+    try:
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        expires_at = None
+    token_cache.revoke(token, expires_at)
+
+def invalidate_user(username: str) -> int:
+    """Re-verify every cached token of a user, e.g. after disabling them"""
+    return token_cache.invalidate_subject(username)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -159,8 +285,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify JWT token"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
+        username = token_subject(credentials.credentials)
         if username is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -168,7 +293,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
                 headers={"WWW-Authenticate": "Bearer"},
             )
         token_data = TokenData(username=username)
-    except JWTError:
+    except (JWTError, TokenRevoked):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -185,122 +310,96 @@ async def get_current_user(token: TokenData = Depends(verify_token)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+@timed_stage("integrity")
 def verify_request_integrity(request: LyricsRequest) -> bool:
     """Verify request integrity and detect potential abuse"""
-    # Check for suspicious patterns
-    suspicious_patterns = [
-        r'<script[^>]*>.*?</script>',
-        r'javascript:',
-        r'vbscript:',
-        r'on\w+\s*=',
-        r'expression\s*\(',
-        r'data:text/html'
-    ]
-    
-    full_text = f"{request.lyrics} {request.title} {request.artist} {request.userId}"
-    
-    for pattern in suspicious_patterns:
-        if re.search(pattern, full_text, re.IGNORECASE):
-            return False
-    
+    # One linear scan per field, stopping at the first suspicious pattern
+    if is_suspicious((request.lyrics, request.title, request.artist, request.userId)):
+        app_metrics.count("rejected")
+        return False
     return True
 
 # Analysis functions (keeping original logic)
 def count_syllables(word: str) -> int:
-    """Count syllables in a word using syllapy"""
-    try:
-        return syllapy.count(word)
-    except:
-        # Fallback method
-        word = word.lower()
-        vowels = "aeiouy"
-        count = 0
-        prev_was_vowel = False
-        
-        for char in word:
-            is_vowel = char in vowels
-            if is_vowel and not prev_was_vowel:
-                count += 1
-            prev_was_vowel = is_vowel
-        
-        # Handle silent e
-        if word.endswith('e') and count > 1:
-            count -= 1
-        
-        return max(1, count)
+    """Count syllables in a word (memoized table lookup, syllapy fallback)"""
+    return syllable_engine.count(word)
 
-def detect_rhymes(lines: List[str]) -> float:
-    """Basic rhyme detection"""
-    if len(lines) < 2:
+def rhyme_keys(doc: LyricDocument) -> List[Optional[str]]:
+    """Phonetic rhyme key of every line's end word"""
+    return list(map(rhyme_engine.key, doc.end_words()))
+
+def detect_rhymes(keys: List[Optional[str]]) -> float:
+    """Share of lines rhyming with one of the few lines before them"""
+    if len(keys) < 2:
         return 0
     
-    end_words = []
-    for line in lines:
-        words = line.strip().split()
-        if words:
-            clean_word = re.sub(r'[^\w]', '', words[-1]).lower()
-            end_words.append(clean_word)
-    
-    rhyme_count = 0
-    for i in range(1, len(end_words)):
-        current = end_words[i]
-        previous = end_words[i-1]
-        
-        if len(current) > 2 and len(previous) > 2:
-            # Check for suffix similarity (basic rhyme detection)
-            if current[-2:] == previous[-2:] or current[-3:] == previous[-3:]:
-                rhyme_count += 1
-    
-    return (rhyme_count / max(len(end_words) - 1, 1)) * 100
+    return (rhyming_lines(keys) / max(len(keys) - 1, 1)) * 100
 
-def analyze_emotion(lyrics: str) -> float:
+def analyze_emotion(doc: LyricDocument) -> float:
     """Analyze emotional content"""
-    emotional_words = {
-        'positive': ['love', 'joy', 'happy', 'smile', 'dream', 'hope', 'light', 'peace', 'free', 'win'],
-        'negative': ['hate', 'pain', 'sad', 'cry', 'fear', 'dark', 'lost', 'hurt', 'broken', 'mad'],
-    }
+    match = emotion_lexicon.match(word.lower() for word in doc.cleaned)
+    total_emotional = match.hits('positive', 'negative')
     
-    words = lyrics.lower().split()
-    total_emotional = 0
-    
-    for word in words:
-        clean_word = re.sub(r'[^\w]', '', word)
-        if clean_word in emotional_words['positive']:
-            total_emotional += 1
-        elif clean_word in emotional_words['negative']:
-            total_emotional += 1
+    return min((total_emotional / max(doc.word_count, 1)) * 100, 100)
+
+def sanitize_lyrics(lyrics: str) -> str:
+    """Remove potential XSS characters before analysis"""
+    return strip_xss(lyrics)
+
+@timed_stage("features")
+def extract_features(lyrics: str) -> AnalysisFeatures:
+    """Tokenize once and collect the document-level figures the scores use"""
     
-    return min((total_emotional / max(len(words), 1)) * 100, 100)
+    # Clean and validate input
+    lyrics = sanitize_lyrics(lyrics)
+    
+    # Tokenize once; every stage below reads from the document
+    doc = LyricDocument(lyrics, count_syllables)
+    line_syllables = doc.line_syllables
+    keys = rhyme_keys(doc)
+    
+    return AnalysisFeatures(
+        word_count=doc.word_count,
+        unique_words=len(set(doc.lower_tokens)),
+        total_syllables=doc.total_syllables,
+        line_count=len(doc.lines),
+        flow_variance=flow_variance(line_syllables) if len(line_syllables) > 1 else None,
+        rhyme_score=detect_rhymes(keys),
+        rhyme_schemes=stanza_schemes(keys, doc.stanza_starts),
+        emotion_score=analyze_emotion(doc),
+        # Security metadata
+        analysis_hash=hashlib.sha256(lyrics.encode()).hexdigest()[:16]
+    )
 
 def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     """Enhanced lyric analysis with security considerations"""
+    return build_analysis(extract_features(lyrics))
+
+@timed_stage("scores")
+def build_analysis(features: AnalysisFeatures) -> Dict[str, Any]:
+    """Score extracted features into the analysis response"""
     
-    # Clean and validate input
-    lyrics = re.sub(r'[<>"\'\&]', '', lyrics)  # Remove potential XSS
-    lines = [line.strip() for line in lyrics.split('\n') if line.strip()]
-    
-    if not lines:
+    if features.line_count == 0:
         raise ValueError("No valid lyrics content found")
     
-    words = lyrics.lower().split()
-    word_count = len(words)
+    word_count = features.word_count
     
     if word_count == 0:
         raise ValueError("No words found in lyrics")
     
     # Syllable analysis
-    total_syllables = sum(count_syllables(re.sub(r'[^\w]', '', word)) for word in words)
+    total_syllables = features.total_syllables
     avg_syllables = total_syllables / word_count if word_count > 0 else 0
     
     # Complexity metrics
-    unique_words = len(set(words))
+    unique_words = features.unique_words
     lexical_diversity = (unique_words / word_count) * 100 if word_count > 0 else 0
     
     # Rhyme analysis
-    rhyme_score = detect_rhymes(lines)
+    rhyme_score = features.rhyme_score
     
     # Emotion analysis
-    emotion_score = analyze_emotion(lyrics)
+    emotion_score = features.emotion_score
     
     # Energy calculation
     energy_level = min(100, 
@@ -318,15 +417,8 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     )
     
     # Flow consistency
-    line_syllables = [
-        sum(count_syllables(re.sub(r'[^\w]', '', word)) for word in line.split())
-        for line in lines
-    ]
-    
-    if len(line_syllables) > 1:
-        avg_line_syllables = sum(line_syllables) / len(line_syllables)
-        variance = sum((x - avg_line_syllables) ** 2 for x in line_syllables) / len(line_syllables)
-        flow_consistency = max(0, 100 - (variance * 2))
+    if features.flow_variance is not None:
+        flow_consistency = max(0, 100 - (features.flow_variance * 2))
     else:
         flow_consistency = 75
     
@@ -358,9 +450,6 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
     else:
         rhyme_variety = "Simple"
     
-    # Security metadata
-    analysis_hash = hashlib.sha256(lyrics.encode()).hexdigest()[:16]
-    
     return {
         "complexity": {
             "overall": round(complexity_score),
@@ -377,7 +466,8 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
             "consistency": round(flow_consistency),
             "avgSyllables": round(avg_syllables, 2),
             "stressPoints": int(avg_syllables * 1.4),
-            "rhymeVariety": rhyme_variety
+            "rhymeVariety": rhyme_variety,
+            "rhymeSchemes": features.rhyme_schemes
         },
         "dashboard": {
             "sessions": 1,
@@ -399,18 +489,81 @@ def advanced_analysis(lyrics: str) -> Dict[str, Any]:
         },
         "metadata": {
             "analysisDate": datetime.now().isoformat(),
-            "model": "secure-fastapi-v2",
-            "version": "2.0.0",
+            "model": MODEL_NAME,
+            "version": MODEL_VERSION,
             "enhancedAnalysis": str(ENHANCED_ANALYSIS),
             "securityLevel": "high"
         },
         "security": {
-            "analysisHash": analysis_hash,
+            "analysisHash": features.analysis_hash,
             "validatedInput": "true",
             "timestamp": datetime.utcnow().isoformat()
         }
     }
 
+def refresh_analysis(analysis: Dict[str, Any], lyrics: Optional[str] = None) -> Dict[str, Any]:
+    """Copy a cached analysis with its per-request fields regenerated
+
+    Without ``lyrics`` the hash is kept: the analysis was made from the request's own lyrics.
+    """
+    refreshed = dict(analysis)
+    refreshed["metadata"] = {**analysis["metadata"], "analysisDate": datetime.now().isoformat()}
+    refreshed["security"] = {**analysis["security"], "timestamp": datetime.utcnow().isoformat()}
+    if lyrics is not None:
+        # Normalization ignores whitespace, the hash covers the exact lyrics
+        refreshed["security"]["analysisHash"] = hashlib.sha256(sanitize_lyrics(lyrics).encode()).hexdigest()[:16]
+    return refreshed
+
+async def cached_analysis(lyrics: str, key: Optional[str] = None,
+                          wait_for_slot: bool = False) -> Dict[str, Any]:
+    """advanced_analysis through the result cache, computing misses on the executor"""
+    with stage("cache"):
+        key = key or content_key(lyrics, CACHE_NAMESPACE)
+        analysis = result_cache.get(key)
+    if analysis is None:
+        analysis = await analysis_executor.run(advanced_analysis, lyrics, wait_for_slot=wait_for_slot)
+        result_cache.put(key, analysis)
+        # Hashed from these exact lyrics already: no need to sanitize them again
+        return refresh_analysis(analysis)
+    return refresh_analysis(analysis, lyrics)
+
+def analyze_rhymes(lyrics: str) -> Dict[str, Any]:
+    """Multisyllabic rhyme chains and internal rhymes, positioned in ``lyrics``
+
+    The request has been screened already and the response is JSON-escaped, so
+    the lyrics are indexed as sent: sanitizing would drop apostrophes and shift
+    every later column on their line.
+    """
+    return build_rhyme_index(lyrics).to_dict()
+
+def analyze_line(line: str) -> LineStats:
+    """Per-line figures an editor session sums into document features"""
+    doc = LyricDocument(line, count_syllables)
+    return LineStats(
+        word_count=doc.word_count,
+        syllables=doc.total_syllables,
+        rhyme_key=rhyme_engine.key(doc.end_words()[0]),
+        vocabulary=tuple(doc.lower_tokens),
+        emotion=emotion_lexicon.match(word.lower() for word in doc.cleaned).hits('positive', 'negative')
+    )
+
+# Sessions share one line cache, so unchanged lines are never re-analyzed
+incremental_analyzer = IncrementalAnalyzer(analyze_line, preprocess=sanitize_lyrics)
+
+def session_features(session: SessionTotals, lyrics: str) -> AnalysisFeatures:
+    """Document features from a session's running totals"""
+    return AnalysisFeatures(
+        word_count=session.word_count,
+        unique_words=session.unique_words,
+        total_syllables=session.total_syllables,
+        line_count=session.line_count,
+        flow_variance=session.flow_variance,
+        rhyme_score=session.rhyme_score,
+        rhyme_schemes=session.rhyme_schemes,
+        emotion_score=min((session.emotion / max(session.word_count, 1)) * 100, 100),
+        analysis_hash=hashlib.sha256(sanitize_lyrics(lyrics).encode()).hexdigest()[:16]
+    )
+
 # API Endpoints
 @app.get("/")
 @limiter.limit("10/minute")
@@ -437,13 +590,19 @@ async def health_check(request: Request):
             "rate_limiting": True,
             "security_headers": True,
             "input_validation": True
-        }
+        },
+        "syllable_cache": syllable_engine.stats(),
+        "rhyme_cache": rhyme_engine.stats(),
+        "executor": analysis_executor.stats(),
+        "result_cache": result_cache.stats(),
+        "sessions": incremental_analyzer.stats()
     }
 
 @app.post("/api/analyze", response_model=AnalysisResponse)
 @limiter.limit("20/minute")
-async def analyze_lyrics(request: Request, lyrics_request: LyricsRequest):
+async def analyze_lyrics(request: Request, response: Response, lyrics_request: LyricsRequest):
     """Secure lyrics analysis endpoint"""
+    mark_stage("validate")
     
     # Verify request integrity
     if not verify_request_integrity(lyrics_request):
@@ -459,9 +618,25 @@ async def analyze_lyrics(request: Request, lyrics_request: LyricsRequest):
             detail="Lyrics content too large"
         )
     
+    key = content_key(lyrics_request.lyrics, CACHE_NAMESPACE)
+    etag = etag_for(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     try:
-        analysis = advanced_analysis(lyrics_request.lyrics)
-        return AnalysisResponse(**analysis)
+        analysis = await cached_analysis(lyrics_request.lyrics, key)
+        with stage("response_model"):
+            if FAST_RESPONSES:
+                # The shape is checked once by the contract test, not per request
+                return FastJSONResponse(response_document(analysis), headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            return AnalysisResponse(**analysis)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -474,8 +649,9 @@ async def analyze_lyrics(request: Request, lyrics_request: LyricsRequest):
 
 @app.post("/api/analyze/simple")
 @limiter.limit("20/minute")
-async def analyze_lyrics_simple(request: Request, lyrics_request: LyricsRequest):
+async def analyze_lyrics_simple(request: Request, response: Response, lyrics_request: LyricsRequest):
     """Simple lyrics analysis without response model validation"""
+    mark_stage("validate")
     
     # Verify request integrity
     if not verify_request_integrity(lyrics_request):
@@ -484,8 +660,23 @@ async def analyze_lyrics_simple(request: Request, lyrics_request: LyricsRequest)
             detail="Request contains potentially malicious content"
         )
     
+    key = content_key(lyrics_request.lyrics, CACHE_NAMESPACE)
+    etag = etag_for(key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     try:
-        return advanced_analysis(lyrics_request.lyrics)
+        analysis = await cached_analysis(lyrics_request.lyrics, key)
+        if FAST_RESPONSES:
+            return FastJSONResponse(analysis, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return analysis
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -503,6 +694,7 @@ async def analyze_lyrics_protected(
     current_user: User = Depends(get_current_user)
 ):
     """Protected lyrics analysis endpoint requiring authentication"""
+    mark_stage("validate")
     
     # Verify request integrity
     if not verify_request_integrity(lyrics_request):
@@ -512,9 +704,214 @@ async def analyze_lyrics_protected(
         )
     
     try:
-        analysis = advanced_analysis(lyrics_request.lyrics)
+        analysis = await cached_analysis(lyrics_request.lyrics)
         analysis["security"]["authenticatedUser"] = current_user.username
         analysis["security"]["authenticationTime"] = datetime.utcnow().isoformat()
+        return FastJSONResponse(analysis) if FAST_RESPONSES else analysis
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Analysis error: {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail="Internal analysis error occurred"
+        )
+
+@app.post("/api/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_lyrics_batch(request: Request, batch_request: BatchLyricsRequest):
+    """Analyze many songs in one request across the worker pool"""
+    mark_stage("validate")
+    
+    items = batch_request.items
+    total_bytes = sum(len(item.lyrics.encode("utf-8")) for item in items)
+    if total_bytes > batch_quota.limit_bytes:
+        raise HTTPException(
+            status_code=413, 
+            detail="Batch content too large"
+        )
+    
+    allowed, retry_after = batch_quota.consume(rate_limit_key(request), total_bytes)
+    if not allowed:
+        app_metrics.count("quota_exceeded")
+        raise HTTPException(
+            status_code=429, 
+            detail="Batch byte quota exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    
+    results: List[Optional[BatchItemResult]] = [None] * len(items)
+    # Cache misses grouped by key so duplicate songs are analyzed once
+    pending: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        if not verify_request_integrity(item):
+            results[index] = BatchItemResult(
+                index=index, 
+                status="error", 
+                error="Request contains potentially malicious content"
+            )
+            continue
+        key = content_key(item.lyrics, CACHE_NAMESPACE)
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[index] = BatchItemResult(index=index, status="ok", analysis=refresh_analysis(cached, item.lyrics))
+        else:
+            pending.setdefault(key, []).append(index)
+    
+    outcomes = await run_batch(advanced_analysis, [items[indices[0]].lyrics for indices in pending.values()])
+    for (key, indices), (ok, value) in zip(pending.items(), outcomes):
+        if ok:
+            result_cache.put(key, value)
+        elif not isinstance(value, ValueError):
+            print(f"Analysis error: {str(value)}")
+        for index in indices:
+            if ok:
+                # The first item was the one analyzed; duplicates may differ in whitespace
+                analysis = refresh_analysis(value, None if index == indices[0] else items[index].lyrics)
+                results[index] = BatchItemResult(index=index, status="ok", analysis=analysis)
+            elif isinstance(value, ValueError):
+                results[index] = BatchItemResult(index=index, status="error", error=str(value))
+            else:
+                results[index] = BatchItemResult(
+                    index=index, 
+                    status="error", 
+                    error="Internal analysis error occurred"
+                )
+    
+    succeeded = sum(1 for result in results if result.status == "ok")
+    return BatchAnalysisResponse(
+        results=results,
+        summary={
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "bytes": total_bytes,
+            "remainingBytes": batch_quota.remaining(rate_limit_key(request))
+        }
+    )
+
+def stream_record_handler(client: str):
+    """Per-record analysis for one client's stream; failures become error records"""
+    
+    async def analyze_record(index: int, line: bytes) -> Dict[str, Any]:
+        try:
+            with stage("validate"):
+                item = LyricsRequest(**parse_record(line))
+        except ValidationError as e:
+            return error_result(index, "; ".join(error["msg"] for error in e.errors()))
+        except ValueError as e:
+            return error_result(index, str(e))
+        
+        if not verify_request_integrity(item):
+            return error_result(index, "Request contains potentially malicious content")
+        
+        # Streamed lyrics draw from the same byte quota as batches
+        allowed, retry_after = batch_quota.consume(client, len(item.lyrics.encode("utf-8")))
+        if not allowed:
+            app_metrics.count("quota_exceeded")
+            return error_result(index, "Batch byte quota exceeded", retryAfter=math.ceil(retry_after))
+        
+        try:
+            return ok_result(index, await cached_analysis(item.lyrics, wait_for_slot=True))
+        except ValueError as e:
+            return error_result(index, str(e))
+        except Exception as e:
+            print(f"Analysis error: {str(e)}")
+            return error_result(index, "Internal analysis error occurred")
+    
+    return analyze_record
+
+@app.post("/api/analyze/stream")
+@limiter.limit("10/minute")
+async def analyze_lyrics_stream(request: Request):
+    """Analyze an NDJSON body of lyrics records, streaming one result line per record"""
+    handler = stream_record_handler(rate_limit_key(request))
+    results = stream_results(iter_records(request.stream()), handler)
+    return DuplexStreamingResponse(ndjson_stream(results), media_type=NDJSON_MEDIA_TYPE)
+
+@app.post("/api/analyze/stream/events")
+@limiter.limit("10/minute")
+async def analyze_lyrics_events(request: Request):
+    """Server-Sent Events variant of /api/analyze/stream with progress events"""
+    handler = stream_record_handler(rate_limit_key(request))
+    results = stream_results(iter_records(request.stream()), handler)
+    return DuplexStreamingResponse(
+        sse_stream(results), 
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/research/batch")
+@limiter.limit("5/minute")
+async def research_batch(
+    request: Request,
+    batch_request: ResearchBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Research a playlist, streaming one NDJSON line per distinct song as it completes"""
+    songs = [(strip_xss(song.title), strip_xss(song.artist)) for song in batch_request.songs]
+    records = research_agent.research_records(songs, batch_request.useGptFallback)
+    return StreamingResponse(ndjson_stream(records), media_type=NDJSON_MEDIA_TYPE)
+
+@app.post("/api/analyze/rhymes")
+@limiter.limit("20/minute")
+async def analyze_lyrics_rhymes(request: Request, lyrics_request: LyricsRequest):
+    """Internal and multisyllabic rhymes across the whole lyric, with line/column positions"""
+    mark_stage("validate")
+    
+    # Verify request integrity
+    if not verify_request_integrity(lyrics_request):
+        raise HTTPException(
+            status_code=400, 
+            detail="Request contains potentially malicious content"
+        )
+    
+    # Additional size check
+    if len(lyrics_request.lyrics) > 50000:
+        raise HTTPException(
+            status_code=413, 
+            detail="Lyrics content too large"
+        )
+    
+    try:
+        return await analysis_executor.run(analyze_rhymes, lyrics_request.lyrics)
+    except ExecutorBusyError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Analysis queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        print(f"Analysis error: {str(e)}")
+        raise HTTPException(
+            status_code=500, 
+            detail="Internal analysis error occurred"
+        )
+
+@app.post("/api/analyze/session/{session_id}")
+@limiter.limit("120/minute")
+def analyze_session(request: Request, session_id: str, lyrics_request: LyricsRequest):
+    """Re-analyze an editor's document, recomputing only the lines that changed"""
+    mark_stage("validate")
+    
+    # Verify request integrity
+    if not verify_request_integrity(lyrics_request):
+        raise HTTPException(
+            status_code=400, 
+            detail="Request contains potentially malicious content"
+        )
+    
+    # Sessions are scoped to the client so ids cannot be shared across callers
+    scoped_id = f"{get_remote_address(request)}:{session_id}"
+    try:
+        session = incremental_analyzer.update(scoped_id, lyrics_request.lyrics)
+        analysis = build_analysis(session_features(session, lyrics_request.lyrics))
+        analysis["session"] = session.summary()
         return analysis
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -525,6 +922,38 @@ async def analyze_lyrics_protected(
             detail="Internal analysis error occurred"
         )
 
+@app.delete("/api/analyze/session/{session_id}")
+@limiter.limit("120/minute")
+def end_session(request: Request, session_id: str):
+    """Drop an editor session's state"""
+    if not incremental_analyzer.end(f"{get_remote_address(request)}:{session_id}"):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "closed", "session": session_id}
+
+app_metrics.add_stats("result_cache", result_cache.stats,
+                      counters=("hits", "misses", "evictions"), gauges=("entries", "bytes"))
+app_metrics.add_stats("executor", analysis_executor.stats,
+                      counters=("completed", "failed", "rejected"), gauges=("inFlight", "queueDepth"))
+app_metrics.add_stats("sessions", incremental_analyzer.stats,
+                      counters=("lineHits", "recomputedLines"), gauges=("sessions", "cachedLines"))
+app_metrics.add_stats("token_cache", token_cache.stats,
+                      counters=("hits", "misses", "evictions"), gauges=("entries", "revoked"))
+app_metrics.add_stats("outbound", outbound_scheduler.stats,
+                      counters=("requests", "retries", "throttled"), gauges=("queued",))
+app_metrics.add_metric(outbound_scheduler.queue_wait)
+app_metrics.add_metric(outbound_scheduler.responses)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+@limiter.limit("60/minute")
+def metrics(request: Request):
+    """Prometheus text exposition; requires the API key"""
+    if not verify_api_key(request):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing API key"
+        )
+    return PlainTextResponse(app_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.post("/token")
 @limiter.limit("5/minute")
 async def login_for_access_token(request: Request):
@@ -532,10 +961,32 @@ async def login_for_access_token(request: Request):
     # In production, implement proper user authentication
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": "demo_user"}, expires_delta=access_token_expires
+        data={"sub": DEMO_SUBJECT}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/warmup")
+@limiter.limit("5/minute")
+async def warmup(request: Request):
+    """Start every analysis worker and load the deferred imports before traffic arrives"""
+    started = time.perf_counter()
+    workers = await analysis_executor.warmup()
+    modules = warm_modules(*WARMUP_MODULES)
+    return {
+        "status": "warm",
+        "workers": workers,
+        "modules": modules,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+@app.on_event("startup")
+def start_workers():
+    analysis_executor.start()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    analysis_executor.shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,299 @@
+"""
+Stage timers, Server-Timing headers and Prometheus-text metrics
+Stages of a request are collected in a context variable and aggregated per process
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Stage timings in a Server-Timing response header (they reveal server work per request)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from 50 microseconds to 10 seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class StageTimer:
+    """Durations of the named stages of one request, in seconds"""
+
+    __slots__ = ('started', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, stages: Dict[str, float]) -> None:
+        for name, seconds in stages.items():
+            self.add(name, seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage ``name`` of the current request"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+def timed_stage(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of stage(); a no-op outside a timed request"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            timer = _current_timer.get()
+            if timer is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def mark_stage(name: str) -> None:
+    """Record the time since the request started as stage ``name``
+
+    Handlers call this first, so the stage covers reading the body and
+    running the request model's validators.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, timer.elapsed())
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Collect stages into a fresh dict, e.g. inside an executor worker"""
+    timer = StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer.stages
+    finally:
+        _current_timer.reset(token)
+
+
+def record_stages(stages: Dict[str, float]) -> None:
+    """Add stages measured elsewhere (a worker process) to the current request"""
+    timer = _current_timer.get()
+    if timer is not None and stages:
+        timer.merge(stages)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    parts = [f'{key}="{_escape(str(value))}"' for key, value in labels + extra]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in Prometheus layout"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0.0] * (len(self.buckets) + 2)
+        # Non-cumulative while recording; render() accumulates
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                bucket = _format_labels(labels, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{bucket} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return lines
+
+
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], List[Tuple[str, str, str, List[Sample]]]]
+
+
+class MetricsRegistry:
+    """Request and stage metrics of one app plus gauges read at scrape time"""
+
+    def __init__(self, prefix: str = "lyrics"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.requests = Counter(f"{prefix}_requests_total", "HTTP requests by route, method and status")
+        self.request_latency = Histogram(f"{prefix}_request_duration_seconds", "HTTP request latency by route")
+        self.stage_latency = Histogram(f"{prefix}_stage_duration_seconds", "Time spent in each request stage")
+        self.events = Counter(f"{prefix}_events_total", "Notable events: rate_limited, rejected, quota_exceeded")
+        self._collectors: List[Collector] = []
+        self._metrics: List[Union[Counter, Histogram]] = []
+
+    def add_metric(self, metric: Union[Counter, Histogram]) -> None:
+        """Render a counter or histogram owned by another component, e.g. outbound queue waits"""
+        self._metrics.append(metric)
+
+    def add_collector(self, collector: Collector) -> None:
+        """Register a callback returning (name, type, help, samples) tuples at scrape time"""
+        self._collectors.append(collector)
+
+    def add_stats(self, name: str, stats: Callable[[], Dict[str, Any]],
+                  counters: Sequence[str] = (), gauges: Sequence[str] = ()) -> None:
+        """Expose fields of a ``stats()`` dict, e.g. result cache "hits" as
+        lyrics_result_cache_hits_total"""
+        def metric_name(key: str) -> str:
+            return f"{self.prefix}_{name}_" + ''.join('_' + c.lower() if c.isupper() else c for c in key)
+
+        def collect() -> List[Tuple[str, str, str, List[Sample]]]:
+            values = stats()
+            return (
+                [(metric_name(key) + "_total", "counter", f"{name} {key}", [({}, values[key])]) for key in counters]
+                + [(metric_name(key), "gauge", f"{name} {key}", [({}, values[key])]) for key in gauges]
+            )
+        self.add_collector(collect)
+
+    def count(self, event: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self.events.inc(amount, event=event)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        stages: Dict[str, float]) -> None:
+        with self._lock:
+            self.requests.inc(method=method, route=route, status=str(status))
+            self.request_latency.observe(seconds, method=method, route=route)
+            for name, stage_seconds in stages.items():
+                self.stage_latency.observe(stage_seconds, stage=name)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = (self.requests.render() + self.request_latency.render()
+                     + self.stage_latency.render() + self.events.render())
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: times each request, adds Server-Timing, records metrics
+
+    Add it last so it is the outermost middleware and sees the whole request.
+    """
+
+    def __init__(self, app: Any, registry: MetricsRegistry, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.registry = registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        status = 500
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timer.server_timing(timer.elapsed()).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            self.registry.observe_request(scope["method"], route_path, status, timer.elapsed(), timer.stages)
+
+
+def install_metrics(app: Any, registry: MetricsRegistry) -> None:
+    """Add the metrics middleware to ``app`` when metrics are enabled"""
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware, registry=registry)
@@ -5,21 +5,36 @@ Comprehensive music metadata research using multiple APIs and AI fallback
 
 import os
 import requests
-import wikipedia
 import re
 import json
+import time
+from itertools import count
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from urllib.parse import urlsplit
+
+from lazy_imports import lazy_import, module_available
+from outbound_scheduler import OutboundScheduler, outbound_scheduler
+from research_cache import ResearchCache, shared_research_cache
+from wikipedia_resolver import MUSIC_INDICATORS, WikipediaResolver, infobox_metadata, page_params, search_params
 
 # OpenAI for GPT fallback analysis
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    GPT_AVAILABLE = True
-except ImportError:
-    GPT_AVAILABLE = False
+GPT_AVAILABLE = module_available("openai")
+if not GPT_AVAILABLE:
     print("Warning: OpenAI not available. GPT fallback disabled.")
 
+# Source endpoints
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+SONGBPM_API_URL = "https://api.getsongbpm.com/search/"
+MUSICBRAINZ_API_URL = "https://musicbrainz.org/ws/2/recording"
+USER_AGENT = 'MusicResearchAgent/1.0 (Music Analysis Tool)'
+
+@lru_cache(maxsize=1)
+def openai_client():
+    """OpenAI client, created on the first GPT request"""
+    return lazy_import("openai").OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
 @dataclass
 class MusicProfile:
     """Structured music profile data class"""
@@ -38,72 +53,113 @@ class MusicProfile:
 class MusicResearchAgent:
     """Advanced music research agent with multiple data sources"""
     
-    def __init__(self, songbpm_api_key: Optional[str] = None, acousticbrainz_enabled: bool = True):
+    def __init__(self, songbpm_api_key: Optional[str] = None, acousticbrainz_enabled: bool = True,
+                 cache: Optional[ResearchCache] = None, scheduler: Optional[OutboundScheduler] = None):
         self.songbpm_api_key = songbpm_api_key or os.getenv('SONGBPM_API_KEY')
         self.acousticbrainz_enabled = acousticbrainz_enabled
+        # Results and profiles persist across runs (see research_cache.py)
+        self.cache = cache if cache is not None else shared_research_cache()
+        # Outbound requests share each host's rate limit (see outbound_scheduler.py)
+        self.scheduler = scheduler or outbound_scheduler
         self.session = requests.Session()
         self.session.headers.update({
-            'User-Agent': 'MusicResearchAgent/1.0 (Music Analysis Tool)'
+            'User-Agent': USER_AGENT
+        })
+    
+    def _get(self, url: str, params: Dict[str, Any]) -> requests.Response:
+        """GET at the host's rate, retrying throttled, failed and dropped requests"""
+        host = urlsplit(url).netloc
+        for attempt in count():
+            self.scheduler.acquire_blocking(host)
+            try:
+                response = self.session.get(url, params=params, timeout=10)
+            except requests.ConnectionError:
+                delay = self.scheduler.retry_delay(host, None, attempt)
+                if delay is None:
+                    raise
+            else:
+                delay = self.scheduler.retry_delay(host, response.status_code, attempt,
+                                                   response.headers.get('Retry-After'))
+                if delay is None:
+                    return response
+            time.sleep(delay)
+    
+    @staticmethod
+    def _status_error(source: str, status: int, no_results: str) -> Dict[str, Any]:
+        """Error result for a non-200 response; only a 404 means the source has nothing"""
+        if status == 404:
+            return {'source': source, 'error': no_results}
+        return {'source': source, 'error': f'HTTP {status}'}
+    
+    def _cached_result(self, source: str, title: str, artist: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get_result(source, title, artist) if self.cache else None
+    
+    def _store_result(self, title: str, artist: str, result: Dict[str, Any]) -> None:
+        if self.cache:
+            self.cache.put_result(title, artist, result)
+    
+    def _search_cached(self, source: str, search, title: str, artist: str) -> Dict[str, Any]:
+        """A source's cached result, or ``search(title, artist)`` stored for next time"""
+        result = self._cached_result(source, title, artist)
+        if result is None:
+            result = search(title, artist)
+            self._store_result(title, artist, result)
+        return result
+    
+    def _cached_profile(self, title: str, artist: str, use_gpt: bool) -> Optional[MusicProfile]:
+        fields = self.cache.get_profile(title, artist, use_gpt) if self.cache else None
+        return MusicProfile(**fields) if fields is not None else None
+    
+    def _store_profile(self, title: str, artist: str, use_gpt: bool, profile: MusicProfile,
+                       search_results: List[Dict]) -> None:
+        if self.cache:
+            self.cache.put_profile(title, artist, use_gpt, asdict(profile), search_results)
+    
+    @staticmethod
+    def _wikipedia_queries(title: str, artist: str = "") -> List[str]:
+        """Search queries to try, most specific first"""
+        return [
+            f"{title} {artist} song",
+            f"{title} song",
+            f"{artist} {title}",
+            f"{title}"
+        ]
+    
+    def _wikipedia_result(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """Source result for a page found by WikipediaResolver"""
+        metadata = self._extract_wikipedia_metadata(page['extract'], page['extract'])
+        # Infobox fields beat patterns matched in prose
+        metadata.update(infobox_metadata(page['infobox']))
+        metadata.update({
+            'url': page['url'],
+            'title': page['title'],
+            'summary': page['extract'][:500],
+            'source': 'wikipedia'
         })
+        return metadata
     
     def search_wikipedia(self, title: str, artist: str = "") -> Dict[str, Any]:
-        """Search Wikipedia for song information"""
+        """Search Wikipedia for song information
+
+        Ranks the search results and fetches only the lead section and
+        infobox of the best few, in one request (see wikipedia_resolver.py).
+        """
         try:
-            # Create search queries
-            search_queries = [
-                f"{title} {artist} song",
-                f"{title} song",
-                f"{artist} {title}",
-                f"{title}"
-            ]
-            
-            for query in search_queries:
-                try:
-                    # Search for the page
-                    search_results = wikipedia.search(query, results=3)
-                    
-                    for result in search_results:
-                        try:
-                            page = wikipedia.page(result)
-                            content = page.content.lower()
-                            
-                            # Check if this page is about music/song
-                            music_indicators = ['song', 'album', 'single', 'track', 'music', 'band', 'artist']
-                            if any(indicator in content for indicator in music_indicators):
-                                
-                                # Extract metadata using regex patterns
-                                metadata = self._extract_wikipedia_metadata(page.content, page.summary)
-                                metadata.update({
-                                    'url': page.url,
-                                    'title': page.title,
-                                    'summary': page.summary[:500],
-                                    'source': 'wikipedia'
-                                })
-                                
-                                return metadata
-                                
-                        except wikipedia.exceptions.DisambiguationError as e:
-                            # Try the first disambiguation option
-                            if e.options:
-                                try:
-                                    page = wikipedia.page(e.options[0])
-                                    metadata = self._extract_wikipedia_metadata(page.content, page.summary)
-                                    metadata.update({
-                                        'url': page.url,
-                                        'title': page.title,
-                                        'summary': page.summary[:500],
-                                        'source': 'wikipedia'
-                                    })
-                                    return metadata
-                                except:
-                                    continue
-                        except:
-                            continue
-                            
-                except wikipedia.exceptions.WikipediaException:
-                    continue
+            resolver = WikipediaResolver(title, artist)
+            for query in resolver.queries(self._wikipedia_queries(title, artist)):
+                response = self._get(WIKIPEDIA_API_URL, search_params(query))
+                if response.status_code != 200:
+                    return self._status_error('wikipedia', response.status_code, 'No relevant Wikipedia page found')
+                titles = resolver.rank(response.json())
+                if titles:
+                    response = self._get(WIKIPEDIA_API_URL, page_params(titles))
+                    if response.status_code != 200:
+                        return self._status_error('wikipedia', response.status_code, 'No relevant Wikipedia page found')
+                    resolver.add_pages(response.json())
             
-            return {'source': 'wikipedia', 'error': 'No relevant Wikipedia page found'}
+            if resolver.match is None:
+                return {'source': 'wikipedia', 'error': 'No relevant Wikipedia page found'}
+            return self._wikipedia_result(resolver.match)
             
         except Exception as e:
             return {'source': 'wikipedia', 'error': str(e)}
@@ -150,89 +206,101 @@ class MusicResearchAgent:
         
         return metadata
     
+    def _songbpm_params(self, title: str, artist: str = "") -> Dict[str, Any]:
+        return {
+            'api_key': self.songbpm_api_key,
+            'type': 'song',
+            'lookup': f"{title} {artist}".strip()
+        }
+    
+    @staticmethod
+    def _parse_songbpm(data: Dict[str, Any], query: str) -> Dict[str, Any]:
+        """Source result from a SongBPM search response"""
+        if 'search' in data and len(data['search']) > 0:
+            song_data = data['search'][0]
+            
+            return {
+                'bpm': song_data.get('tempo'),
+                'key': song_data.get('song_key'),
+                'title': song_data.get('song_title'),
+                'artist': song_data.get('artist', {}).get('name') if isinstance(song_data.get('artist'), dict) else song_data.get('artist'),
+                'energy': song_data.get('energy'),
+                'danceability': song_data.get('danceability'),
+                'source': 'songbpm'
+            }
+        
+        return {'source': 'songbpm', 'error': f'No results found for {query}'}
+    
     def search_songbpm(self, title: str, artist: str = "") -> Dict[str, Any]:
         """Search SongBPM.com for BPM and key information"""
         if not self.songbpm_api_key:
             return {'source': 'songbpm', 'error': 'API key not provided'}
         
         try:
-            query = f"{title} {artist}".strip()
-            url = f"https://api.getsongbpm.com/search/"
-            params = {
-                'api_key': self.songbpm_api_key,
-                'type': 'song',
-                'lookup': query
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
+            params = self._songbpm_params(title, artist)
+            response = self._get(SONGBPM_API_URL, params)
             
             if response.status_code == 200:
-                data = response.json()
-                
-                if 'search' in data and len(data['search']) > 0:
-                    song_data = data['search'][0]
-                    
-                    return {
-                        'bpm': song_data.get('tempo'),
-                        'key': song_data.get('song_key'),
-                        'title': song_data.get('song_title'),
-                        'artist': song_data.get('artist', {}).get('name') if isinstance(song_data.get('artist'), dict) else song_data.get('artist'),
-                        'energy': song_data.get('energy'),
-                        'danceability': song_data.get('danceability'),
-                        'source': 'songbpm'
-                    }
+                return self._parse_songbpm(response.json(), params['lookup'])
             
-            return {'source': 'songbpm', 'error': f'No results found for {query}'}
+            return self._status_error('songbpm', response.status_code, f"No results found for {params['lookup']}")
             
         except Exception as e:
             return {'source': 'songbpm', 'error': str(e)}
     
+    @staticmethod
+    def _musicbrainz_params(title: str, artist: str = "") -> Dict[str, Any]:
+        query = f'recording:"{title}"'
+        if artist:
+            query += f' AND artist:"{artist}"'
+        
+        return {
+            'query': query,
+            'fmt': 'json',
+            'limit': 5
+        }
+    
+    @staticmethod
+    def _parse_musicbrainz(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Source result from a MusicBrainz recording search response"""
+        if 'recordings' in data and len(data['recordings']) > 0:
+            recording = data['recordings'][0]
+            
+            # Extract artist info
+            artist_name = None
+            if 'artist-credit' in recording and len(recording['artist-credit']) > 0:
+                artist_name = recording['artist-credit'][0].get('name')
+            
+            # Extract release info
+            release_info = {}
+            if 'releases' in recording and len(recording['releases']) > 0:
+                release = recording['releases'][0]
+                release_info = {
+                    'album': release.get('title'),
+                    'year': release.get('date', '')[:4] if release.get('date') else None
+                }
+            
+            return {
+                'title': recording.get('title'),
+                'artist': artist_name,
+                'duration': recording.get('length'),
+                'musicbrainz_id': recording.get('id'),
+                'source': 'musicbrainz',
+                **release_info
+            }
+        
+        return {'source': 'musicbrainz', 'error': 'No results found'}
+    
     def search_musicbrainz(self, title: str, artist: str = "") -> Dict[str, Any]:
         """Search MusicBrainz for additional metadata"""
         try:
-            query = f'recording:"{title}"'
-            if artist:
-                query += f' AND artist:"{artist}"'
-            
-            url = "https://musicbrainz.org/ws/2/recording"
-            params = {
-                'query': query,
-                'fmt': 'json',
-                'limit': 5
-            }
-            
-            response = self.session.get(url, params=params, timeout=10)
+            params = self._musicbrainz_params(title, artist)
+            response = self._get(MUSICBRAINZ_API_URL, params)
             
             if response.status_code == 200:
-                data = response.json()
-                
-                if 'recordings' in data and len(data['recordings']) > 0:
-                    recording = data['recordings'][0]
-                    
-                    # Extract artist info
-                    artist_name = None
-                    if 'artist-credit' in recording and len(recording['artist-credit']) > 0:
-                        artist_name = recording['artist-credit'][0].get('name')
-                    
-                    # Extract release info
-                    release_info = {}
-                    if 'releases' in recording and len(recording['releases']) > 0:
-                        release = recording['releases'][0]
-                        release_info = {
-                            'album': release.get('title'),
-                            'year': release.get('date', '')[:4] if release.get('date') else None
-                        }
-                    
-                    return {
-                        'title': recording.get('title'),
-                        'artist': artist_name,
-                        'duration': recording.get('length'),
-                        'musicbrainz_id': recording.get('id'),
-                        'source': 'musicbrainz',
-                        **release_info
-                    }
+                return self._parse_musicbrainz(response.json())
             
-            return {'source': 'musicbrainz', 'error': 'No results found'}
+            return self._status_error('musicbrainz', response.status_code, 'No results found')
             
         except Exception as e:
             return {'source': 'musicbrainz', 'error': str(e)}
@@ -269,7 +337,7 @@ class MusicResearchAgent:
             Return only valid JSON.
             """
             
-            response = client.chat.completions.create(
+            response = openai_client().chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a music metadata extraction expert. Analyze search results and provide structured music information in JSON format."},
@@ -279,12 +347,6 @@ class MusicResearchAgent:
                 max_tokens=500
             )
             
-            result_text = response.choices[0].message.content.strip()
-            
-            # Try to parse JSON response
-            try:
-                # Remove any markdown formatting
-                if result_text.startswith('```'):
             result_content = response.choices[0].message.content
             result_text = result_content.strip() if result_content is not None else ""
             
@@ -305,48 +367,58 @@ class MusicResearchAgent:
             
         except Exception as e:
             return {'source': 'gpt', 'error': str(e)}
+    
+    def research_song(self, title: str, artist: str = "", use_gpt_fallback: bool = True) -> MusicProfile:
+        """Main method to research a song and return a MusicProfile"""
+        use_gpt = use_gpt_fallback and GPT_AVAILABLE
+        cached = self._cached_profile(title, artist, use_gpt)
+        if cached is not None:
+            print(f"⚡ Cached research. Confidence: {cached.confidence_score:.1%}")
+            return cached
+        
         # Collect data from all sources
         search_results = []
         
         # Wikipedia search
         print("🔍 Searching Wikipedia...")
-        wiki_data = self.search_wikipedia(title, artist)
+        wiki_data = self._search_cached('wikipedia', self.search_wikipedia, title, artist)
         search_results.append(wiki_data)
         
         # SongBPM search
         print("🎼 Searching SongBPM...")
-        def research_song(self, title: str, artist: str = "", use_gpt_fallback: bool = True) -> MusicProfile:
-            """Main method to research a song and return a MusicProfile"""
-            # Collect data from all sources
-            search_results = []
-            
-            # Wikipedia search
-            print("🔍 Searching Wikipedia...")
-            wiki_data = self.search_wikipedia(title, artist)
-            search_results.append(wiki_data)
-            
-            # SongBPM search
-            print("🎼 Searching SongBPM...")
-            songbpm_data = self.search_songbpm(title, artist)
-            search_results.append(songbpm_data)
-            
-            # MusicBrainz search
-            print("🎹 Searching MusicBrainz...")
-            musicbrainz_data = self.search_musicbrainz(title, artist)
-            search_results.append(musicbrainz_data)
-            
-            # GPT synthesis (if enabled)
-            gpt_data = {}
-            if use_gpt_fallback and GPT_AVAILABLE:
-                print("🤖 Using GPT for metadata synthesis...")
-                gpt_data = self.gpt_extract_metadata(search_results, title, artist)
-                search_results.append(gpt_data)
-            
-            # Synthesize final profile
-            profile = self._synthesize_profile(title, artist, search_results, gpt_data)
-            
-            print(f"✅ Research complete! Confidence: {profile.confidence_score:.1%}")
-            return profile
+        songbpm_data = self._search_cached('songbpm', self.search_songbpm, title, artist)
+        search_results.append(songbpm_data)
+        
+        # MusicBrainz search
+        print("🎹 Searching MusicBrainz...")
+        musicbrainz_data = self._search_cached('musicbrainz', self.search_musicbrainz, title, artist)
+        search_results.append(musicbrainz_data)
+        
+        # GPT synthesis (if enabled)
+        gpt_data = {}
+        if use_gpt:
+            print("🤖 Using GPT for metadata synthesis...")
+            gpt_data = self._search_cached(
+                'gpt', lambda t, a: self.gpt_extract_metadata(search_results, t, a), title, artist
+            )
+            search_results.append(gpt_data)
+        
+        # Synthesize final profile
+        profile = self._synthesize_profile(title, artist, search_results, gpt_data)
+        self._store_profile(title, artist, use_gpt, profile, search_results)
+        
+        print(f"✅ Research complete! Confidence: {profile.confidence_score:.1%}")
+        return profile
+    
+    def _synthesize_profile(self, title: str, artist: str, search_results: List[Dict], gpt_data: Dict) -> MusicProfile:
+        """Synthesize all search results into a unified MusicProfile"""
+        profile = MusicProfile(title=title, artist=artist)
+        confidence_factors = []
+        
+        # Collect all sources that provided data
+        for result in search_results:
+            if 'error' not in result and result.get('source'):
+                profile.sources.append(result['source'])
         
         # Extract data with source priority: GPT > Wikipedia > SongBPM > MusicBrainz
         source_priority = ['gpt', 'wikipedia', 'songbpm', 'musicbrainz']
@@ -406,11 +478,27 @@ class MusicResearchAgent:
         return profile
 
 # Example usage and testing
+def print_profile(profile: MusicProfile) -> None:
+    print(f"\n📊 Music Profile:")
+    print(f"   🎵 Title: {profile.title}")
+    print(f"   🎤 Artist: {profile.artist}")
+    print(f"   🥁 BPM: {profile.bpm or 'Unknown'}")
+    print(f"   🎹 Key: {profile.key or 'Unknown'}")
+    print(f"   🎼 Genre: {profile.genre or 'Unknown'}")
+    print(f"   📅 Year: {profile.year or 'Unknown'}")
+    print(f"   📈 Confidence: {profile.confidence_score:.1%}")
+    print(f"   🔍 Sources: {', '.join(profile.sources)}")
+    
+    if profile.summary:
+        print(f"   📝 Summary: {profile.summary[:100]}...")
+    
+    if profile.additional_metadata:
+        print(f"   ➕ Additional: {list(profile.additional_metadata.keys())}")
+
 def main():
     """Example usage of the Music Research Agent"""
-    
-    # Initialize agent (you'll need a SongBPM API key for full functionality)
-    agent = MusicResearchAgent()
+    import asyncio
+    from async_music_agent import AsyncMusicResearchAgent
     
     # Test songs
     test_songs = [
@@ -420,25 +508,19 @@ def main():
         ("Shape of You", "Ed Sheeran")
     ]
     
-    for title, artist in test_songs:
-        print(f"\n{'='*60}")
-        profile = agent.research_song(title, artist)
-        
-        print(f"\n📊 Music Profile:")
-        print(f"   🎵 Title: {profile.title}")
-        print(f"   🎤 Artist: {profile.artist}")
-        print(f"   🥁 BPM: {profile.bpm or 'Unknown'}")
-        print(f"   🎹 Key: {profile.key or 'Unknown'}")
-        print(f"   🎼 Genre: {profile.genre or 'Unknown'}")
-        print(f"   📅 Year: {profile.year or 'Unknown'}")
-        print(f"   📈 Confidence: {profile.confidence_score:.1%}")
-        print(f"   🔍 Sources: {', '.join(profile.sources)}")
-        
-        if profile.summary:
-            print(f"   📝 Summary: {profile.summary[:100]}...")
-        
-        if profile.additional_metadata:
-            print(f"   ➕ Additional: {list(profile.additional_metadata.keys())}")
+    async def research_all():
+        # Initialize agent (you'll need a SongBPM API key for full functionality)
+        async with AsyncMusicResearchAgent() as agent:
+            # All songs at once; each profile is printed as soon as it is ready
+            async for item in agent.research_many(test_songs):
+                print(f"\n{'='*60}")
+                if item.error is not None:
+                    print(f"❌ {item.title}: {item.error}")
+                    continue
+                print_profile(item.profile)
+            print(f"\n📈 Progress: {item.progress}")
+    
+    asyncio.run(research_all())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,227 @@
+"""
+Outbound request scheduler: per-host token buckets, priorities and backoff
+Every request to an external API waits for its host's rate; Retry-After and 503 pause the whole host
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from metrics import Counter, Histogram
+
+# host=requests per second[:burst], comma-separated; subdomains share their host's limit
+DEFAULT_RATE_LIMITS = "musicbrainz.org=1,api.getsongbpm.com=2,wikipedia.org=20:40"
+OUTBOUND_RATE_LIMITS = os.getenv("OUTBOUND_RATE_LIMITS", DEFAULT_RATE_LIMITS)
+# Requests per second to hosts without a configured limit
+OUTBOUND_DEFAULT_RATE = float(os.getenv("OUTBOUND_DEFAULT_RATE", "10"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "4"))
+# Backoff before retry n is uniform in [0, min(max, base * 2**n)] seconds
+OUTBOUND_BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", "0.5"))
+OUTBOUND_BACKOFF_MAX = float(os.getenv("OUTBOUND_BACKOFF_MAX", "30"))
+# Longest Retry-After honoured; a host asking for more is retried after this
+OUTBOUND_MAX_RETRY_AFTER = float(os.getenv("OUTBOUND_MAX_RETRY_AFTER", "120"))
+
+# Responses worth retrying; 429 and 503 also pause every request to the host
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# Lower runs first: interactive lookups overtake queued playlist research
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Queue wait buckets in seconds, up to two minutes of throttling
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """{host: (rate, burst)} from "host=rate[:burst],..."; burst defaults to max(1, rate)"""
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        host, _, value = entry.partition("=")
+        rate, _, burst = value.partition(":")
+        limits[host.strip().lower()] = (float(rate), float(burst) if burst else max(1.0, float(rate)))
+    return limits
+
+
+def retry_after_seconds(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds a Retry-After header (delay-seconds or HTTP-date) asks to wait"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+class HostLimiter:
+    """Token bucket and waiting requests of one host"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def try_take(self, now: float) -> float:
+        """Take a token if one is free and the host is not paused; otherwise seconds to wait"""
+        with self.lock:
+            self._refill(now)
+            delay = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+            if delay <= 0:
+                self.tokens -= 1
+            return max(0.0, delay)
+
+    def pause(self, until: float) -> None:
+        with self.lock:
+            self.paused_until = max(self.paused_until, until)
+
+
+class OutboundScheduler:
+    """Shared outbound rate limits for every agent in the process
+
+    acquire() waits for a token from the host's bucket. Waiters are served
+    by priority, then in arrival order, so an interactive lookup is not
+    stuck behind a queued playlist. pause() stops a host for a while, e.g.
+    for its Retry-After. Queue wait times are recorded per host.
+    """
+
+    def __init__(self, limits: str = OUTBOUND_RATE_LIMITS, default_rate: float = OUTBOUND_DEFAULT_RATE,
+                 max_retries: int = OUTBOUND_MAX_RETRIES, backoff_base: float = OUTBOUND_BACKOFF_BASE,
+                 backoff_max: float = OUTBOUND_BACKOFF_MAX, prefix: str = "lyrics"):
+        self.limits = parse_rate_limits(limits)
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._hosts: Dict[str, HostLimiter] = {}
+        self._hosts_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self.queue_wait = Histogram(f"{prefix}_outbound_queue_wait_seconds",
+                                    "Time outbound requests waited for their host's rate limit", WAIT_BUCKETS)
+        self.responses = Counter(f"{prefix}_outbound_responses_total", "Outbound responses by host and status")
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+    def host(self, host: str) -> HostLimiter:
+        """The limiter of ``host`` ("name" or "name:port")"""
+        host = host.lower()
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            with self._hosts_lock:
+                limiter = self._hosts.get(host)
+                if limiter is None:
+                    hostname = host.rsplit(":", 1)[0]
+                    rate, burst = next(
+                        (limit for domain, limit in self.limits.items()
+                         if hostname == domain or hostname.endswith("." + domain)),
+                        (self.default_rate, max(1.0, self.default_rate)),
+                    )
+                    limiter = self._hosts[host] = HostLimiter(host, rate, burst)
+        return limiter
+
+    async def acquire(self, host: str, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Wait for a request slot at ``host``; returns the seconds waited"""
+        limiter = self.host(host)
+        self.requests += 1
+        started = time.monotonic()
+        if not limiter.waiters and limiter.try_take(started) == 0:
+            self.queue_wait.observe(0.0, host=limiter.name)
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(limiter.waiters, (priority, next(self._sequence), future))
+        if limiter.dispatcher is None or limiter.dispatcher.done():
+            limiter.dispatcher = loop.create_task(self._dispatch(limiter))
+        await future
+        waited = time.monotonic() - started
+        self.queue_wait.observe(waited, host=limiter.name)
+        return waited
+
+    async def _dispatch(self, limiter: HostLimiter) -> None:
+        """Hand out the host's tokens to its waiters, best priority first"""
+        while limiter.waiters:
+            future = limiter.waiters[0][2]
+            if future.done():
+                # The waiter was cancelled (e.g. its source timed out)
+                heapq.heappop(limiter.waiters)
+                continue
+            delay = limiter.try_take(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(limiter.waiters)
+            future.set_result(None)
+
+    def acquire_blocking(self, host: str) -> float:
+        """acquire() for synchronous callers: sleep until a token is free"""
+        limiter = self.host(host)
+        self.requests += 1
+        started = time.monotonic()
+        while True:
+            delay = limiter.try_take(time.monotonic())
+            if delay <= 0:
+                break
+            time.sleep(delay)
+        waited = time.monotonic() - started
+        self.queue_wait.observe(waited, host=limiter.name)
+        return waited
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry ``attempt`` (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_delay(self, host: str, status: Optional[int], attempt: int,
+                    retry_after: Optional[str] = None) -> Optional[float]:
+        """Record a response; seconds to wait before retrying it, or None to keep it
+
+        ``status`` is None for a connection error. A 429 or 503 pauses every
+        request to the host, for Retry-After if given; the caller then only
+        needs to acquire() again. Attempt ``max_retries`` is the last.
+        """
+        if status is not None:
+            self.responses.inc(host=self.host(host).name, status=str(status))
+        if attempt >= self.max_retries or (status is not None and status not in RETRY_STATUSES):
+            return None
+        self.retries += 1
+        requested = retry_after_seconds(retry_after)
+        delay = min(requested, OUTBOUND_MAX_RETRY_AFTER) if requested is not None else self.backoff(attempt)
+        if status in THROTTLE_STATUSES:
+            self.throttled += 1
+            self.host(host).pause(time.monotonic() + delay)
+            return 0.0
+        return delay
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "queued": sum(len(limiter.waiters) for limiter in list(self._hosts.values())),
+        }
+
+
+# One scheduler per process, so every agent shares each host's limit
+outbound_scheduler = OutboundScheduler()
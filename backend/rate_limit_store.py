@@ -0,0 +1,253 @@
+"""
+Token-bucket rate limits shared by every worker process on a host
+Buckets live in one SQLite file (WAL); a check is a single atomic UPSERT, no network round trip
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from limits import RateLimitItem
+from limits.storage import Storage
+from limits.strategies import STRATEGIES, RateLimiter
+from limits.util import WindowStats
+
+# Every worker must point at the same file; the default is per host
+RATE_LIMIT_STORAGE_URI = os.getenv(
+    "RATE_LIMIT_STORAGE_URI",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "lyric_analysis_rate_limits.db"),
+)
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "token-bucket")
+# Local "bucket is empty" entries kept per worker before the map is cleared
+RATE_LIMIT_EMPTY_CACHE = int(os.getenv("RATE_LIMIT_EMPTY_CACHE", "10000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    granted INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revoked (
+    digest BLOB PRIMARY KEY,
+    until REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Tokens after refilling for the time since the last update; in an UPDATE
+# every column reference reads the row as it was before the statement
+_REFILLED = "min(:capacity, tokens + max(0.0, :now - updated) * :rate)"
+_ACQUIRE = f"""
+INSERT INTO buckets (key, tokens, updated, granted) VALUES (:key, :initial, :now, :fits)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = {_REFILLED} - (CASE WHEN {_REFILLED} >= :cost THEN :cost ELSE 0 END),
+    granted = {_REFILLED} >= :cost,
+    updated = max(updated, :now)
+RETURNING tokens, granted
+"""
+_INCR = """
+INSERT INTO counters (key, value, expires) VALUES (:key, :amount, :now + :expiry)
+ON CONFLICT (key) DO UPDATE SET
+    value = CASE WHEN expires <= :now THEN :amount ELSE value + :amount END,
+    expires = CASE WHEN expires <= :now THEN :now + :expiry ELSE expires END
+RETURNING value
+"""
+
+
+def sqlite_path(uri: str) -> str:
+    """File path of a ``sqlite:///relative`` or ``sqlite:////absolute`` URI"""
+    path = uri.split("://", 1)[1]
+    return path[1:] if path.startswith("/") else path
+
+
+class SQLiteStorage(Storage):
+    """limits storage in a SQLite file shared by the workers of one host
+
+    Besides the counters the standard limits strategies use, it keeps token
+    buckets for TokenBucketRateLimiter and the digests of revoked credentials
+    (token_cache.VerifiedTokenCache), which reset() leaves alone. Each process opens its own
+    connection on first use (after any fork); writes are single autocommit
+    statements, and SQLite serializes them across processes.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str = RATE_LIMIT_STORAGE_URI, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = sqlite_path(uri)
+        self.timeout = float(options.get("timeout", 5.0))
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self.resets = 0  # lets limiters drop state cached from before a reset
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Limits are disposable state; losing the last writes on power loss is fine
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _execute(self, sql: str, parameters=()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    # Token buckets
+
+    def acquire_bucket(self, key: str, capacity: float, rate: float, cost: float = 1,
+                       now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take ``cost`` tokens from the bucket if it holds them
+
+        Buckets start full with ``capacity`` tokens and refill at ``rate``
+        tokens per second. Returns ``(granted, tokens left)``.
+        """
+        now = time.time() if now is None else now
+        fits = capacity >= cost
+        (tokens, granted), = self._execute(_ACQUIRE, {
+            "key": key, "capacity": capacity, "rate": rate, "cost": cost, "now": now,
+            "initial": capacity - cost if fits else capacity, "fits": fits,
+        })
+        return bool(granted), tokens
+
+    def bucket_tokens(self, key: str, capacity: float, rate: float, now: Optional[float] = None) -> float:
+        """Tokens in the bucket now, without taking any"""
+        now = time.time() if now is None else now
+        rows = self._execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,))
+        if not rows:
+            return capacity
+        tokens, updated = rows[0]
+        return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+    # Revoked credentials
+
+    def revoke(self, digest: bytes, until: float) -> None:
+        """Reject a credential digest on every worker until ``until``"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM revoked WHERE until <= ?", (time.time(),))
+            connection.execute(
+                "INSERT INTO revoked (digest, until) VALUES (?, ?)"
+                " ON CONFLICT (digest) DO UPDATE SET until = max(until, excluded.until)",
+                (digest, until),
+            )
+
+    def revoked_until(self, digest: bytes) -> Optional[float]:
+        """When a revocation of ``digest`` ends, or None if it was never revoked"""
+        rows = self._execute("SELECT until FROM revoked WHERE digest = ?", (digest,))
+        return rows[0][0] if rows else None
+
+    def clear_revoked(self) -> None:
+        self._execute("DELETE FROM revoked")
+
+    # limits.storage.Storage
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        (value,), = self._execute(_INCR, {"key": key, "amount": amount, "expiry": expiry, "now": time.time()})
+        return value
+
+    def get(self, key: str) -> int:
+        rows = self._execute("SELECT value FROM counters WHERE key = ? AND expires > ?", (key, time.time()))
+        return rows[0][0] if rows else 0
+
+    def get_expiry(self, key: str) -> float:
+        rows = self._execute("SELECT expires FROM counters WHERE key = ?", (key,))
+        return rows[0][0] if rows else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._lock:
+            self.resets += 1
+            connection = self._connect()
+            removed = connection.execute("DELETE FROM buckets").rowcount
+            return removed + connection.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM buckets WHERE key = ?", (key,))
+            connection.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """Token buckets: "20/minute" holds 20 tokens and refills one every 3 seconds
+
+    Unlike a fixed window, a client cannot spend a full window twice across a
+    window boundary. A bucket found empty is remembered locally with its level,
+    and further hits are rejected without touching storage until enough tokens
+    could have been refilled; other workers only ever take tokens, so that
+    answer is exact.
+    """
+
+    def __init__(self, storage: SQLiteStorage):
+        if not hasattr(storage, "acquire_bucket"):
+            raise TypeError("token-bucket rate limiting needs a sqlite:// storage")
+        super().__init__(storage)
+        self._empty: Dict[str, Tuple[float, float]] = {}
+        self._resets = storage.resets
+
+    @staticmethod
+    def _bucket(item: RateLimitItem) -> Tuple[float, float]:
+        return item.amount, item.amount / item.get_expiry()
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        key = item.key_for(*identifiers)
+        capacity, rate = self._bucket(item)
+        now = time.time()
+        if self._resets != self.storage.resets:
+            self._empty = {}
+            self._resets = self.storage.resets
+        empty = self._empty.get(key)
+        if empty is not None and empty[1] + (now - empty[0]) * rate < cost:
+            return False
+        granted, tokens = self.storage.acquire_bucket(key, capacity, rate, cost, now)
+        if granted:
+            self._empty.pop(key, None)
+        else:
+            if len(self._empty) >= RATE_LIMIT_EMPTY_CACHE:
+                self._empty.clear()
+            self._empty[key] = (now, tokens)
+        return granted
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        capacity, rate = self._bucket(item)
+        return self.storage.bucket_tokens(item.key_for(*identifiers), capacity, rate) >= cost
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        """(time the bucket is full again, whole tokens left)"""
+        capacity, rate = self._bucket(item)
+        now = time.time()
+        tokens = self.storage.bucket_tokens(item.key_for(*identifiers), capacity, rate, now)
+        return WindowStats(now + (capacity - tokens) / rate, math.floor(tokens))
+
+    def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        key = item.key_for(*identifiers)
+        self._empty.pop(key, None)
+        self.storage.clear(key)
+
+
+# Selectable as Limiter(strategy="token-bucket")
+STRATEGIES.setdefault("token-bucket", TokenBucketRateLimiter)
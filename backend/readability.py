@@ -0,0 +1,198 @@
+"""
+Readability formulas over the counts of an already tokenized LyricDocument
+Same definitions as textstat (English), without re-tokenizing or re-counting syllables
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable
+
+from lyric_document import LyricDocument
+
+SENTENCE_END = re.compile(r'[.!?]+')
+_HAS_WORD = re.compile(r'\w')
+
+# A sentence of two words or fewer ("Oh yeah!") is not counted, as in textstat
+MIN_SENTENCE_WORDS = 3
+# Words of this many syllables or more are polysyllables (SMOG)
+POLYSYLLABLE = 3
+
+
+@dataclass(frozen=True)
+class SentenceRuns:
+    """Sentence structure of a run of tokens, composable across runs
+
+    opening   words before the first sentence end (all words without one)
+    sentences counted sentences between the first and the last sentence end
+    trailing  words after the last sentence end
+    closed    whether the run contains a sentence end
+
+    Runs add associatively, so the runs of a text's lines can be combined
+    in order; sentences that span lines come out the same as for the whole
+    text.
+    """
+    opening: int = 0
+    sentences: int = 0
+    trailing: int = 0
+    closed: bool = False
+
+    def __add__(self, other: "SentenceRuns") -> "SentenceRuns":
+        if not self.closed:
+            if not other.closed:
+                return SentenceRuns(self.opening + other.opening)
+            return SentenceRuns(self.opening + other.opening, other.sentences, other.trailing, True)
+        if not other.closed:
+            return SentenceRuns(self.opening, self.sentences, self.trailing + other.opening, True)
+        middle = self.trailing + other.opening >= MIN_SENTENCE_WORDS
+        return SentenceRuns(self.opening, self.sentences + other.sentences + middle, other.trailing, True)
+
+    @property
+    def count(self) -> int:
+        """Sentences in the run, or 0 when it has no words"""
+        if not self.closed:
+            return 1 if self.opening else 0
+        counted = (self.sentences + (self.opening >= MIN_SENTENCE_WORDS)
+                   + (self.trailing >= MIN_SENTENCE_WORDS))
+        return max(1, counted)
+
+
+def sentence_runs(tokens: Iterable[str]) -> SentenceRuns:
+    """Split ``tokens`` into sentences at runs of ".", "!" and "?"
+
+    A sentence end may fall inside a token ("now...wait"); the pieces on
+    either side count as a word if they contain a word character.
+    """
+    opening = -1
+    sentences = 0
+    words = 0
+    has_word = _HAS_WORD.search
+    for token in tokens:
+        if '.' not in token and '!' not in token and '?' not in token:
+            words += has_word(token) is not None
+            continue
+        pieces = SENTENCE_END.split(token)
+        for piece in pieces[:-1]:
+            words += has_word(piece) is not None
+            if opening < 0:
+                opening = words
+            elif words >= MIN_SENTENCE_WORDS:
+                sentences += 1
+            words = 0
+        words += has_word(pieces[-1]) is not None
+    if opening < 0:
+        return SentenceRuns(words)
+    return SentenceRuns(opening, sentences, words, True)
+
+
+@dataclass(frozen=True)
+class ReadabilityCounts:
+    """The counts every readability formula is built from
+
+    words       tokens with a word character (punctuation-only tokens are not words)
+    tokens      all whitespace-separated tokens
+    syllables   syllables of the words
+    polysyllables  words of POLYSYLLABLE syllables or more
+    letters     word characters
+    characters  non-whitespace characters
+    """
+    words: int = 0
+    tokens: int = 0
+    syllables: int = 0
+    polysyllables: int = 0
+    letters: int = 0
+    characters: int = 0
+    runs: SentenceRuns = field(default_factory=SentenceRuns)
+
+    def __add__(self, other: "ReadabilityCounts") -> "ReadabilityCounts":
+        return ReadabilityCounts(
+            self.words + other.words,
+            self.tokens + other.tokens,
+            self.syllables + other.syllables,
+            self.polysyllables + other.polysyllables,
+            self.letters + other.letters,
+            self.characters + other.characters,
+            self.runs + other.runs,
+        )
+
+    @property
+    def sentences(self) -> int:
+        return self.runs.count
+
+
+def document_counts(doc: LyricDocument) -> ReadabilityCounts:
+    """Readability counts from a document's tokens and syllables
+
+    ``doc`` must have been built with a syllable counter.
+    """
+    words = syllables = polysyllables = letters = 0
+    for cleaned, count in zip(doc.cleaned, doc.syllables):
+        if cleaned:
+            words += 1
+            letters += len(cleaned)
+            syllables += count
+            polysyllables += count >= POLYSYLLABLE
+    return ReadabilityCounts(
+        words=words,
+        tokens=doc.word_count,
+        syllables=syllables,
+        polysyllables=polysyllables,
+        letters=letters,
+        characters=sum(map(len, doc.tokens)),
+        runs=sentence_runs(doc.tokens),
+    )
+
+
+def total_counts(counts: Iterable[ReadabilityCounts]) -> ReadabilityCounts:
+    """Counts of consecutive runs of text, e.g. the lines of a document"""
+    total = ReadabilityCounts()
+    for part in counts:
+        total = total + part
+    return total
+
+
+def flesch_reading_ease(counts: ReadabilityCounts) -> float:
+    if not counts.words or not counts.syllables:
+        return 0.0
+    return (206.835 - 1.015 * counts.words / counts.sentences
+            - 84.6 * counts.syllables / counts.words)
+
+
+def flesch_kincaid_grade(counts: ReadabilityCounts) -> float:
+    if not counts.words or not counts.syllables:
+        return 0.0
+    return 0.39 * counts.words / counts.sentences + 11.8 * counts.syllables / counts.words - 15.59
+
+
+def smog_index(counts: ReadabilityCounts) -> float:
+    if not counts.sentences:
+        return 0.0
+    return 1.043 * (30 * counts.polysyllables / counts.sentences) ** 0.5 + 3.1291
+
+
+def coleman_liau_index(counts: ReadabilityCounts) -> float:
+    if not counts.words or not counts.letters:
+        return 0.0
+    letters = counts.letters / counts.words * 100
+    sentences = counts.sentences / counts.words * 100
+    return 0.058 * letters - 0.296 * sentences - 15.8
+
+
+def automated_readability_index(counts: ReadabilityCounts) -> float:
+    if not counts.words or not counts.tokens:
+        return 0.0
+    # textstat divides characters by all tokens but words by words
+    return 4.71 * counts.characters / counts.tokens + 0.5 * counts.words / counts.sentences - 21.43
+
+
+READABILITY_FORMULAS = {
+    "fleschReadingEase": flesch_reading_ease,
+    "fleschKincaidGrade": flesch_kincaid_grade,
+    "smogIndex": smog_index,
+    "colemanLiauIndex": coleman_liau_index,
+    "automatedReadabilityIndex": automated_readability_index,
+}
+
+
+def readability_scores(counts: ReadabilityCounts) -> Dict[str, float]:
+    """Every readability formula, rounded to two decimals"""
+    return {name: round(formula(counts), 2) for name, formula in READABILITY_FORMULAS.items()}
@@ -0,0 +1,339 @@
+"""
+Persistent cache of music research results
+Per-source payloads and synthesized profiles in one SQLite file (WAL), each with its own TTL
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+RESEARCH_CACHE_ENABLED = os.getenv("RESEARCH_CACHE", "true").lower() == "true"
+RESEARCH_CACHE_PATH = os.getenv(
+    "RESEARCH_CACHE_PATH", os.path.join(tempfile.gettempdir(), "music_research_cache.db")
+)
+_DAY = 86400.0
+# Song metadata rarely changes; keep found results for weeks
+SOURCE_TTLS = {
+    "wikipedia": float(os.getenv("RESEARCH_TTL_WIKIPEDIA", str(30 * _DAY))),
+    "songbpm": float(os.getenv("RESEARCH_TTL_SONGBPM", str(30 * _DAY))),
+    "musicbrainz": float(os.getenv("RESEARCH_TTL_MUSICBRAINZ", str(30 * _DAY))),
+    "gpt": float(os.getenv("RESEARCH_TTL_GPT", str(30 * _DAY))),
+}
+RESEARCH_PROFILE_TTL = float(os.getenv("RESEARCH_TTL_PROFILE", str(7 * _DAY)))
+# "No results found" answers may change once a source indexes the song
+RESEARCH_NEGATIVE_TTL = float(os.getenv("RESEARCH_NEGATIVE_TTL", "3600"))
+# Errors and timeouts are retried soon, but not on every request
+RESEARCH_ERROR_TTL = float(os.getenv("RESEARCH_ERROR_TTL", "60"))
+
+# Errors that say nothing about the song are never cached; a profile missing
+# a source for lack of configuration is still complete
+CONFIG_ERRORS = ("API key not provided", "OpenAI not available")
+UNCACHED_ERRORS = CONFIG_ERRORS + ("Deadline exceeded",)
+NEGATIVE_ERRORS = ("No results found", "No relevant")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    song TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    negative INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (song, kind)
+) WITHOUT ROWID;
+"""
+_UPSERT = """
+INSERT INTO entries (song, kind, payload, negative, stored, expires)
+VALUES (:song, :kind, :payload, :negative, :stored, :expires)
+ON CONFLICT (song, kind) DO UPDATE SET
+    payload = excluded.payload, negative = excluded.negative,
+    stored = excluded.stored, expires = excluded.expires
+WHERE excluded.stored >= entries.stored
+"""
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Case, accents-as-composed, punctuation and spacing folded away"""
+    return _NON_WORD.sub(' ', unicodedata.normalize('NFKC', text or '').casefold()).strip()
+
+
+def song_key(title: str, artist: str = "") -> str:
+    """Cache key of a song: "Blinding Lights!" by "the weeknd" is "blinding lights|the weeknd" """
+    return f"{normalize(title)}|{normalize(artist)}"
+
+
+def profile_kind(use_gpt: bool) -> str:
+    return "profile+gpt" if use_gpt else "profile"
+
+
+class ResearchCache:
+    """Research results keyed by normalized title and artist
+
+    Found results live for their source's TTL. "No results found" answers
+    are kept for RESEARCH_NEGATIVE_TTL and other errors for
+    RESEARCH_ERROR_TTL, so a missing song or a failing source is not asked
+    again on every request. A profile lives no longer than the shortest-lived
+    result it was built from. Each process opens its own connection on first
+    use; writes are single autocommit statements.
+    """
+
+    def __init__(self, path: str = RESEARCH_CACHE_PATH, source_ttls: Optional[Dict[str, float]] = None,
+                 profile_ttl: float = RESEARCH_PROFILE_TTL, negative_ttl: float = RESEARCH_NEGATIVE_TTL,
+                 error_ttl: float = RESEARCH_ERROR_TTL):
+        self.path = path
+        self.source_ttls = {**SOURCE_TTLS, **(source_ttls or {})}
+        self.profile_ttl = profile_ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _execute(self, sql: str, parameters=()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def _get(self, song: str, kind: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute(
+            "SELECT payload, negative FROM entries WHERE song = ? AND kind = ? AND expires > ?",
+            (song, kind, time.time()),
+        )
+        if not rows:
+            self.misses += 1
+            return None
+        payload, negative = rows[0]
+        self.hits += 1
+        self.negative_hits += negative
+        return json.loads(payload)
+
+    def _put(self, song: str, kind: str, payload: Dict[str, Any], ttl: float, negative: bool = False) -> None:
+        if ttl <= 0:
+            return
+        now = time.time()
+        self._execute(_UPSERT, {
+            "song": song, "kind": kind, "payload": json.dumps(payload, default=str),
+            "negative": int(negative), "stored": now, "expires": now + ttl,
+        })
+        self.writes += 1
+
+    def result_ttl(self, result: Dict[str, Any]) -> float:
+        """Seconds to keep a source result; 0 for results not worth keeping"""
+        error = result.get('error')
+        if error is None:
+            return self.source_ttls.get(result.get('source'), self.profile_ttl)
+        error = str(error)
+        if error.startswith(UNCACHED_ERRORS):
+            return 0.0
+        if error.startswith(NEGATIVE_ERRORS):
+            return self.negative_ttl
+        return self.error_ttl
+
+    def _profile_ttl(self, result: Dict[str, Any]) -> float:
+        """Longest a profile built from ``result`` should be kept"""
+        error = str(result.get('error', ''))
+        if error.startswith(CONFIG_ERRORS):
+            return self.profile_ttl
+        if error.startswith(UNCACHED_ERRORS):
+            return self.error_ttl
+        return self.result_ttl(result)
+
+    # Source results
+
+    def get_result(self, source: str, title: str, artist: str = "") -> Optional[Dict[str, Any]]:
+        """A source's cached result for the song (possibly an error result), or None"""
+        return self._get(song_key(title, artist), source)
+
+    def put_result(self, title: str, artist: str, result: Dict[str, Any]) -> None:
+        self._put(song_key(title, artist), result['source'], result,
+                  self.result_ttl(result), negative='error' in result)
+
+    # Profiles
+
+    def get_profile(self, title: str, artist: str = "", use_gpt: bool = True) -> Optional[Dict[str, Any]]:
+        """Fields of the cached MusicProfile, or None"""
+        return self._get(song_key(title, artist), profile_kind(use_gpt))
+
+    def put_profile(self, title: str, artist: str, use_gpt: bool, profile: Dict[str, Any],
+                    search_results: Sequence[Dict[str, Any]] = ()) -> None:
+        """Keep a profile as long as every result it was built from is kept"""
+        ttl = min([self.profile_ttl, *(self._profile_ttl(result) for result in search_results)])
+        self._put(song_key(title, artist), profile_kind(use_gpt), profile, ttl)
+
+    # Maintenance
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._connect().execute("DELETE FROM entries WHERE expires <= ?", (time.time(),)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+
+    def export(self) -> Iterator[Dict[str, Any]]:
+        """Every unexpired entry, as records load() accepts"""
+        rows = self._execute(
+            "SELECT song, kind, payload, negative, stored, expires FROM entries WHERE expires > ? ORDER BY song, kind",
+            (time.time(),),
+        )
+        for song, kind, payload, negative, stored, expires in rows:
+            yield {"song": song, "kind": kind, "payload": json.loads(payload),
+                   "negative": bool(negative), "stored": stored, "expires": expires}
+
+    def load(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Add exported entries, keeping their expiry; newer entries already cached win"""
+        now = time.time()
+        rows = [
+            {"song": r["song"], "kind": r["kind"], "payload": json.dumps(r["payload"], default=str),
+             "negative": int(r.get("negative", False)), "stored": r["stored"], "expires": r["expires"]}
+            for r in records if r["expires"] > now
+        ]
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(_UPSERT, rows)
+            except Exception:
+                # Leave nothing half-loaded, and the connection usable
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        (entries, negative), = self._execute(
+            "SELECT count(*), coalesce(sum(negative), 0) FROM entries WHERE expires > ?", (time.time(),)
+        )
+        return {
+            "entries": entries,
+            "negativeEntries": negative,
+            "hits": self.hits,
+            "negativeHits": self.negative_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+
+_shared_cache: Optional[ResearchCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_research_cache() -> Optional[ResearchCache]:
+    """The process-wide cache at RESEARCH_CACHE_PATH, or None when RESEARCH_CACHE is off"""
+    global _shared_cache
+    if not RESEARCH_CACHE_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResearchCache()
+        return _shared_cache
+
+
+def read_songs(lines: Iterable[str]) -> List[Tuple[str, str]]:
+    """(title, artist) pairs from "title<TAB>artist" lines; blank lines and #comments skipped"""
+    songs = []
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        title, _, artist = line.partition('\t')
+        songs.append((title.strip(), artist.strip()))
+    return songs
+
+
+async def warm(cache: ResearchCache, songs: Sequence[Tuple[str, str]], use_gpt_fallback: bool = True,
+               **agent_options) -> int:
+    """Research every song not cached yet; returns how many were researched
+
+    Songs go through research_many: bulk priority in the outbound scheduler,
+    bounded concurrency per source. Failures are reported on stderr.
+    ``agent_options`` go to AsyncMusicResearchAgent (e.g. endpoints).
+    """
+    from async_music_agent import GPT_AVAILABLE, AsyncMusicResearchAgent
+
+    use_gpt = use_gpt_fallback and GPT_AVAILABLE
+    unique: Dict[str, Tuple[str, str]] = {}
+    for title, artist in songs:
+        unique.setdefault(song_key(title, artist), (title, artist))
+    missing = [(title, artist) for title, artist in unique.values()
+               if cache.get_profile(title, artist, use_gpt) is None]
+    researched = 0
+    async with AsyncMusicResearchAgent(cache=cache, **agent_options) as agent:
+        async for item in agent.research_many(missing, use_gpt_fallback):
+            if item.error is None:
+                researched += 1
+            else:
+                print(f"Failed to research {item.title!r} by {item.artist!r}: {item.error}", file=sys.stderr)
+    return researched
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", default=RESEARCH_CACHE_PATH, help="cache file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm_parser = commands.add_parser("warm", help="research the songs of a title<TAB>artist file")
+    warm_parser.add_argument("songs", help="song list, - for stdin")
+    warm_parser.add_argument("--no-gpt", action="store_true", help="skip GPT synthesis")
+    export_parser = commands.add_parser("export", help="write unexpired entries as JSON lines")
+    export_parser.add_argument("output", nargs="?", default="-", help="output file, - for stdout")
+    load_parser = commands.add_parser("load", help="add entries written by export")
+    load_parser.add_argument("input", nargs="?", default="-", help="input file, - for stdin")
+    commands.add_parser("purge", help="delete expired entries")
+    commands.add_parser("stats", help="print entry counts")
+    args = parser.parse_args(argv)
+    cache = ResearchCache(args.path)
+
+    def open_file(name: str, mode: str) -> ContextManager[TextIO]:
+        if name == "-":
+            return contextlib.nullcontext(sys.stdout if "w" in mode else sys.stdin)
+        return open(name, mode, encoding="utf-8")
+
+    if args.command == "warm":
+        with open_file(args.songs, "r") as source:
+            songs = read_songs(source)
+        researched = asyncio.run(warm(cache, songs, not args.no_gpt))
+        print(f"Researched {researched} of {len(songs)} songs", file=sys.stderr)
+    elif args.command == "export":
+        with open_file(args.output, "w") as output:
+            count = 0
+            for record in cache.export():
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"Exported {count} entries", file=sys.stderr)
+    elif args.command == "load":
+        with open_file(args.input, "r") as source:
+            count = cache.load(json.loads(line) for line in source if line.strip())
+        print(f"Loaded {count} entries", file=sys.stderr)
+    elif args.command == "purge":
+        print(f"Purged {cache.purge_expired()} expired entries", file=sys.stderr)
+    else:
+        print(json.dumps(cache.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
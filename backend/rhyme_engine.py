@@ -0,0 +1,270 @@
+"""
+Phonetic rhyme keys and rhyme-scheme detection
+End words map to the sounds from their last stressed vowel onward (CMU dictionary)
+"""
+
+import mmap
+import os
+import re
+import string
+import struct
+import sys
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_RHYME_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rhymes.bin")
+RHYME_CACHE_SIZE = int(os.getenv("RHYME_CACHE_SIZE", "65536"))
+
+# A line rhymes when its key matches one of the previous RHYME_WINDOW lines,
+# which covers couplets (AABB), alternate (ABAB, ABCB) and enclosed (ABBA) rhyme
+RHYME_WINDOW = 3
+
+# Table layout (little endian):
+#   header  b"RHYM" | uint32 version | uint32 word count | uint32 string count
+#           | uint32 word blob size | uint32 string blob size
+#   words   uint32 blob offset per word, then uint32 rhyme key id per word,
+#           then uint32 vowel sequence id per word
+#   strings uint32 blob offset per string (rhyme keys and vowel sequences)
+#   blobs   UTF-8 words sorted by their encoded bytes, then ASCII strings
+TABLE_MAGIC = b"RHYM"
+TABLE_VERSION = 2
+HEADER = struct.Struct("<4sIIIII")
+
+VOWEL_RUN = re.compile(r'[aeiouy]+[^aeiouy]*$')
+VOWEL_GROUP = re.compile(r'[aeiouy]+')
+SCHEME_LETTERS = string.ascii_uppercase + string.ascii_lowercase
+
+
+def phonetic_rhyme_key(phones: Sequence[str]) -> Optional[str]:
+    """Phones from the last primary-stressed vowel (else the last vowel), stress removed"""
+    vowels = [i for i, phone in enumerate(phones) if phone[-1].isdigit()]
+    if not vowels:
+        return None
+    stressed = [i for i in vowels if phones[i][-1] == '1']
+    start = stressed[-1] if stressed else vowels[-1]
+    return ' '.join(phone.rstrip('012') for phone in phones[start:])
+
+
+def phonetic_vowels(phones: Sequence[str]) -> str:
+    """Stress-free vowel sounds of a pronunciation, e.g. "IH IH AH" for "lyrical" """
+    return ' '.join(phone.rstrip('012') for phone in phones if phone[-1].isdigit())
+
+
+def spelling_rhyme_key(word: str) -> Optional[str]:
+    """Fallback for words outside the dictionary: the last vowel group onward"""
+    if not word:
+        return None
+    match = VOWEL_RUN.search(word)
+    # "~" keeps spelled keys apart from phonetic ones
+    return "~" + (match.group(0) if match else word)
+
+
+def spelling_vowels(word: str) -> Tuple[str, ...]:
+    """Fallback vowel sounds: the spelled vowel groups, kept apart from phonemes"""
+    return tuple("~" + group for group in VOWEL_GROUP.findall(word))
+
+
+def write_rhyme_table(path: str, table: Dict[str, Tuple[str, str]]) -> None:
+    """Write a word -> (rhyme key, vowel sequence) mapping in the memory-mappable format"""
+    strings = sorted({value for entry in table.values() for value in entry})
+    string_ids = {value: i for i, value in enumerate(strings)}
+    entries = sorted(
+        (word.encode("utf-8"), string_ids[key], string_ids[vowels])
+        for word, (key, vowels) in table.items() if word
+    )
+
+    word_offsets = bytearray()
+    word_keys = bytearray()
+    word_vowels = bytearray()
+    word_blob = bytearray()
+    for encoded, key_id, vowels_id in entries:
+        word_offsets += struct.pack("<I", len(word_blob))
+        word_keys += struct.pack("<I", key_id)
+        word_vowels += struct.pack("<I", vowels_id)
+        word_blob += encoded
+    string_offsets = bytearray()
+    string_blob = bytearray()
+    for value in strings:
+        string_offsets += struct.pack("<I", len(string_blob))
+        string_blob += value.encode("ascii")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(entries), len(strings),
+                            len(word_blob), len(string_blob)))
+        f.write(word_offsets)
+        f.write(word_keys)
+        f.write(word_vowels)
+        f.write(string_offsets)
+        f.write(word_blob)
+        f.write(string_blob)
+    os.replace(tmp_path, path)
+
+
+class RhymeKeyTable:
+    """Read-only, memory-mapped word -> (rhyme key, vowels) table with binary search lookup"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, string_count, word_blob_size, string_blob_size = HEADER.unpack_from(self._mm, 0)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported rhyme table: {path}")
+
+        offsets_start = HEADER.size
+        keys_start = offsets_start + 4 * self.size
+        vowels_start = keys_start + 4 * self.size
+        string_offsets_start = vowels_start + 4 * self.size
+        self._blob_start = string_offsets_start + 4 * string_count
+        self._blob_end = self._blob_start + word_blob_size
+        if sys.byteorder == "little":
+            # Zero-copy views over the index; the file is little endian
+            view = memoryview(self._mm)
+            self._offsets = view[offsets_start:keys_start].cast("I")
+            self._key_ids = view[keys_start:vowels_start].cast("I")
+            self._vowel_ids = view[vowels_start:string_offsets_start].cast("I")
+        else:
+            self._offsets = struct.unpack_from(f"<{self.size}I", self._mm, offsets_start)
+            self._key_ids = struct.unpack_from(f"<{self.size}I", self._mm, keys_start)
+            self._vowel_ids = struct.unpack_from(f"<{self.size}I", self._mm, vowels_start)
+
+        # Tens of thousands of short strings; decode them once
+        string_offsets = struct.unpack_from(f"<{string_count}I", self._mm, string_offsets_start)
+        string_blob = self._mm[self._blob_end:self._blob_end + string_blob_size].decode("ascii")
+        bounds = list(string_offsets) + [string_blob_size]
+        self.strings: List[str] = [string_blob[bounds[i]:bounds[i + 1]] for i in range(string_count)]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _word(self, i: int) -> bytes:
+        offsets = self._offsets
+        start = self._blob_start + offsets[i]
+        end = self._blob_start + offsets[i + 1] if i + 1 < self.size else self._blob_end
+        return self._mm[start:end]
+
+    def _find(self, word: str) -> int:
+        target = word.encode("utf-8")
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._word(mid)
+            if entry < target:
+                lo = mid + 1
+            elif entry > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def get(self, word: str) -> Optional[str]:
+        """Return the rhyme key for a lowercased word, or None if unknown"""
+        i = self._find(word)
+        return self.strings[self._key_ids[i]] if i >= 0 else None
+
+    def vowels(self, word: str) -> Optional[str]:
+        """Return the space-separated vowel sounds of a lowercased word, or None if unknown"""
+        i = self._find(word)
+        return self.strings[self._vowel_ids[i]] if i >= 0 else None
+
+    def close(self) -> None:
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+            self._key_ids.release()
+            self._vowel_ids.release()
+        self._mm.close()
+
+
+class RhymeEngine:
+    """Rhyme key lookup with a bounded LRU in front of the table"""
+
+    def __init__(self, table_path: Optional[str] = DEFAULT_RHYME_TABLE_PATH, cache_size: int = RHYME_CACHE_SIZE):
+        self.table: Optional[RhymeKeyTable] = None
+        if table_path:
+            try:
+                self.table = RhymeKeyTable(table_path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: rhyme table unavailable ({e}). Using spelling-based rhymes.")
+        self.table_hits = 0
+        self.fallbacks = 0
+        self._cached_key = lru_cache(maxsize=cache_size)(self._key_uncached)
+        self._cached_vowels = lru_cache(maxsize=cache_size)(self._vowels_uncached)
+
+    def key(self, word: str) -> Optional[str]:
+        """Rhyme key of a cleaned, lowercased end word (None for an empty word)"""
+        return self._cached_key(word)
+
+    __call__ = key
+
+    def _key_uncached(self, word: str) -> Optional[str]:
+        if not word:
+            return None
+        if self.table is not None:
+            key = self.table.get(word)
+            if key is not None:
+                self.table_hits += 1
+                return key
+        self.fallbacks += 1
+        return spelling_rhyme_key(word)
+
+    def vowels(self, word: str) -> Tuple[str, ...]:
+        """Vowel sounds of a cleaned, lowercased word, one per syllable"""
+        return self._cached_vowels(word)
+
+    def _vowels_uncached(self, word: str) -> Tuple[str, ...]:
+        if not word:
+            return ()
+        if self.table is not None:
+            vowels = self.table.vowels(word)
+            if vowels is not None:
+                return tuple(vowels.split())
+        return spelling_vowels(word)
+
+    def stats(self) -> Dict[str, int]:
+        info = self._cached_key.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "tableHits": self.table_hits,
+            "fallbacks": self.fallbacks,
+            "tableEntries": len(self.table) if self.table is not None else 0,
+        }
+
+
+def rhyming_lines(keys: Sequence[Optional[str]], start: int = 0, end: Optional[int] = None) -> int:
+    """Lines in [start, end) whose key matches one of the RHYME_WINDOW lines before them"""
+    end = len(keys) if end is None else min(end, len(keys))
+    count = 0
+    for i in range(max(start, 1), end):
+        key = keys[i]
+        if key is not None and key in keys[max(0, i - RHYME_WINDOW):i]:
+            count += 1
+    return count
+
+
+def rhyme_scheme(keys: Sequence[Optional[str]]) -> str:
+    """Letter each line by rhyme key in order of first appearance, e.g. "ABAB" """
+    letters: Dict[str, str] = {}
+    scheme = []
+    for key in keys:
+        if key is None:
+            # Lines without a word never rhyme; they take a fresh letter
+            key = object()
+        letter = letters.get(key)
+        if letter is None:
+            letter = letters[key] = SCHEME_LETTERS[len(letters)] if len(letters) < len(SCHEME_LETTERS) else '*'
+        scheme.append(letter)
+    return ''.join(scheme)
+
+
+def stanza_schemes(keys: Sequence[Optional[str]], stanza_starts: Sequence[int]) -> List[str]:
+    """rhyme_scheme of every stanza; ``stanza_starts`` are first-line indices"""
+    bounds = list(stanza_starts) + [len(keys)]
+    return [rhyme_scheme(keys[bounds[i]:bounds[i + 1]]) for i in range(len(stanza_starts))]
+
+
+# Shared engine used by the analysis modules
+rhyme_engine = RhymeEngine()
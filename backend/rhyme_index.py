@@ -0,0 +1,334 @@
+"""
+Internal and multisyllabic rhyme detection across a whole lyric
+A suffix automaton over the song's vowel sounds finds every repeated run in linear time
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from lyric_document import WORD_RUN
+from rhyme_engine import rhyme_engine
+
+# Shortest vowel run reported as a multisyllabic rhyme
+MIN_CHAIN_SYLLABLES = 2
+# Chains returned, longest and most repeated first
+RHYME_MAX_CHAINS = int(os.getenv("RHYME_MAX_CHAINS", "25"))
+# Occurrences read per repeat; bounds the work per repeat, which keeps the
+# whole pass linear in the number of syllables
+RHYME_MAX_OCCURRENCES = int(os.getenv("RHYME_MAX_OCCURRENCES", "64"))
+# An occurrence rhymes when a differently spelled occurrence of the same
+# vowel run is at most this many lines away
+RHYME_CHAIN_LINES = int(os.getenv("RHYME_CHAIN_LINES", "4"))
+
+TOKEN = re.compile(r'\S+')
+
+
+class SuffixAutomaton:
+    """Suffix automaton over a sequence of hashable symbols
+
+    States are stored column-wise in lists. ``length`` is the longest string
+    of a state, ``link`` its suffix link and ``end`` the end position of its
+    first occurrence (-1 for clones).
+    """
+
+    def __init__(self, symbols: Sequence[object]):
+        self.next: List[Dict[object, int]] = [{}]
+        self.link = [-1]
+        self.length = [0]
+        self.end = [-1]
+        self.prefix_states: List[int] = []
+        last = 0
+        for position, symbol in enumerate(symbols):
+            last = self._extend(last, symbol, position)
+            self.prefix_states.append(last)
+        self.counts = self._occurrence_counts()
+
+    def __len__(self) -> int:
+        return len(self.length)
+
+    def _extend(self, last: int, symbol: object, position: int) -> int:
+        nxt, link, length, end = self.next, self.link, self.length, self.end
+        current = len(length)
+        nxt.append({})
+        link.append(0)
+        length.append(length[last] + 1)
+        end.append(position)
+
+        state = last
+        while state != -1 and symbol not in nxt[state]:
+            nxt[state][symbol] = current
+            state = link[state]
+        if state == -1:
+            return current
+
+        target = nxt[state][symbol]
+        if length[state] + 1 == length[target]:
+            link[current] = target
+            return current
+
+        clone = len(length)
+        nxt.append(dict(nxt[target]))
+        link.append(link[target])
+        length.append(length[state] + 1)
+        end.append(-1)
+        while state != -1 and nxt[state].get(symbol) == target:
+            nxt[state][symbol] = clone
+            state = link[state]
+        link[target] = clone
+        link[current] = clone
+        return current
+
+    def by_length(self) -> List[int]:
+        """States in increasing order of ``length`` (counting sort)"""
+        buckets: List[List[int]] = [[] for _ in range(len(self.prefix_states) + 1)]
+        for state, size in enumerate(self.length):
+            buckets[size].append(state)
+        return [state for bucket in buckets for state in bucket]
+
+    def _occurrence_counts(self) -> List[int]:
+        counts = [0 if position < 0 else 1 for position in self.end]
+        counts[0] = 0
+        link = self.link
+        for state in reversed(self.by_length()):
+            if state:
+                counts[link[state]] += counts[state]
+        return counts
+
+    def end_positions(self) -> Tuple[List[int], List[int], List[int]]:
+        """Every state's end positions as one slice of a shared list
+
+        A state's end positions are those of the non-clone states in its
+        suffix-link subtree, so a pre-order walk of that tree lays each set
+        out contiguously. Returns (positions, first, stop) where state ``v``
+        owns ``positions[first[v]:stop[v]]``.
+        """
+        children: List[List[int]] = [[] for _ in self.length]
+        for state in range(1, len(self.length)):
+            children[self.link[state]].append(state)
+        positions: List[int] = []
+        first = [0] * len(self.length)
+        stop = [0] * len(self.length)
+        stack = [(0, False)]
+        while stack:
+            state, done = stack.pop()
+            if done:
+                stop[state] = len(positions)
+                continue
+            first[state] = len(positions)
+            if self.end[state] >= 0:
+                positions.append(self.end[state])
+            stack.append((state, True))
+            stack.extend((child, False) for child in children[state])
+        return positions, first, stop
+
+    def maximal_repeats(self, min_length: int) -> List[int]:
+        """States whose longest string occurs twice or more and cannot be
+        extended on either side without losing an occurrence"""
+        counts, length = self.counts, self.length
+        return [
+            state for state in range(1, len(length))
+            if counts[state] >= 2 and length[state] >= min_length
+            and all(counts[target] != counts[state] for target in self.next[state].values())
+        ]
+
+
+@dataclass(frozen=True)
+class WordToken:
+    """A word of the lyric with its 1-based line and 0-based character column"""
+    line: int
+    column: int
+    text: str
+    vowels: Tuple[str, ...]
+
+    @property
+    def end_column(self) -> int:
+        return self.column + len(self.text)
+
+
+@dataclass
+class RhymeChain:
+    """A run of vowel sounds repeated at several places in the lyric"""
+    vowels: Tuple[str, ...]
+    occurrences: List[Tuple[int, int]]  # (first word, last word) token indices
+
+    def to_dict(self, words: Sequence[WordToken]) -> dict:
+        return {
+            "vowels": ' '.join(self.vowels),
+            "syllables": len(self.vowels),
+            "occurrences": [
+                {
+                    "line": words[first].line,
+                    "column": words[first].column,
+                    "endColumn": words[last].end_column,
+                    "text": ' '.join(word.text for word in words[first:last + 1]),
+                }
+                for first, last in self.occurrences
+            ],
+        }
+
+
+@dataclass
+class InternalRhyme:
+    """Words of one line that share a rhyme key"""
+    line: int
+    key: str
+    words: List[int]  # token indices
+
+    def to_dict(self, words: Sequence[WordToken]) -> dict:
+        return {
+            "line": self.line,
+            "words": [{"column": words[i].column, "text": words[i].text} for i in self.words],
+        }
+
+
+@dataclass
+class RhymeIndex:
+    """Chains, internal rhymes and density for one lyric"""
+    words: List[WordToken]
+    syllables: int
+    covered_syllables: int
+    chains: List[RhymeChain] = field(default_factory=list)
+    internal: List[InternalRhyme] = field(default_factory=list)
+
+    @property
+    def density(self) -> float:
+        """Share of syllables that belong to a multisyllabic rhyme"""
+        return self.covered_syllables / self.syllables if self.syllables else 0.0
+
+    def to_dict(self, max_chains: int = RHYME_MAX_CHAINS) -> dict:
+        return {
+            "syllables": self.syllables,
+            "rhymedSyllables": self.covered_syllables,
+            "density": round(self.density * 100, 1),
+            "chainCount": len(self.chains),
+            "chains": [chain.to_dict(self.words) for chain in self.chains[:max_chains]],
+            "internalRhymes": [rhyme.to_dict(self.words) for rhyme in self.internal],
+        }
+
+
+def clean_word(token: str) -> str:
+    """Lowercased word characters of a raw token, as used for rhyme lookups"""
+    return ''.join(WORD_RUN.findall(token)).lower()
+
+
+def tokenize(text: str, vowels: Callable[[str], Tuple[str, ...]] = rhyme_engine.vowels) -> List[WordToken]:
+    """Whitespace-separated words with their positions in ``text``"""
+    words = []
+    for line_number, raw_line in enumerate(text.split('\n'), start=1):
+        for match in TOKEN.finditer(raw_line):
+            token = match.group(0)
+            words.append(WordToken(line_number, match.start(), token, vowels(clean_word(token))))
+    return words
+
+
+def find_internal_rhymes(words: Sequence[WordToken],
+                         rhyme_key: Callable[[str], Optional[str]] = rhyme_engine.key) -> List[InternalRhyme]:
+    """Groups of two or more different words sharing a rhyme key within a line"""
+    rhymes: List[InternalRhyme] = []
+    groups: Dict[str, List[int]] = {}
+    line = None
+    for i, word in enumerate(list(words) + [None]):
+        if word is None or word.line != line:
+            for key, members in groups.items():
+                if len({clean_word(words[m].text) for m in members}) >= 2:
+                    rhymes.append(InternalRhyme(line, key, members))
+            groups = {}
+            if word is None:
+                break
+            line = word.line
+        key = rhyme_key(clean_word(word.text))
+        if key is not None:
+            groups.setdefault(key, []).append(i)
+    return rhymes
+
+
+def _without_overlaps(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    kept: List[Tuple[int, int]] = []
+    for start, stop in sorted(spans):
+        if not kept or start > kept[-1][1]:
+            kept.append((start, stop))
+    return kept
+
+
+def _near_other_spelling(lines: Sequence[int], spellings: Sequence[Tuple[str, ...]], distance: int) -> List[bool]:
+    """For occurrences sorted by line, whether another spelling is within ``distance`` lines"""
+    near = []
+    window: Dict[Tuple[str, ...], int] = {}
+    lo = hi = 0
+    for i, line in enumerate(lines):
+        while hi < len(lines) and lines[hi] <= line + distance:
+            window[spellings[hi]] = window.get(spellings[hi], 0) + 1
+            hi += 1
+        while lines[lo] < line - distance:
+            window[spellings[lo]] -= 1
+            if not window[spellings[lo]]:
+                del window[spellings[lo]]
+            lo += 1
+        near.append(len(window) >= 2)
+    return near
+
+
+def build_rhyme_index(text: str,
+                      vowels: Callable[[str], Tuple[str, ...]] = rhyme_engine.vowels,
+                      rhyme_key: Callable[[str], Optional[str]] = rhyme_engine.key,
+                      min_syllables: int = MIN_CHAIN_SYLLABLES,
+                      max_occurrences: int = RHYME_MAX_OCCURRENCES,
+                      chain_lines: int = RHYME_CHAIN_LINES) -> RhymeIndex:
+    """Find multisyllabic rhyme chains and internal rhymes in ``text``
+
+    The song becomes one sequence of vowel sounds. Each line ends with a
+    separator that occurs nowhere else, so no repeat crosses a line break.
+    Maximal repeats of the suffix automaton are the candidate chains. An
+    occurrence is kept when a differently spelled occurrence lies within
+    ``chain_lines`` lines, so a repeated chorus or a vowel pair that happens
+    to recur a page later is not counted as rhyme.
+    """
+    words = tokenize(text, vowels)
+
+    symbols: List[object] = []
+    symbol_word: List[int] = []  # token index of each symbol, -1 for separators
+    symbol_ids: Dict[str, int] = {}
+    for i, word in enumerate(words):
+        if i and word.line != words[i - 1].line:
+            symbols.append(-1 - word.line)
+            symbol_word.append(-1)
+        for vowel in word.vowels:
+            symbols.append(symbol_ids.setdefault(vowel, len(symbol_ids)))
+            symbol_word.append(i)
+    syllables = len(symbols) - symbol_word.count(-1)
+
+    names = {index: vowel for vowel, index in symbol_ids.items()}
+    automaton = SuffixAutomaton(symbols)
+    positions, first, stop = automaton.end_positions()
+    coverage = [0] * (len(symbols) + 1)
+    chains: List[RhymeChain] = []
+    for state in automaton.maximal_repeats(min_syllables):
+        size = automaton.length[state]
+        ends = positions[first[state]:min(stop[state], first[state] + max_occurrences)]
+        spans = _without_overlaps([(end - size + 1, end) for end in ends])
+        if len(spans) < 2:
+            continue
+        occurrences = [(symbol_word[start], symbol_word[end]) for start, end in spans]
+        spellings = [tuple(clean_word(word.text) for word in words[a:b + 1]) for a, b in occurrences]
+        near = _near_other_spelling([words[a].line for a, _ in occurrences], spellings, chain_lines)
+        if sum(near) < 2:
+            continue
+        for (start, end), keep in zip(spans, near):
+            if keep:
+                coverage[start] += 1
+                coverage[end + 1] -= 1
+        start, end = spans[0]
+        chains.append(RhymeChain(
+            tuple(names[symbol] for symbol in symbols[start:end + 1]),
+            [occurrence for occurrence, keep in zip(occurrences, near) if keep],
+        ))
+
+    covered = 0
+    depth = 0
+    for delta in coverage[:-1]:
+        depth += delta
+        covered += depth > 0
+    chains.sort(key=lambda chain: (-len(chain.vowels), -len(chain.occurrences), chain.occurrences[0]))
+    return RhymeIndex(words, syllables, covered, chains, find_internal_rhymes(words, rhyme_key))
@@ -0,0 +1,157 @@
+"""
+Streaming analysis over NDJSON request bodies
+Records are read, analyzed and written one at a time with a bounded window
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from analysis_executor import analysis_executor
+
+STREAM_MAX_RECORD_BYTES = int(os.getenv("STREAM_MAX_RECORD_BYTES", str(64 * 1024)))
+# Records analyzed concurrently per stream; 0 = two per analysis worker
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "0")) or analysis_executor.max_workers * 2
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+class StreamFormatError(ValueError):
+    """Raised when the request body is not line-delimited JSON"""
+
+
+async def iter_records(chunks: AsyncIterator[bytes],
+                       max_record_bytes: int = STREAM_MAX_RECORD_BYTES) -> AsyncIterator[bytes]:
+    """Split a byte stream into non-blank lines without buffering the whole body"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield line
+        del buffer[:start]
+        if len(buffer) > max_record_bytes:
+            raise StreamFormatError(f"Record exceeds {max_record_bytes} bytes")
+    if buffer.strip():
+        yield bytes(buffer)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that leaves ``receive`` to the request body reader
+
+    Below ASGI spec 2.4 Starlette listens for disconnects on ``receive`` while
+    streaming, which would swallow the body the generator is still reading.
+    Disconnects surface instead through the request stream or a failed send.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def parse_record(line: bytes) -> Dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise StreamFormatError("Record is not valid JSON")
+    if not isinstance(record, dict):
+        raise StreamFormatError("Record must be a JSON object")
+    return record
+
+
+async def stream_results(records: AsyncIterator[bytes],
+                         handle: Callable[[int, bytes], Awaitable[Dict[str, Any]]],
+                         window: int = STREAM_WINDOW) -> AsyncIterator[Dict[str, Any]]:
+    """Apply ``handle`` to every record, yielding results as they complete
+
+    At most ``window`` records are in flight, so memory stays constant however
+    long the stream is. Results carry their input ``index``; ``handle`` is
+    expected to turn per-record failures into error results itself.
+    """
+    pending = set()
+    index = 0
+    source = records.__aiter__()
+    exhausted = False
+    failure = None
+
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    line = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                except StreamFormatError as e:
+                    # Report the records already read before failing the stream
+                    exhausted, failure = True, e
+                    break
+                pending.add(asyncio.ensure_future(handle(index, line)))
+                index += 1
+            if not pending:
+                if failure is not None:
+                    raise failure
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Malformed body or client disconnect: stop the records still in flight
+        for task in pending:
+            task.cancel()
+
+
+def ndjson_line(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n".encode("utf-8")
+
+
+async def ndjson_stream(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """One JSON object per line, plus an error line if the body is malformed"""
+    try:
+        async for record in results:
+            yield ndjson_line(record)
+    except StreamFormatError as e:
+        yield ndjson_line({"status": "error", "error": str(e), "fatal": True})
+
+
+async def sse_stream(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """``result`` and ``progress`` events per record, then ``done`` (or ``error``)"""
+    summary: Dict[str, int] = {"completed": 0, "succeeded": 0, "failed": 0}
+    try:
+        async for record in results:
+            summary["completed"] += 1
+            summary["succeeded" if record.get("status") == "ok" else "failed"] += 1
+            yield sse_event("result", record)
+            yield sse_event("progress", summary)
+    except StreamFormatError as e:
+        yield sse_event("error", {"error": str(e), **summary})
+        return
+    yield sse_event("done", summary)
+
+
+def error_result(index: int, message: str, **extra: Any) -> Dict[str, Any]:
+    return {"index": index, "status": "error", "error": message, **extra}
+
+
+def ok_result(index: int, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    return {"index": index, "status": "ok", "analysis": analysis}
@@ -0,0 +1,199 @@
+"""
+Memoized syllable engine backed by a memory-mapped syllable table
+Lookup order: bounded LRU -> prebuilt table -> syllapy -> vowel heuristic
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+from functools import lru_cache
+from string import punctuation
+from typing import Dict, Optional
+
+try:
+    import syllapy
+    SYLLAPY_AVAILABLE = True
+except ImportError:
+    SYLLAPY_AVAILABLE = False
+    print("Warning: syllapy not available. Using heuristic syllable counting.")
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "syllables.bin")
+DEFAULT_CACHE_SIZE = int(os.getenv("SYLLABLE_CACHE_SIZE", "65536"))
+
+# Table layout (little endian):
+#   header  b"SYLT" | uint32 version | uint32 entry count | uint32 blob size
+#   index   uint32 per entry: low 28 bits = blob offset, high 4 bits = syllables
+#   blob    UTF-8 words sorted by their encoded bytes, back to back
+TABLE_MAGIC = b"SYLT"
+TABLE_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+OFFSET_BITS = 28
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+MAX_TABLE_SYLLABLES = 15
+
+NUMBERS = re.compile(r'\d')
+
+
+def normalize_word(word: str) -> str:
+    """Normalize a word the same way syllapy does before its dictionary lookup"""
+    return word.strip().lower().strip(punctuation)
+
+
+def heuristic_syllables(word: str) -> int:
+    """Vowel-group fallback used when syllapy is unavailable or fails"""
+    word = word.lower()
+    vowels = "aeiouy"
+    count = 0
+    prev_was_vowel = False
+
+    for char in word:
+        is_vowel = char in vowels
+        if is_vowel and not prev_was_vowel:
+            count += 1
+        prev_was_vowel = is_vowel
+
+    # Handle silent e
+    if word.endswith('e') and count > 1:
+        count -= 1
+
+    return max(1, count)
+
+
+def write_table(path: str, table: Dict[str, int]) -> None:
+    """Write a word -> syllable mapping in the memory-mappable table format"""
+    entries = sorted(
+        (word.encode("utf-8"), count)
+        for word, count in table.items()
+        if word and 0 < count <= MAX_TABLE_SYLLABLES
+    )
+    index = bytearray()
+    blob = bytearray()
+    for encoded, count in entries:
+        index += struct.pack("<I", len(blob) | (count << OFFSET_BITS))
+        blob += encoded
+    if len(blob) > OFFSET_MASK:
+        raise ValueError("Syllable table blob too large")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(entries), len(blob)))
+        f.write(index)
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+
+class SyllableTable:
+    """Read-only, memory-mapped word -> syllable table with binary search lookup"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, blob_size = HEADER.unpack_from(self._mm, 0)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            self._mm.close()
+            raise ValueError(f"Unsupported syllable table: {path}")
+        index_end = HEADER.size + 4 * self.size
+        if sys.byteorder == "little":
+            # Zero-copy view over the index; the file is little endian
+            self._index = memoryview(self._mm)[HEADER.size:index_end].cast("I")
+        else:
+            self._index = struct.unpack_from(f"<{self.size}I", self._mm, HEADER.size)
+        self._blob_start = index_end
+        self._blob_end = index_end + blob_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _entry(self, i: int):
+        index = self._index
+        packed = index[i]
+        start = self._blob_start + (packed & OFFSET_MASK)
+        if i + 1 < self.size:
+            end = self._blob_start + (index[i + 1] & OFFSET_MASK)
+        else:
+            end = self._blob_end
+        return self._mm[start:end], packed >> OFFSET_BITS
+
+    def get(self, word: str) -> Optional[int]:
+        """Return the syllable count for a normalized word, or None if unknown"""
+        key = word.encode("utf-8")
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry, count = self._entry(mid)
+            if entry < key:
+                lo = mid + 1
+            elif entry > key:
+                hi = mid
+            else:
+                return count
+        return None
+
+    def close(self) -> None:
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._mm.close()
+
+
+class SyllableEngine:
+    """Syllable counter with a bounded LRU in front of the table and syllapy"""
+
+    def __init__(self, table_path: Optional[str] = DEFAULT_TABLE_PATH, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.table: Optional[SyllableTable] = None
+        if table_path:
+            try:
+                self.table = SyllableTable(table_path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: syllable table unavailable ({e}). Using syllapy only.")
+        self.cache_size = cache_size
+        self.table_hits = 0
+        self.fallbacks = 0
+        self._cached_count = lru_cache(maxsize=cache_size)(self._count_uncached)
+
+    def count(self, word: str) -> int:
+        """Count syllables in a word"""
+        return self._cached_count(word)
+
+    __call__ = count
+
+    def _count_uncached(self, word: str) -> int:
+        normalized = normalize_word(word)
+        if normalized and self.table is not None and not NUMBERS.search(normalized):
+            count = self.table.get(normalized)
+            if count is not None:
+                self.table_hits += 1
+                return count
+
+        self.fallbacks += 1
+        if SYLLAPY_AVAILABLE:
+            try:
+                return syllapy.count(word)
+            except Exception:
+                pass
+        return heuristic_syllables(word)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hit/miss counters"""
+        info = self._cached_count.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxSize": info.maxsize,
+            "tableHits": self.table_hits,
+            "fallbacks": self.fallbacks,
+            "tableEntries": len(self.table) if self.table is not None else 0,
+        }
+
+    def clear(self) -> None:
+        """Drop cached counts and reset counters"""
+        self._cached_count.cache_clear()
+        self.table_hits = 0
+        self.fallbacks = 0
+
+
+# Shared engine used by the analysis modules
+syllable_engine = SyllableEngine()
@@ -0,0 +1,73 @@
+"""
+Tests for the managed analysis executor
+"""
+
+import asyncio
+import os
+import sys
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from analysis_executor import AnalysisExecutor, ExecutorBusyError
+from main_secure import advanced_analysis
+
+LYRICS = "The bugs keep coming but I stay strong\nI'll keep debugging through the morning light"
+
+release = threading.Event()
+
+def blocking_task(value):
+    release.wait(5)
+    return value
+
+def failing_task(value):
+    raise ValueError(value)
+
+class TestAnalysisExecutor:
+    """Test offloading, queue bounds and stats"""
+    
+    def test_process_pool_runs_analysis(self):
+        executor = AnalysisExecutor(mode="process", max_workers=2, max_queue=4)
+        try:
+            result = asyncio.run(executor.run(advanced_analysis, LYRICS))
+            assert result["dashboard"] == advanced_analysis(LYRICS)["dashboard"]
+            stats = executor.stats()
+            assert stats["completed"] == 1
+            assert stats["inFlight"] == 0
+        finally:
+            executor.shutdown()
+    
+    def test_errors_propagate(self):
+        executor = AnalysisExecutor(mode="inline")
+        with pytest.raises(ValueError):
+            asyncio.run(executor.run(failing_task, "bad lyrics"))
+        assert executor.stats()["failed"] == 1
+    
+    def test_full_queue_rejects(self):
+        executor = AnalysisExecutor(mode="thread", max_workers=1, max_queue=1)
+        release.clear()
+        
+        async def scenario():
+            running = [asyncio.ensure_future(executor.run(blocking_task, i)) for i in range(2)]
+            await asyncio.sleep(0.05)
+            assert executor.stats()["queueDepth"] == 1
+            with pytest.raises(ExecutorBusyError):
+                await executor.run(blocking_task, 3)
+            # Callers that bound their own concurrency may still wait for a slot
+            waiting = asyncio.ensure_future(executor.run(blocking_task, 4, wait_for_slot=True))
+            release.set()
+            return await asyncio.gather(*running, waiting)
+        
+        try:
+            assert asyncio.run(scenario()) == [0, 1, 4]
+            stats = executor.stats()
+            assert stats["rejected"] == 1
+            assert stats["completed"] == 3
+            assert stats["maxWaitMs"] > 0
+        finally:
+            executor.shutdown()
+    
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            AnalysisExecutor(mode="gpu")
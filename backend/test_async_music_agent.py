@@ -0,0 +1,369 @@
+"""
+Tests for the async music research agent against local stub servers
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import async_music_agent
+import main
+import main_secure
+import music_agent
+from async_music_agent import AsyncMusicResearchAgent, lead_section
+from fastapi.testclient import TestClient
+from main_secure import create_access_token
+from outbound_scheduler import OutboundScheduler
+
+ARTICLE = (
+    "\"Midnight City\" is a song by French electronic band M83. It was released in 2011 as "
+    "the lead single from the album Hurry Up, We're Dreaming.\n\n\n== Background ==\n"
+    "The song's genre: synth-pop, electronic. Released in 2011."
+)
+INFOBOX = (
+    "{{Infobox song\n| name = Midnight City\n| artist = [[M83 (band)|M83]]\n"
+    "| released = {{Start date|2011|08|16}}\n| genre = {{hlist|[[Synth-pop]]|[[dream pop]]}}\n}}\n"
+)
+PAGES = {
+    "Midnight City (song)": {"pageid": 1, "title": "Midnight City (song)", "extract": ARTICLE,
+                             "fullurl": "https://en.wikipedia.org/wiki/Midnight_City_(song)",
+                             "revisions": [{"slots": {"main": {"content": INFOBOX + ARTICLE}}}]},
+    "Midnight City (disambiguation)": {"pageid": 2, "title": "Midnight City (disambiguation)",
+                                       "extract": "Midnight City may refer to a song or an album.",
+                                       "pageprops": {"disambiguation": ""}},
+    "Midnight": {"pageid": 3, "title": "Midnight", "extract": "Midnight is the transition between days."},
+    "Hurry Up, We're Dreaming": {"pageid": 4, "title": "Hurry Up, We're Dreaming",
+                                 "extract": "Hurry Up, We're Dreaming is the sixth studio album by M83.",
+                                 "fullurl": "https://en.wikipedia.org/wiki/Hurry_Up,_We%27re_Dreaming"},
+}
+SEARCH = [
+    {"title": "Midnight", "snippet": "<span class=\"searchmatch\">Midnight</span> is the transition"},
+    {"title": "Hurry Up, We're Dreaming", "snippet": "studio album by <span class=\"searchmatch\">M83</span>"},
+    {"title": "Midnight City (disambiguation)", "snippet": "may refer to"},
+    {"title": "Midnight City (song)", "snippet": "is a song by French electronic band"},
+]
+SONGBPM = {"search": [{"tempo": "105", "song_key": "E", "song_title": "Midnight City",
+                       "artist": {"name": "M83"}, "danceability": 55}]}
+MUSICBRAINZ = {"recordings": [{"id": "mb-1", "title": "Midnight City", "length": 243000,
+                               "artist-credit": [{"name": "M83"}],
+                               "releases": [{"title": "Hurry Up, We're Dreaming", "date": "2011-10-18"}]}]}
+
+@pytest.fixture(autouse=True)
+def no_research_cache(monkeypatch):
+    """Every lookup goes to the stubs; test_research_cache.py covers caching"""
+    monkeypatch.setattr(music_agent, "shared_research_cache", lambda: None)
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    """All stubs share one host; test_outbound_scheduler.py covers rate limits and retries"""
+    monkeypatch.setattr(music_agent, "outbound_scheduler", OutboundScheduler(default_rate=1000, max_retries=0))
+
+@asynccontextmanager
+async def stub_sources(delays=None, statuses=None):
+    """Local Wikipedia, SongBPM and MusicBrainz stand-ins; yields (endpoints, request log)
+
+    ``delays`` maps a source to seconds slept before every response,
+    ``statuses`` a source to an HTTP status returned instead of data.
+    ``stub_sources.peak`` holds the most requests each source had open at once.
+    """
+    delays = delays or {}
+    statuses = statuses or {}
+    log = []
+    active = {}
+    stub_sources.peak = peak = {}
+
+    async def respond(source, body):
+        log.append(source)
+        active[source] = active.get(source, 0) + 1
+        peak[source] = max(peak.get(source, 0), active[source])
+        try:
+            await asyncio.sleep(delays.get(source, 0))
+        finally:
+            active[source] -= 1
+        if source in statuses:
+            return web.json_response({"error": "stub"}, status=statuses[source])
+        return web.json_response(body)
+
+    async def wikipedia(request):
+        if "list" in request.query:
+            return await respond("wikipedia", {"query": {"search": SEARCH}})
+        pages = [PAGES.get(title, {"title": title, "missing": True}) for title in request.query["titles"].split("|")]
+        if "exintro" in request.query:
+            pages = [dict(page, extract=lead_section(page["extract"])) if "extract" in page else page
+                     for page in pages]
+        return await respond("wikipedia", {"query": {"pages": pages}})
+
+    async def songbpm(request):
+        assert request.query["api_key"] == "test-key"
+        return await respond("songbpm", SONGBPM)
+
+    async def musicbrainz(request):
+        assert request.query["query"].startswith('recording:"')
+        return await respond("musicbrainz", MUSICBRAINZ)
+
+    app = web.Application()
+    app.router.add_get("/w/api.php", wikipedia)
+    app.router.add_get("/search/", songbpm)
+    app.router.add_get("/ws/2/recording", musicbrainz)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        yield {
+            "wikipedia": str(server.make_url("/w/api.php")),
+            "songbpm": str(server.make_url("/search/")),
+            "musicbrainz": str(server.make_url("/ws/2/recording")),
+        }, log
+    finally:
+        await server.close()
+
+async def research(delays=None, statuses=None, use_gpt_fallback=False, **options):
+    """(profile, seconds taken, request log) of researching Midnight City against the stubs"""
+    async with stub_sources(delays, statuses) as (endpoints, log):
+        async with AsyncMusicResearchAgent("test-key", endpoints=endpoints, **options) as agent:
+            started = time.perf_counter()
+            profile = await agent.research_song("Midnight City", "M83", use_gpt_fallback=use_gpt_fallback)
+            return profile, time.perf_counter() - started, log
+
+class TestSources:
+    """Each source parses its stub responses like the synchronous agent"""
+
+    def test_full_profile(self):
+        profile, _, log = asyncio.run(research())
+        assert profile.sources == ["wikipedia", "songbpm", "musicbrainz"]
+        assert profile.bpm == "105" and profile.key == "E"
+        assert profile.wikipedia_url.endswith("Midnight_City_(song)")
+        assert profile.summary.startswith('"Midnight City" is a song')
+        assert "Background" not in profile.summary
+        assert profile.year == 2011
+        assert profile.genre == "synth-pop"
+        assert profile.additional_metadata["album"] == "Hurry Up, We're Dreaming"
+        # One search, then the song page is ranked first and fetched with the album page
+        assert log.count("wikipedia") == 2
+
+    def test_matches_synchronous_agent(self, monkeypatch):
+        async def both():
+            async with stub_sources() as (endpoints, _):
+                monkeypatch.setattr(music_agent, "SONGBPM_API_URL", endpoints["songbpm"])
+                monkeypatch.setattr(music_agent, "MUSICBRAINZ_API_URL", endpoints["musicbrainz"])
+                monkeypatch.setattr(music_agent, "WIKIPEDIA_API_URL", endpoints["wikipedia"])
+                sync_agent = music_agent.MusicResearchAgent("test-key")
+                expected = [await asyncio.to_thread(sync_agent.search_songbpm, "Midnight City", "M83"),
+                            await asyncio.to_thread(sync_agent.search_musicbrainz, "Midnight City", "M83"),
+                            await asyncio.to_thread(sync_agent.search_wikipedia, "Midnight City", "M83")]
+                async with AsyncMusicResearchAgent("test-key", endpoints=endpoints) as agent:
+                    actual = [await agent.search_songbpm("Midnight City", "M83"),
+                              await agent.search_musicbrainz("Midnight City", "M83"),
+                              await agent.search_wikipedia("Midnight City", "M83")]
+                return expected, actual
+        expected, actual = asyncio.run(both())
+        assert actual == expected
+        assert not any("error" in result for result in actual)
+
+    def test_http_errors_become_error_results(self):
+        profile, _, _ = asyncio.run(research(statuses={"songbpm": 503, "musicbrainz": 500}))
+        assert profile.sources == ["wikipedia"]
+        assert profile.bpm is None
+
+    def test_missing_api_key(self):
+        async def run():
+            async with AsyncMusicResearchAgent() as agent:
+                agent.songbpm_api_key = None
+                return await agent.search_songbpm("Midnight City")
+        assert asyncio.run(run()) == {"source": "songbpm", "error": "API key not provided"}
+
+    def test_lead_section(self):
+        assert lead_section(ARTICLE).endswith("Hurry Up, We're Dreaming.")
+        assert lead_section("No sections here.") == "No sections here."
+
+class TestConcurrency:
+    """Sources run at the same time, within their timeouts and the deadline"""
+
+    def test_sources_overlap(self):
+        # Serially this takes 4 x 0.3 s of Wikipedia plus 0.3 s for each API
+        profile, elapsed, _ = asyncio.run(research(delays={"songbpm": 0.3, "musicbrainz": 0.3, "wikipedia": 0.3}))
+        assert len(profile.sources) == 3
+        assert elapsed < 1.5
+
+    def test_source_timeout(self):
+        async def run():
+            async with stub_sources({"musicbrainz": 5}) as (endpoints, _):
+                async with AsyncMusicResearchAgent("test-key", endpoints=endpoints,
+                                                   source_timeouts={"musicbrainz": 0.2}) as agent:
+                    return await agent.search_sources("Midnight City", "M83")
+        started = time.perf_counter()
+        wiki, songbpm, musicbrainz = asyncio.run(run())
+        assert time.perf_counter() - started < 2
+        assert "error" not in wiki and "error" not in songbpm
+        assert musicbrainz == {"source": "musicbrainz", "error": "Timed out after 0.2s"}
+
+    def test_deadline_keeps_what_arrived(self):
+        profile, elapsed, _ = asyncio.run(research(
+            delays={"wikipedia": 5, "musicbrainz": 5}, deadline=0.4, source_timeouts={"wikipedia": 10, "musicbrainz": 10},
+        ))
+        assert elapsed < 1.5
+        assert profile.sources == ["songbpm"]
+        assert profile.bpm == "105"
+
+    def test_gpt_gets_the_rest_of_the_deadline(self, monkeypatch):
+        monkeypatch.setattr(async_music_agent, "GPT_AVAILABLE", True)
+        received = []
+
+        def fake_gpt(self, search_results, title, artist=""):
+            received.extend(search_results)
+            time.sleep(self.gpt_delay)
+            return {"source": "gpt", "genre": "synth-pop", "title": title, "artist": artist}
+        monkeypatch.setattr(AsyncMusicResearchAgent, "gpt_extract_metadata", fake_gpt)
+        monkeypatch.setattr(AsyncMusicResearchAgent, "gpt_delay", 0, raising=False)
+
+        profile, _, _ = asyncio.run(research(delays={"musicbrainz": 5}, use_gpt_fallback=True,
+                                             deadline=1.0, gpt_budget=0.5))
+        assert [r["source"] for r in received] == ["wikipedia", "songbpm", "musicbrainz"]
+        assert received[2]["error"] == "Deadline exceeded"
+        assert profile.genre == "synth-pop"
+        assert "gpt" in profile.sources
+
+        monkeypatch.setattr(AsyncMusicResearchAgent, "gpt_delay", 1)
+        profile, elapsed, _ = asyncio.run(research(use_gpt_fallback=True, deadline=0.5, gpt_budget=0.3))
+        assert elapsed < 1.5
+        assert "gpt" not in profile.sources and profile.bpm == "105"
+
+PLAYLIST = [("Midnight City", "M83"), ("Blinding Lights", "The Weeknd"), ("midnight city!", "m83"),
+            ("Shape of You", "Ed Sheeran"), ("Bohemian Rhapsody", "Queen"), ("Levitating", "Dua Lipa")]
+
+async def research_playlist(songs=PLAYLIST, delays=None, statuses=None, **options):
+    """(items, seconds taken, request log) of research_many against the stubs"""
+    async with stub_sources(delays, statuses) as (endpoints, log):
+        async with AsyncMusicResearchAgent("test-key", endpoints=endpoints, **options) as agent:
+            started = time.perf_counter()
+            items = [item async for item in agent.research_many(songs, use_gpt_fallback=False)]
+            return items, time.perf_counter() - started, log
+
+class TestResearchMany:
+    """Playlist research: deduplicated, bounded per source, streamed with progress"""
+
+    def test_deduplicates_and_streams_every_song(self):
+        items, _, log = asyncio.run(research_playlist())
+        assert len(items) == 5
+        assert sorted(index for item in items for index in item.indices) == list(range(6))
+        assert next(item for item in items if 0 in item.indices).indices == [0, 2]
+        assert log.count("songbpm") == log.count("musicbrainz") == 5
+        assert all(item.profile.bpm == "105" and item.error is None for item in items)
+        assert [item.progress["completed"] for item in items] == [1, 2, 3, 4, 5]
+        final = items[-1].progress
+        assert final["songs"] == 5 and final["duplicates"] == 1 and final["failed"] == 0
+
+    def test_concurrency_is_bounded_per_source(self):
+        songs = [(f"Song {n}", "Artist") for n in range(12)]
+        items, elapsed, _ = asyncio.run(research_playlist(
+            songs, delays={"musicbrainz": 0.1, "songbpm": 0.1},
+            concurrency={"musicbrainz": 2, "songbpm": 6},
+        ))
+        assert len(items) == 12
+        assert stub_sources.peak["musicbrainz"] == 2
+        assert stub_sources.peak["songbpm"] == 6
+        # MusicBrainz is the bottleneck: 12 songs, 2 at a time, 0.1 s each
+        assert 0.55 < elapsed < 1.5
+
+    def test_source_failures_are_counted(self):
+        items, _, _ = asyncio.run(research_playlist(statuses={"songbpm": 503}))
+        final = items[-1].progress
+        assert final["sourceErrors"] == {"songbpm": 5}
+        assert final["noData"] == 0
+        assert all("songbpm" not in item.profile.sources for item in items)
+
+    def test_stopping_early_cancels_the_rest(self):
+        async def run():
+            songs = [(f"Song {n}", "Artist") for n in range(20)]
+            async with stub_sources({"musicbrainz": 0.2}) as (endpoints, log):
+                async with AsyncMusicResearchAgent("test-key", endpoints=endpoints,
+                                                   concurrency={"musicbrainz": 1}) as agent:
+                    stream = agent.research_many(songs, use_gpt_fallback=False, max_in_flight=4)
+                    first = await stream.__anext__()
+                    await stream.aclose()
+                    await asyncio.sleep(0.3)
+                    return first, log.count("musicbrainz")
+        first, musicbrainz_requests = asyncio.run(run())
+        assert first.error is None
+        assert musicbrainz_requests < 5
+
+    def test_failed_song(self, monkeypatch):
+        async def broken(self, title, artist, use_gpt_fallback, deadline):
+            raise RuntimeError("boom")
+        monkeypatch.setattr(AsyncMusicResearchAgent, "_research", broken)
+        items, _, _ = asyncio.run(research_playlist(PLAYLIST[:2]))
+        assert [item.error for item in items] == ["boom", "boom"]
+        assert items[-1].progress["failed"] == 2
+        assert items[-1].to_record()["status"] == "error"
+
+class TestBatchEndpoint:
+    """POST /api/research/batch streams NDJSON records"""
+
+    @pytest.fixture(autouse=True)
+    def fake_sources(self, monkeypatch):
+        async def wikipedia(self, title, artist=""):
+            return {"source": "wikipedia", "title": title, "genre": "pop"}
+
+        async def songbpm(self, title, artist=""):
+            return {"source": "songbpm", "bpm": 120}
+
+        async def musicbrainz(self, title, artist=""):
+            return {"source": "musicbrainz", "error": "No results found"}
+        monkeypatch.setattr(AsyncMusicResearchAgent, "search_wikipedia", wikipedia)
+        monkeypatch.setattr(AsyncMusicResearchAgent, "search_songbpm", songbpm)
+        monkeypatch.setattr(AsyncMusicResearchAgent, "search_musicbrainz", musicbrainz)
+        main_secure.limiter.reset()
+
+    def records(self, app, headers=None, **body):
+        client = TestClient(app, base_url="http://localhost")
+        response = client.post("/api/research/batch", json=body, headers=headers or {})
+        if response.status_code != 200:
+            return response.status_code, []
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        return 200, [json.loads(line) for line in response.text.splitlines()]
+
+    def test_streams_profiles_then_summary(self):
+        songs = [{"title": "Midnight City", "artist": "M83"}, {"title": "Midnight City", "artist": "M83"},
+                 {"title": "Levitating"}]
+        status, records = self.records(main.app, songs=songs, useGptFallback=False)
+        assert status == 200
+        assert [r["status"] for r in records] == ["ok", "ok", "done"]
+        assert sorted(tuple(r["indices"]) for r in records[:2]) == [(0, 1), (2,)]
+        assert all(r["profile"]["bpm"] == 120 for r in records[:2])
+        assert records[-1]["summary"]["songs"] == 2
+        assert records[-1]["summary"]["sourceErrors"] == {"musicbrainz": 2}
+
+    def test_validation(self):
+        assert self.records(main.app, songs=[])[0] == 422
+        assert self.records(main.app, songs=[{"title": ""}])[0] == 422
+
+    def test_open_app_is_capped_and_skips_gpt(self, monkeypatch):
+        songs = [{"title": f"Song {n}"} for n in range(main.OPEN_RESEARCH_BATCH_MAX_SONGS + 1)]
+        assert self.records(main.app, songs=songs)[0] == 422
+        research = AsyncMusicResearchAgent._research
+        fallbacks = []
+
+        async def recorded(self, title, artist, use_gpt_fallback, *args, **kwargs):
+            fallbacks.append(use_gpt_fallback)
+            return await research(self, title, artist, use_gpt_fallback, *args, **kwargs)
+        monkeypatch.setattr(AsyncMusicResearchAgent, "_research", recorded)
+        status, records = self.records(main.app, songs=songs[:2])
+        assert status == 200 and records[-1]["status"] == "done"
+        assert fallbacks == [False, False]
+
+    def test_secure_endpoint_requires_a_user(self):
+        songs = [{"title": "Midnight City", "artist": "M83<script>"}]
+        assert self.records(main_secure.app, songs=songs)[0] in (401, 403)
+        token = create_access_token({"sub": "alice"})
+        status, records = self.records(main_secure.app, {"Authorization": f"Bearer {token}"},
+                                       songs=songs, useGptFallback=False)
+        assert status == 200
+        assert records[0]["artist"] == "M83script"
+        assert records[-1]["status"] == "done"
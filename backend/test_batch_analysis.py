@@ -0,0 +1,103 @@
+"""
+Tests for the batch analysis endpoint and byte quota accounting
+"""
+
+import hashlib
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+import main_secure
+from batch_analysis import ByteQuota
+from rate_limit_store import SQLiteStorage
+from main_secure import app, advanced_analysis
+
+client = TestClient(app, base_url="http://localhost")
+
+VALID_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right
+The bugs keep coming but I stay strong
+I'll keep debugging through the morning light
+"""
+
+class TestByteQuota:
+    """Test sliding-window byte accounting"""
+    
+    def test_consume_within_limit(self):
+        quota = ByteQuota(limit_bytes=100)
+        assert quota.consume("a", 60) == (True, 0.0)
+        assert quota.remaining("a") == 40
+        allowed, retry_after = quota.consume("a", 60)
+        assert not allowed
+        assert 0 < retry_after <= 60
+        # Other clients are accounted separately
+        assert quota.consume("b", 100)[0]
+    
+    def test_window_expiry(self):
+        quota = ByteQuota(limit_bytes=10, window_seconds=0)
+        assert quota.consume("a", 10)[0]
+        assert quota.consume("a", 10)[0]
+
+    def test_shared_storage(self, tmp_path):
+        uri = f"sqlite:///{tmp_path / 'limits.db'}"
+        first = ByteQuota(limit_bytes=100, storage=SQLiteStorage(uri))
+        second = ByteQuota(limit_bytes=100, storage=SQLiteStorage(uri))
+        assert first.consume("a", 60) == (True, 0.0)
+        # Another worker sees the same usage
+        assert second.remaining("a") == 40
+        allowed, retry_after = second.consume("a", 60)
+        assert not allowed
+        assert 0 < retry_after <= 60
+        assert second.consume("b", 100)[0]
+        assert not first.consume("c", 101)[0]
+
+class TestBatchEndpoint:
+    """Test /api/analyze/batch"""
+    
+    def test_results_in_input_order(self):
+        items = [
+            {"lyrics": VALID_LYRICS, "title": "One"},
+            {"lyrics": "<script>alert('x')</script> javascript:void(0) lyrics"},
+            {"lyrics": VALID_LYRICS.upper(), "title": "Three"},
+        ]
+        response = client.post("/api/analyze/batch", json={"items": items})
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert [result["index"] for result in data["results"]] == [0, 1, 2]
+        assert [result["status"] for result in data["results"]] == ["ok", "error", "ok"]
+        assert "malicious" in data["results"][1]["error"]
+        assert data["summary"]["total"] == 3
+        assert data["summary"]["succeeded"] == 2
+        
+        expected = advanced_analysis(VALID_LYRICS)
+        assert data["results"][0]["analysis"]["dashboard"] == expected["dashboard"]
+    
+    def test_duplicates_hash_their_own_lyrics(self):
+        lyrics = VALID_LYRICS.replace("code", "song's code")
+        variant = lyrics.replace("night long", "night   long")
+        response = client.post("/api/analyze/batch", json={"items": [{"lyrics": lyrics}, {"lyrics": variant}]})
+        first, second = (result["analysis"] for result in response.json()["results"])
+        assert first["dashboard"] == second["dashboard"]
+        assert first["security"]["analysisHash"] == hashlib.sha256(lyrics.replace("'", "").encode()).hexdigest()[:16]
+        assert second["security"]["analysisHash"] == hashlib.sha256(variant.replace("'", "").encode()).hexdigest()[:16]
+    
+    def test_empty_batch_rejected(self):
+        response = client.post("/api/analyze/batch", json={"items": []})
+        assert response.status_code == 422
+    
+    def test_byte_quota_exceeded(self, monkeypatch):
+        monkeypatch.setattr(main_secure, "batch_quota", ByteQuota(limit_bytes=len(VALID_LYRICS) * 3))
+        batch = {"items": [{"lyrics": VALID_LYRICS}, {"lyrics": VALID_LYRICS}]}
+        assert client.post("/api/analyze/batch", json=batch).status_code == 200
+        response = client.post("/api/analyze/batch", json=batch)
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+    
+    def test_oversized_batch_rejected(self, monkeypatch):
+        monkeypatch.setattr(main_secure, "batch_quota", ByteQuota(limit_bytes=10))
+        response = client.post("/api/analyze/batch", json={"items": [{"lyrics": VALID_LYRICS}]})
+        assert response.status_code == 413
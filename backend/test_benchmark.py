@@ -0,0 +1,80 @@
+"""
+Tests for the benchmark harness and its regression check
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+from benchmark import (
+    BenchmarkResult, compare, load_baseline, percentile, run_suite, save_baseline, synthetic_lyrics
+)
+
+def result(p50, p99=None):
+    return BenchmarkResult(runs=10, p50_ms=p50, p99_ms=p99 if p99 is not None else p50, mean_ms=p50)
+
+class TestSyntheticLyrics:
+    """Inputs must be reproducible and sized as requested"""
+
+    def test_deterministic_and_bounded(self):
+        for size in benchmark.LYRIC_SIZES:
+            text = synthetic_lyrics(size)
+            assert text == synthetic_lyrics(size)
+            assert size * 0.8 < len(text.encode("utf-8")) <= size
+        assert synthetic_lyrics(1000, seed=1) != synthetic_lyrics(1000)
+
+    def test_has_stanzas(self):
+        assert "\n\n" in synthetic_lyrics(1000)
+
+class TestStatistics:
+    """Percentiles and regression thresholds"""
+
+    def test_nearest_rank_percentile(self):
+        samples = list(range(1, 101))
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 99) == 99
+        assert percentile([3.0], 99) == 3.0
+
+    def test_compare_flags_p50_and_p99(self):
+        baseline = {"a": result(1.0, 2.0), "b": result(1.0, 2.0), "c": result(1.0, 2.0)}
+        current = {"a": result(1.6, 2.0), "b": result(1.0, 4.5), "c": result(1.4, 3.9), "new": result(9.0)}
+        regressions = compare(current, baseline, p50_threshold=1.5, p99_threshold=2.0, min_delta_ms=0.1)
+        assert sorted(regressions) == ["a", "b"]
+        assert regressions["a"][0].startswith("p50 ")
+        assert regressions["b"][0].startswith("p99 ")
+
+    def test_compare_ignores_tiny_deltas(self):
+        regressions = compare({"a": result(0.004)}, {"a": result(0.001)}, min_delta_ms=0.1)
+        assert regressions == {}
+
+    def test_baseline_round_trip(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        save_baseline(path, {"a": result(1.5, 2.5)})
+        assert load_baseline(path) == {"a": result(1.5, 2.5)}
+        assert "python" in json.load(open(path))["environment"]
+
+class TestSuite:
+    """Running the cases themselves"""
+
+    def test_function_cases(self):
+        results = run_suite([100], include_endpoints=False, min_runs=2, min_time=0, rounds=1)
+        for app in ("main", "main_secure"):
+            for name in ("count_syllables", "detect_rhymes", "analyze_emotion", "advanced_analysis"):
+                assert results[f"{app}.{name}/100"].p50_ms > 0
+
+    def test_endpoint_case(self):
+        case = "main_secure./api/analyze/1000"
+        results = run_suite([1000], only=[case], min_runs=2, min_time=0, rounds=1)
+        assert list(results) == [case]
+
+    def test_check_exit_code(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        case = "main.advanced_analysis/10000"
+        args = ["--check", "--baseline", path, "--processes", "1", "--no-endpoints",
+                "--sizes", "10000", "--cases", case]
+        save_baseline(path, {case: result(100000.0)})
+        assert benchmark.main(args) == 0
+        save_baseline(path, {case: result(0.01)})
+        assert benchmark.main(args) == 1
@@ -0,0 +1,124 @@
+"""
+Tests for the NumPy corpus engine and its parity with the per-song analysis
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import main
+from analysis_executor import AnalysisExecutor
+from batch_analysis import run_corpus_batch
+from corpus_engine import CorpusEngine
+from fastapi.testclient import TestClient
+
+VALID_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right
+The bugs keep coming but I stay strong
+I'll keep debugging through the morning light
+"""
+
+VOCABULARY = (
+    "love Love's hate PAIN fire! burn, dream? night light bright though through STRONG "
+    "debugging functions self-care 42nd naïve café don't I'm you're !!! ... a"
+).split()
+
+def random_corpus(count, seed=11):
+    rng = random.Random(seed)
+    corpus = [VALID_LYRICS, "", "  \n\n", "one", "ONE TWO!"]
+    for _ in range(count):
+        lines = [
+            " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(0, 9))) + rng.choice(["", "!", "?", " ", "\t"])
+            for _ in range(rng.randint(0, 30))
+        ]
+        corpus.append("\n".join(lines) + rng.choice(["", "\n\n"]))
+    return corpus
+
+def comparable(analysis):
+    analysis = dict(analysis)
+    analysis["metadata"] = {k: v for k, v in analysis["metadata"].items() if k != "analysisDate"}
+    return json.dumps(analysis, sort_keys=True)
+
+class TestCorpusParity:
+    """Vectorized results must be identical to advanced_analysis"""
+
+    def test_matches_scalar_analysis(self):
+        corpus = random_corpus(500)
+        vectorized = main.analyze_corpus(corpus)
+        assert len(vectorized) == len(corpus)
+        for lyrics, analysis in zip(corpus, vectorized):
+            assert comparable(analysis) == comparable(main.advanced_analysis(lyrics))
+
+    def test_tables_persist_between_batches(self):
+        engine = CorpusEngine(main.count_syllables, main.lexical_key, main.lexicon_score)
+        engine.extract([VALID_LYRICS])
+        size = engine.vocabulary_size
+        features = engine.extract([VALID_LYRICS, VALID_LYRICS.upper()])
+        assert engine.vocabulary_size > size
+        assert features.word_count.tolist() == [32, 32]
+
+    def test_vocabulary_limit_rebuilds_tables(self):
+        engine = CorpusEngine(main.count_syllables, main.lexical_key, main.lexicon_score, max_vocabulary=40)
+        first = engine.extract([VALID_LYRICS])
+        engine.extract([VALID_LYRICS.upper()])
+        # The second batch did not fit next to the first, so only its tokens remain
+        assert engine.vocabulary_size == len(set(VALID_LYRICS.upper().split()))
+        again = engine.extract([VALID_LYRICS])
+        assert again.unique_words.tolist() == first.unique_words.tolist()
+        assert again.rhyme_score.tolist() == first.rhyme_score.tolist()
+
+    def test_flow_variance_is_nan_below_two_lines(self):
+        engine = CorpusEngine(main.count_syllables, main.lexical_key, main.lexicon_score)
+        features = engine.extract(["just one line", ""])
+        assert np.isnan(features.flow_variance).all()
+        assert features.line_count.tolist() == [1, 0]
+
+class TestCorpusRhymes:
+    """Window rhyme counts and stanza schemes match the scalar path"""
+
+    def test_schemes_and_scores(self):
+        lyrics = "Roses in the night\nWalking through the fire\nShining very bright\nLifting me up higher\n\nOne\n\n"
+        engine = CorpusEngine(main.count_syllables, main.lexical_key, main.lexicon_score)
+        features = engine.extract([lyrics, "", VALID_LYRICS])
+        assert features.rhyme_schemes == [["ABAB", "A"], [], ["ABAB"]]
+        scalar = main.extract_features(lyrics)
+        assert features.rhyme_score.tolist()[0] == scalar.rhyme_score
+
+class TestCorpusBatch:
+    """Chunked execution of corpus functions"""
+
+    def test_results_in_input_order(self):
+        executor = AnalysisExecutor(mode="inline", max_workers=3)
+        corpus = random_corpus(20)
+        outcomes = asyncio.run(run_corpus_batch(main.analyze_corpus, corpus, chunk_size=4, executor=executor))
+        assert [ok for ok, _ in outcomes] == [True] * len(corpus)
+        assert [comparable(value) for _, value in outcomes] == [comparable(a) for a in main.analyze_corpus(corpus)]
+
+    def test_failing_chunk_fails_its_items(self):
+        executor = AnalysisExecutor(mode="inline", max_workers=2)
+
+        def analyze(chunk):
+            if "boom" in chunk:
+                raise RuntimeError("boom")
+            return chunk
+
+        outcomes = asyncio.run(run_corpus_batch(analyze, ["a", "b", "boom", "c"], executor=executor))
+        assert [ok for ok, _ in outcomes] == [True, True, False, False]
+
+    def test_batch_endpoint_matches_single_analysis(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        main.result_cache.clear()
+        items = [{"lyrics": lyrics} for lyrics in random_corpus(10, seed=5) if lyrics.strip()]
+        response = client.post("/api/analyze/batch", json={"items": items})
+        assert response.status_code == 200
+        for item, result in zip(items, response.json()["results"]):
+            assert result["status"] == "ok"
+            assert comparable(result["analysis"]) == comparable(main.advanced_analysis(item["lyrics"]))
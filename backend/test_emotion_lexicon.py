@@ -0,0 +1,60 @@
+"""
+Tests for the compiled emotion lexicon matcher
+"""
+
+import os
+import re
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from emotion_lexicon import DEFAULT_CATEGORIES, DEFAULT_WEIGHTS, EmotionLexicon
+from lyric_document import LyricDocument
+
+LYRICS = """Love is a FIRE that will burn tonight!
+Lost in the dark, love's light, can you feel the rage?
+"""
+
+def regex_score(lyrics):
+    """The previous per-word regex implementation, kept as the reference"""
+    score = 0
+    for category, words in DEFAULT_CATEGORIES.items():
+        for word in words:
+            count = len(re.findall(r'\b' + word + r'\b', lyrics.lower()))
+            score += count * DEFAULT_WEIGHTS[category]
+    return score
+
+class TestEmotionLexicon:
+    """Test category scoring and lexicon loading"""
+    
+    def test_matches_regex_reference(self):
+        lexicon = EmotionLexicon.from_categories(DEFAULT_CATEGORIES, DEFAULT_WEIGHTS)
+        doc = LyricDocument(LYRICS)
+        assert lexicon.match(doc.words).score == regex_score(LYRICS)
+    
+    def test_category_counts(self):
+        lexicon = EmotionLexicon.from_categories(DEFAULT_CATEGORIES, DEFAULT_WEIGHTS)
+        match = lexicon.match(["love", "love", "fire", "nothing"])
+        assert match.counts == {"positive": 2, "intense": 1}
+        assert match.hits() == 3
+        assert match.hits("positive", "negative") == 2
+        assert match.score == 35
+    
+    def test_load_weighted_file(self, tmp_path):
+        path = tmp_path / "lexicon.tsv"
+        rows = ["# word\tcategory\tweight", "", "serene\tpositive\t4.5", "gloom\tnegative"]
+        rows += [f"word{i}\tintense\t1" for i in range(5000)]
+        path.write_text("\n".join(rows), encoding="utf-8")
+        
+        lexicon = EmotionLexicon.from_categories(DEFAULT_CATEGORIES, DEFAULT_WEIGHTS)
+        assert lexicon.load(str(path), DEFAULT_WEIGHTS) == 5002
+        assert len(lexicon) == 28 + 5002
+        match = lexicon.match(["serene", "gloom", "word42", "love"])
+        assert match.score == 4.5 + 10 + 1 + 10
+    
+    def test_load_rejects_malformed_lines(self, tmp_path):
+        path = tmp_path / "bad.tsv"
+        path.write_text("justaword\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            EmotionLexicon().load(str(path))
@@ -0,0 +1,119 @@
+"""
+Contract tests for pre-encoded analysis responses
+
+Fast responses skip per-request model validation, so these tests check once,
+over varied lyrics, that every analysis the apps can return satisfies the
+response models and encodes to the same JSON the validated path produced.
+"""
+
+import json
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+import fast_json
+import main
+import main_secure
+from fast_json import FastJSONResponse, _json_dumps, dumps
+
+SAMPLES = [
+    "The night is young and bright\nWe sing until the morning light",
+    "LOUD!!! and PROUD!!!\nWHO are we? we are the CROWD\n\nnever back down",
+    "Ünïcödé lyrics — “quoted” ✨\nmañana será otro día",
+    "one two three four five six",
+]
+
+def random_lyrics(rng):
+    vocabulary = "love night light FIRE desire higher the a we run fall all tonight! why? miracle".split()
+    return "\n".join(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 8)))
+                     for _ in range(rng.randint(1, 12)))
+
+def lyrics_corpus():
+    rng = random.Random(17)
+    return SAMPLES + [random_lyrics(rng) for _ in range(25)]
+
+def without_dates(data):
+    data = dict(data)
+    data["metadata"] = {**data["metadata"], "analysisDate": None}
+    if "security" in data:
+        data["security"] = {**data["security"], "timestamp": None}
+    return data
+
+def typed(data):
+    """JSON document with every scalar paired with its type, so 53 and 53.0 differ"""
+    if isinstance(data, dict):
+        return {key: typed(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [typed(value) for value in data]
+    return type(data).__name__, data
+
+class TestContract:
+    """Every analysis must satisfy AnalysisResponse and encode like the validated path"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_analyses_satisfy_response_model(self, app_module):
+        for lyrics in lyrics_corpus():
+            analysis = app_module.advanced_analysis(lyrics)
+            validated = jsonable_encoder(app_module.AnalysisResponse(**analysis))
+            assert set(analysis) == set(validated)
+            assert dumps(app_module.response_document(analysis)) == dumps(validated)
+
+    def test_corpus_engine_results_encode(self):
+        # Batch results come from the NumPy corpus engine and share the result cache
+        corpus = lyrics_corpus()
+        for lyrics, analysis in zip(corpus, main.analyze_corpus(corpus)):
+            main.AnalysisResponse(**analysis)
+            # Batch items have no response model, so they keep a single analysis's types
+            assert typed(without_dates(analysis)) == typed(without_dates(main.advanced_analysis(lyrics)))
+            assert typed(json.loads(dumps(analysis))) == typed(jsonable_encoder(analysis))
+
+    def test_encoders_agree(self):
+        for lyrics in lyrics_corpus():
+            analysis = main.advanced_analysis(lyrics)
+            assert typed(json.loads(_json_dumps(analysis))) == typed(json.loads(dumps(analysis)))
+
+class TestEndpoints:
+    """Fast and validated response modes return the same documents"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    @pytest.mark.parametrize("path", ["/api/analyze", "/api/analyze/simple"])
+    def test_fast_matches_validated(self, app_module, path, monkeypatch):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        body = {"lyrics": f"{SAMPLES[2]}\nserved by {app_module.__name__} at {path}"}
+        fast = client.post(path, json=body)
+        monkeypatch.setattr(app_module, "FAST_RESPONSES", False)
+        validated = client.post(path, json=body)
+        assert fast.status_code == validated.status_code == 200
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.headers["etag"] == validated.headers["etag"]
+        assert typed(without_dates(fast.json())) == typed(without_dates(validated.json()))
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_only_the_model_endpoint_coerces(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        body = {"lyrics": f"{SAMPLES[0]}\ntyped by {app_module.__name__}"}
+        modelled = client.post("/api/analyze", json=body).json()["complexity"]
+        simple = client.post("/api/analyze/simple", json=body).json()["complexity"]
+        assert all(isinstance(value, float) for value in modelled.values())
+        # /api/analyze/simple has no response model and keeps round()'s ints
+        assert any(isinstance(value, int) for value in simple.values())
+        assert simple == modelled
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_openapi_keeps_response_model(self, app_module):
+        schema = app_module.app.openapi()
+        response = schema["paths"]["/api/analyze"]["post"]["responses"]["200"]
+        assert response["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/AnalysisResponse"}
+        assert "AnalysisResponse" in schema["components"]["schemas"]
+
+    def test_fast_response_renders_bytes(self):
+        response = FastJSONResponse({"a": [1, 2.5, "é"]}, headers={"ETag": '"x"'})
+        assert json.loads(response.body) == {"a": [1, 2.5, "é"]}
+        assert response.headers["etag"] == '"x"'
+        if fast_json.orjson is not None:
+            assert response.body == b'{"a":[1,2.5,"\xc3\xa9"]}'
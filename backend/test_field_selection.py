@@ -0,0 +1,144 @@
+"""
+Tests for field-selective analysis (fields=flow,energy)
+"""
+
+import itertools
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from lyric_document import LyricDocument
+from readability import READABILITY_FORMULAS, document_counts, readability_scores
+from main import (
+    FEATURE_STAGES, FULL_ANALYSIS_SECTIONS, FULL_ANALYSIS_STAGES, SECTION_STAGES, advanced_analysis,
+    analysis_plan, extract_features, parse_fields,
+)
+
+SAMPLES = [
+    "I've been working on this code all night long\nTrying to make the functions work just right",
+    "LOUD and PROUD!!! we SHOUT tonight\nthe fire and desire\n\nwe run, we fall\nwe rise above it all?",
+    "one",
+    "Love love love\nabove above\n\nthe night is bright\nthe light is right\nhold me tight",
+]
+
+def random_lyrics(rng):
+    vocabulary = "love night light FIRE desire higher the a we run fall all tonight! why? miracle".split()
+    return "\n".join(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 8)))
+                     for _ in range(rng.randint(1, 12)))
+
+def without_date(analysis):
+    analysis = dict(analysis)
+    if "metadata" in analysis:
+        analysis["metadata"] = {**analysis["metadata"], "analysisDate": None}
+    return analysis
+
+class TestPlan:
+    """Parsing fields and building the stage plan"""
+
+    def test_parse_fields(self):
+        assert parse_fields(None) is None
+        assert parse_fields("") is None
+        assert parse_fields("energy, flow") == ("energy", "flow")
+        # Response order, duplicates collapsed
+        assert parse_fields("insights,complexity,insights") == ("complexity", "insights")
+        with pytest.raises(ValueError, match="bogus"):
+            parse_fields("flow,bogus")
+
+    def test_plan_is_minimal(self):
+        assert analysis_plan(["metadata"]) == frozenset()
+        assert analysis_plan(["flow"]) == {"syllables", "rhymes"}
+        assert analysis_plan(SECTION_STAGES) == FEATURE_STAGES
+        assert analysis_plan(["readability"]) == {"readability"}
+        assert "readability" not in analysis_plan(FULL_ANALYSIS_SECTIONS)
+
+    def test_full_analysis_skips_readability(self, monkeypatch):
+        assert set(advanced_analysis(SAMPLES[0], ("readability",))["readability"]) == set(READABILITY_FORMULAS)
+        def fail(*args):
+            raise AssertionError("readability should not run")
+        monkeypatch.setattr(main, "document_counts", fail)
+        assert "readability" not in FULL_ANALYSIS_STAGES
+        assert extract_features(SAMPLES[0]).readability is None
+        assert "readability" not in advanced_analysis(SAMPLES[0])
+
+    def test_unrequested_stages_do_not_run(self, monkeypatch):
+        def fail(*args):
+            raise AssertionError("stage should not run")
+        monkeypatch.setattr(main, "rhyme_keys", fail)
+        monkeypatch.setattr(main, "analyze_emotion", fail)
+        monkeypatch.setattr(main, "count_syllables", fail)
+        assert set(advanced_analysis(SAMPLES[0], ("metadata",))) == {"metadata"}
+        features = extract_features(SAMPLES[0], analysis_plan(["metadata"]))
+        assert features.word_count == len(SAMPLES[0].split())
+        assert features.readability is None
+
+class TestSelectionParity:
+    """A selection must equal the same sections of the full analysis"""
+
+    def test_every_selection_matches_full_analysis(self):
+        rng = random.Random(11)
+        texts = SAMPLES + [random_lyrics(rng) for _ in range(20)]
+        selections = [combo for size in (1, 2) for combo in itertools.combinations(FULL_ANALYSIS_SECTIONS, size)]
+        for text in texts:
+            full = without_date(advanced_analysis(text))
+            for sections in selections:
+                partial = without_date(advanced_analysis(text, sections))
+                assert partial == {name: full[name] for name in sections}, (text, sections)
+
+class TestFieldsEndpoint:
+    """fields= on /api/analyze and /api/analyze/simple"""
+
+    def test_full_response_is_unchanged(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        body = {"lyrics": SAMPLES[1] + "\nunchanged"}
+        plain = client.post("/api/analyze", json=body)
+        explicit = client.post("/api/analyze?fields=", json=body)
+        assert plain.status_code == explicit.status_code == 200
+        assert list(plain.json()) == list(FULL_ANALYSIS_SECTIONS)
+        assert plain.headers["etag"] == explicit.headers["etag"]
+        assert without_date(plain.json()) == without_date(explicit.json())
+
+    @pytest.mark.parametrize("path", ["/api/analyze", "/api/analyze/simple"])
+    def test_selected_sections(self, path):
+        client = TestClient(main.app, base_url="http://localhost")
+        lyrics = SAMPLES[3] + f"\nselected via {path}"
+        response = client.post(f"{path}?fields=energy,flow", json={"lyrics": lyrics})
+        assert response.status_code == 200
+        data = response.json()
+        assert list(data) == ["energy", "flow"]
+        assert data == {name: advanced_analysis(lyrics)[name] for name in ("energy", "flow")}
+
+        full = client.post(path, json={"lyrics": lyrics})
+        assert response.headers["etag"] != full.headers["etag"]
+        revalidated = client.post(f"{path}?fields=flow,energy", json={"lyrics": lyrics},
+                                  headers={"If-None-Match": response.headers["etag"]})
+        assert revalidated.status_code == 304
+
+    def test_selection_is_served_from_cached_full_analysis(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        lyrics = SAMPLES[0] + "\ncached in full first"
+        full = client.post("/api/analyze/simple", json={"lyrics": lyrics}).json()
+        hits = main.result_cache.stats()["hits"]
+        data = client.post("/api/analyze/simple?fields=dashboard", json={"lyrics": lyrics}).json()
+        assert main.result_cache.stats()["hits"] == hits + 1
+        assert data == {"dashboard": full["dashboard"]}
+
+    def test_readability_is_opt_in(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        lyrics = SAMPLES[2] + "\nread me"
+        client.post("/api/analyze/simple", json={"lyrics": lyrics})
+        data = client.post("/api/analyze/simple?fields=flow,readability", json={"lyrics": lyrics}).json()
+        assert list(data) == ["flow", "readability"]
+        assert data["readability"] == readability_scores(
+            document_counts(LyricDocument(lyrics, main.count_syllables))
+        )
+
+    def test_unknown_field_rejected(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        response = client.post("/api/analyze?fields=flow,vibes", json={"lyrics": SAMPLES[0]})
+        assert response.status_code == 400
+        assert "vibes" in response.json()["detail"]
@@ -0,0 +1,170 @@
+"""
+Tests for incremental editor-session analysis
+"""
+
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import main_secure
+from incremental import IncrementalAnalyzer
+
+VALID_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right
+The bugs keep coming but I stay strong
+I'll keep debugging through the morning light
+"""
+
+EXTRA_LINES = [
+    "LOVE and joy are burning bright!",
+    "Why does the pain keep calling?",
+    "Walking through the fire, walking through the rain",
+    "Broken hearts and happy days",
+    "<b>Stay</b> with me tonight & tomorrow",
+    "   ",
+    "Hope",
+]
+
+def strip_volatile(analysis):
+    return {k: v for k, v in analysis.items() if k not in ("metadata", "session")}
+
+def revisions(seed=7, steps=40):
+    """Random edit sequence: insert, delete, replace and in-line edits"""
+    rng = random.Random(seed)
+    lines = VALID_LYRICS.strip().split("\n")
+    for _ in range(steps):
+        action = rng.choice(["insert", "delete", "replace", "edit"])
+        index = rng.randrange(len(lines) + 1)
+        if action == "insert" or not lines:
+            lines.insert(index, rng.choice(EXTRA_LINES))
+        elif action == "delete" and len(lines) > 1:
+            del lines[min(index, len(lines) - 1)]
+        elif action == "replace":
+            lines[min(index, len(lines) - 1)] = rng.choice(EXTRA_LINES)
+        else:
+            target = min(index, len(lines) - 1)
+            lines[target] = lines[target] + " " + rng.choice(["again!", "tonight", "why?", "FIRE"])
+        yield "\n".join(lines)
+
+def counting_analyzer(app_module):
+    calls = []
+    def analyze_line(line):
+        calls.append(line)
+        return app_module.analyze_line(line)
+    preprocess = main_secure.sanitize_lyrics if app_module is main_secure else None
+    return IncrementalAnalyzer(analyze_line, preprocess=preprocess), calls
+
+class TestParity:
+    """Session results must match a full re-analysis after every edit"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_matches_full_analysis(self, app_module):
+        analyzer = IncrementalAnalyzer(app_module.analyze_line,
+                                       preprocess=app_module.incremental_analyzer.preprocess)
+        for lyrics in revisions():
+            totals = analyzer.update("doc", lyrics)
+            incremental = app_module.build_analysis(app_module.session_features(totals, lyrics))
+            full = app_module.advanced_analysis(lyrics)
+            if app_module is main_secure:
+                assert incremental["security"]["analysisHash"] == full["security"]["analysisHash"]
+                incremental.pop("security")
+                full.pop("security")
+            assert strip_volatile(incremental) == strip_volatile(full)
+
+    def test_flow_variance_matches_two_pass(self):
+        analyzer = IncrementalAnalyzer(main.analyze_line)
+        for lyrics in revisions(seed=3):
+            totals = analyzer.update("doc", lyrics)
+            features = main.extract_features(lyrics)
+            if features.flow_variance is None:
+                assert totals.flow_variance is None
+            else:
+                assert totals.flow_variance == pytest.approx(features.flow_variance, abs=1e-9)
+
+class TestIncrementalWork:
+    """Only changed lines are analyzed again"""
+
+    def test_single_line_edit_recomputes_one_line(self):
+        analyzer, calls = counting_analyzer(main)
+        lines = VALID_LYRICS.strip().split("\n")
+        analyzer.update("doc", "\n".join(lines))
+        assert len(calls) == 4
+
+        lines[1] = lines[1] + " tonight"
+        totals = analyzer.update("doc", "\n".join(lines))
+        assert calls[4:] == [lines[1]]
+        assert totals.changed_lines == 1
+        assert totals.recomputed_lines == 1
+
+    def test_unchanged_document_recomputes_nothing(self):
+        analyzer, calls = counting_analyzer(main)
+        analyzer.update("doc", VALID_LYRICS)
+        totals = analyzer.update("doc", VALID_LYRICS + "\n\n")
+        assert len(calls) == 4
+        assert totals.changed_lines == 0
+
+    def test_line_cache_is_shared_between_sessions(self):
+        analyzer, calls = counting_analyzer(main)
+        analyzer.update("a", VALID_LYRICS)
+        totals = analyzer.update("b", VALID_LYRICS)
+        assert len(calls) == 4
+        assert totals.changed_lines == 4
+        assert totals.recomputed_lines == 0
+
+    def test_vocabulary_drops_removed_words(self):
+        analyzer = IncrementalAnalyzer(main.analyze_line)
+        analyzer.update("doc", "hello world\nhello moon")
+        assert analyzer.update("doc", "hello world").unique_words == 2
+
+class TestSessionLifecycle:
+    """Session limits and expiry"""
+
+    def test_max_sessions_evicts_least_recent(self):
+        analyzer = IncrementalAnalyzer(main.analyze_line, max_sessions=2)
+        for session_id in ("a", "b", "c"):
+            analyzer.update(session_id, VALID_LYRICS)
+        assert analyzer.stats()["sessions"] == 2
+        assert not analyzer.end("a")
+        assert analyzer.end("c")
+
+    def test_expired_session_starts_over(self):
+        analyzer = IncrementalAnalyzer(main.analyze_line, session_ttl=0)
+        analyzer.update("doc", VALID_LYRICS)
+        assert analyzer.update("doc", VALID_LYRICS).revision == 1
+
+    def test_line_cache_is_bounded(self):
+        analyzer = IncrementalAnalyzer(main.analyze_line, line_cache_size=3)
+        analyzer.update("doc", VALID_LYRICS)
+        assert analyzer.stats()["cachedLines"] == 3
+
+class TestSessionEndpoints:
+    """Session endpoints on both APIs"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_session_round_trip(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        url = "/api/analyze/session/editor-1"
+
+        first = client.post(url, json={"lyrics": VALID_LYRICS})
+        assert first.status_code == 200
+        assert first.json()["session"]["revision"] == 1
+        assert first.json()["session"]["changedLines"] == 4
+
+        edited = VALID_LYRICS.replace("all night long", "all night")
+        second = client.post(url, json={"lyrics": edited})
+        assert second.status_code == 200
+        assert second.json()["session"]["changedLines"] == 1
+
+        assert client.delete(url).status_code == 200
+        assert client.delete(url).status_code == 404
+
+    def test_secure_session_rejects_malicious_content(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        response = client.post("/api/analyze/session/editor-2", json={"lyrics": "javascript:alert(1)"})
+        assert response.status_code == 400
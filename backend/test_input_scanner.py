@@ -0,0 +1,127 @@
+"""
+Tests for the linear-time input scanner, including adversarial inputs
+"""
+
+import os
+import random
+import re
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main_secure
+from input_scanner import find_suspicious, fold_case, is_suspicious, strip_tags, strip_xss
+
+# The per-pattern regexes the scanner replaces
+REFERENCE_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'javascript:',
+    r'vbscript:',
+    r'on\w+\s*=',
+    r'expression\s*\(',
+    r'data:text/html',
+]
+PIECES = [
+    '<script', '<SCRIPT', '<ſcrİpt', '</script>', '</ScRiPt>', '<', '>', ' ', '\t', '\n', '=', '(',
+    'on', 'ON', 'onx', 'x', 'a', '1', '_', 'é', 'ſ', 'İ', 'ı', 'K', 'expression', 'EXPRESSİON',
+    'javascript:', 'JAVAſCRIPT:', 'vbscript:', 'data:', 'text/html', 'data:text/html',
+]
+# Inputs on which the reference regexes backtrack quadratically
+ADVERSARIAL = [
+    lambda n: '<' * n,
+    lambda n: 'on' * (n // 2),
+    lambda n: 'on' * (n // 2) + ' =',
+    lambda n: '<script ' * (n // 8),
+    lambda n: '<script>' * (n // 8),
+    lambda n: '<script>a' * (n // 9) + '\n</script>',
+    lambda n: 'a' * n + '=',
+    lambda n: 'a=' * (n // 2),
+    lambda n: 'expression' + ' ' * n,
+    lambda n: 'İ' * n,
+]
+
+def reference_suspicious(text):
+    return any(re.search(pattern, text, re.IGNORECASE) for pattern in REFERENCE_PATTERNS)
+
+def elapsed(func, *args):
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+class TestEquivalence:
+    """The scanner must flag exactly what the per-pattern regexes flagged"""
+
+    def test_random_inputs_match_reference(self):
+        rng = random.Random(7)
+        for _ in range(30000):
+            text = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+            assert (find_suspicious(text) is not None) == reference_suspicious(text), repr(text)
+            assert strip_tags(text) == re.sub(r'<[^>]*>', '', text), repr(text)
+
+    def test_known_vectors(self):
+        assert find_suspicious("click JavaScript:alert(1)") == "javascript:"
+        assert find_suspicious('<img src=x onerror =alert(1)>') == "on*="
+        assert find_suspicious("width: expression (alert(1))") == "expression("
+        assert find_suspicious("<script type='x'>alert(1)</script>") == "<script>"
+        assert find_suspicious("<script>\nalert(1)</script>") is None
+        assert find_suspicious("I'm on my way, love = pain") is None
+        assert find_suspicious("lemonade = sweet") == "on*="
+
+    def test_case_folding(self):
+        assert fold_case("JAVAſCRİPT") == "javascript"
+        assert len(fold_case("İſıK" * 3)) == 12
+        assert find_suspicious("JAVAſCRİPT:") == "javascript:"
+
+    def test_is_suspicious_stops_at_first_hit(self):
+        def fields():
+            yield "plain lyrics"
+            yield "javascript:"
+            raise AssertionError("scanned past the first hit")
+        assert is_suspicious(fields())
+        assert not is_suspicious(["plain lyrics", "Title", "Artist", "anonymous"])
+
+    def test_strip_xss(self):
+        assert strip_xss('<b>"Tom" & \'Jerry\'</b>') == 'bTom  Jerry/b'
+
+class TestLinearTime:
+    """Quadrupling an adversarial input must not multiply the time by ~16"""
+
+    @pytest.mark.parametrize("make", ADVERSARIAL)
+    def test_no_superlinear_backtracking(self, make):
+        small = elapsed(lambda text: (find_suspicious(text), strip_tags(text)), make(12500))
+        large = elapsed(lambda text: (find_suspicious(text), strip_tags(text)), make(50000))
+        # Linear would be x4; allow noise, quadratic would be x16
+        assert large < max(small * 8, 0.005)
+        # 50 KB is the lyrics size limit; the reference regexes took seconds here
+        assert large < 0.25
+
+class TestSecureEndpoints:
+    """verify_request_integrity through the API"""
+
+    def test_tags_cannot_split_a_keyword(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        lyrics = "Sing along tonight java<b></b>script:alert(1) forever"
+        response = client.post("/api/analyze", json={"lyrics": lyrics})
+        assert response.status_code == 400
+        assert "malicious content" in response.json()["detail"]
+
+    def test_unsanitized_user_id_is_scanned(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        response = client.post("/api/analyze", json={
+            "lyrics": "A perfectly normal verse about the night",
+            "userId": "<script>x</script>",
+        })
+        assert response.status_code == 400
+
+    def test_adversarial_lyrics_are_fast(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        started = time.perf_counter()
+        response = client.post("/api/analyze/simple", json={"lyrics": "on" * 24000})
+        assert response.status_code in (200, 400)
+        assert time.perf_counter() - started < 5
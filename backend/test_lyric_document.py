@@ -0,0 +1,72 @@
+"""
+Tests for the tokenize-once LyricDocument
+"""
+
+import re
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from lyric_document import LyricDocument, flow_variance
+
+SAMPLE_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right!
+
+The bugs keep coming, but I stay STRONG?
+"""
+
+class TestTokenization:
+    """Test the document matches the legacy per-stage tokenization"""
+    
+    def test_tokens_match_split(self):
+        doc = LyricDocument(SAMPLE_LYRICS)
+        assert doc.tokens == SAMPLE_LYRICS.split()
+        assert doc.lower_tokens == SAMPLE_LYRICS.lower().split()
+    
+    def test_lines_match_legacy(self):
+        doc = LyricDocument(SAMPLE_LYRICS)
+        expected = [line.strip() for line in SAMPLE_LYRICS.split('\n') if line.strip()]
+        assert doc.lines == expected
+        for i, line in enumerate(doc.lines):
+            assert doc.line_tokens(i) == line.split()
+    
+    def test_cleaned_tokens(self):
+        doc = LyricDocument(SAMPLE_LYRICS)
+        assert doc.cleaned == [re.sub(r'[^\w]', '', word) for word in SAMPLE_LYRICS.split()]
+    
+    def test_words_match_word_boundaries(self):
+        doc = LyricDocument("Love's a fire, love-struck; lovely")
+        assert doc.words.count('love') == len(re.findall(r'\blove\b', "love's a fire, love-struck; lovely"))
+    
+    def test_end_words(self):
+        doc = LyricDocument(SAMPLE_LYRICS)
+        assert doc.end_words() == ['long', 'right', 'strong']
+    
+    def test_stanza_starts(self):
+        doc = LyricDocument("\n\none\ntwo\n  \nthree\n\n\nfour\nfive\n")
+        assert doc.stanza_starts == [0, 2, 3]
+        assert LyricDocument("").stanza_starts == []
+    
+    def test_punctuation_counts(self):
+        doc = LyricDocument(SAMPLE_LYRICS)
+        assert doc.exclamations == 1
+        assert doc.questions == 1
+
+class TestSyllables:
+    """Test per-token and per-line syllable bookkeeping"""
+    
+    def test_counter_called_once_per_distinct_word(self):
+        calls = []
+        def counter(word):
+            calls.append(word)
+            return len(word)
+        doc = LyricDocument("la la la\nla la", counter)
+        assert calls == ['la']
+        assert doc.syllables == [2, 2, 2, 2, 2]
+        assert doc.line_syllables == [6, 4]
+        assert doc.total_syllables == 10
+    
+    def test_flow_variance(self):
+        assert flow_variance([4, 4, 4]) == 0
+        assert flow_variance([2, 4]) == 1
@@ -0,0 +1,182 @@
+"""
+Tests for stage timing, Server-Timing headers and the /metrics endpoint
+"""
+
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import main_secure
+from analysis_executor import AnalysisExecutor
+from metrics import (
+    Counter, Histogram, MetricsRegistry, StageTimer, collect_stages,
+    current_timer, mark_stage, stage, timed_stage,
+)
+
+LYRICS = "The night is young and bright\nWe sing until the morning light"
+
+def server_timing(response):
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, duration = entry.split(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+def metric_value(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def metrics_text(app_module, client):
+    headers = {"X-API-Key": main_secure.API_KEY} if app_module is main_secure else {}
+    response = client.get("/metrics", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return response.text
+
+class TestStages:
+    """Stage timers outside and inside a request"""
+
+    def test_stages_are_noops_without_a_timer(self):
+        assert current_timer() is None
+        with stage("anything"):
+            pass
+        mark_stage("validate")
+        assert timed_stage("x")(lambda value: value * 2)(21) == 42
+
+    def test_collect_stages(self):
+        @timed_stage("work")
+        def work():
+            time.sleep(0.002)
+            return "done"
+
+        with collect_stages() as stages:
+            assert work() == "done"
+            with stage("work"):
+                pass
+            with stage("other"):
+                pass
+        assert set(stages) == {"work", "other"}
+        assert stages["work"] >= 0.002
+        assert current_timer() is None
+
+    def test_server_timing_format(self):
+        timer = StageTimer()
+        timer.add("cache", 0.0015)
+        timer.add("cache", 0.0005)
+        assert timer.server_timing(0.01) == "cache;dur=2.000, total;dur=10.000"
+
+    def test_stage_overhead_is_microseconds(self):
+        rounds = 20000
+        with collect_stages():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                with stage("noop"):
+                    pass
+            elapsed = time.perf_counter() - started
+        # Generous bound for slow CI machines; typically about 1 microsecond
+        assert elapsed / rounds < 20e-6
+
+class TestPrometheusFormat:
+    """Counters, histograms and collectors in the text exposition format"""
+
+    def test_counter_labels_are_escaped(self):
+        counter = Counter("demo_total", "Demo")
+        counter.inc(route='/a"b\\c\nd')
+        counter.inc(2, route='/a"b\\c\nd')
+        assert counter.render()[-1] == 'demo_total{route="/a\\"b\\\\c\\nd"} 3'
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("demo_seconds", "Demo", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, stage="x")
+        assert histogram.render()[2:] == [
+            'demo_seconds_bucket{stage="x",le="0.1"} 2',
+            'demo_seconds_bucket{stage="x",le="1"} 3',
+            'demo_seconds_bucket{stage="x",le="+Inf"} 4',
+            'demo_seconds_sum{stage="x"} 2.65',
+            'demo_seconds_count{stage="x"} 4',
+        ]
+
+    def test_stats_collectors(self):
+        registry = MetricsRegistry(prefix="demo")
+        registry.add_stats("cache", lambda: {"hits": 3, "inFlight": 2}, counters=("hits",), gauges=("inFlight",))
+        text = registry.render()
+        assert "# TYPE demo_cache_hits_total counter" in text
+        assert "demo_cache_hits_total 3" in text
+        assert "# TYPE demo_cache_in_flight gauge" in text
+        assert "demo_cache_in_flight 2" in text
+
+class TestExecutorStages:
+    """Stages measured in a worker reach the request's timer"""
+
+    def test_worker_stages_are_recorded(self):
+        async def timed_run(executor):
+            with collect_stages() as stages:
+                result = await executor.run(main.advanced_analysis, LYRICS)
+            return stages, result
+
+        executor = AnalysisExecutor(mode="process", max_workers=1, max_queue=2)
+        try:
+            stages, result = asyncio.run(timed_run(executor))
+        finally:
+            executor.shutdown()
+        assert result["dashboard"] == main.advanced_analysis(LYRICS)["dashboard"]
+        assert {"queue", "features", "scores", "render"} <= set(stages)
+
+class TestEndpoints:
+    """Server-Timing headers and /metrics on both apps"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_server_timing_header(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        response = client.post("/api/analyze", json={"lyrics": LYRICS + " " + app_module.__name__})
+        assert response.status_code == 200
+        entries = server_timing(response)
+        assert {"validate", "cache", "response_model", "total"} <= set(entries)
+        assert sum(value for name, value in entries.items() if name != "total") <= entries["total"] + 0.01
+        if app_module is main_secure:
+            assert {"integrity", "security_headers"} <= set(entries)
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_metrics_count_requests_and_cache_hits(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        lyrics = f"{LYRICS}\nCounted by {app_module.__name__} at {time.time()}"
+        before = metrics_text(app_module, client)
+        for _ in range(2):
+            assert client.post("/api/analyze", json={"lyrics": lyrics}).status_code == 200
+        after = metrics_text(app_module, client)
+
+        requests = 'lyrics_requests_total{method="POST",route="/api/analyze",status="200"}'
+        assert metric_value(after, requests) - metric_value(before, requests) == 2
+        hits = "lyrics_result_cache_hits_total"
+        assert metric_value(after, hits) - metric_value(before, hits) >= 1
+        assert 'lyrics_stage_duration_seconds_count{stage="features"}' in after
+
+    def test_secure_metrics_require_api_key(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        assert client.get("/metrics").status_code == 401
+
+    def test_secure_rejections_and_rate_limits_are_counted(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        before = metrics_text(main_secure, client)
+        rejected_status = client.post("/api/analyze", json={"lyrics": "click javascript:alert(1) now"}).status_code
+        assert rejected_status in (400, 422)
+        for _ in range(21):
+            response = client.post("/api/analyze/simple", json={"lyrics": LYRICS})
+        assert response.status_code == 429
+        after = metrics_text(main_secure, client)
+
+        rate_limited = 'lyrics_events_total{event="rate_limited"}'
+        assert metric_value(after, rate_limited) > metric_value(before, rate_limited)
+        # Validators may reject the lyrics before the integrity check runs
+        if rejected_status == 400:
+            rejected = 'lyrics_events_total{event="rejected"}'
+            assert metric_value(after, rejected) > metric_value(before, rejected)
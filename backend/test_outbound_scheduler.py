@@ -0,0 +1,233 @@
+"""
+Tests for the outbound scheduler: per-host rates, priorities, backoff and Retry-After
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import main
+import music_agent
+from async_music_agent import AsyncMusicResearchAgent
+from fastapi.testclient import TestClient
+from outbound_scheduler import (
+    PRIORITY_BULK, PRIORITY_INTERACTIVE, OutboundScheduler, parse_rate_limits, retry_after_seconds,
+)
+
+MUSICBRAINZ = {"recordings": [{"id": "mb-1", "title": "Midnight City", "artist-credit": [{"name": "M83"}]}]}
+
+@pytest.fixture(autouse=True)
+def no_research_cache(monkeypatch):
+    monkeypatch.setattr(music_agent, "shared_research_cache", lambda: None)
+
+class TestConfig:
+    """Rate limit specs, Retry-After headers and backoff bounds"""
+
+    def test_parse_rate_limits(self):
+        assert parse_rate_limits("musicbrainz.org=1, wikipedia.org=20:40,,slow.test=0.5") == {
+            "musicbrainz.org": (1.0, 1.0), "wikipedia.org": (20.0, 40.0), "slow.test": (0.5, 1.0),
+        }
+
+    def test_hosts_match_their_domain(self):
+        scheduler = OutboundScheduler("musicbrainz.org=1,wikipedia.org=20:40", default_rate=5)
+        assert scheduler.host("musicbrainz.org").rate == 1
+        assert scheduler.host("en.wikipedia.org").burst == 40
+        assert scheduler.host("127.0.0.1:8080").rate == 5
+        assert scheduler.host("notwikipedia.org").rate == 5
+        assert scheduler.host("MusicBrainz.org") is scheduler.host("musicbrainz.org")
+
+    def test_retry_after(self):
+        assert retry_after_seconds("3") == 3
+        assert retry_after_seconds(None) is None
+        assert retry_after_seconds("soon") is None
+        now = time.time()
+        assert retry_after_seconds(formatdate(now + 30, usegmt=True), now) == pytest.approx(30, abs=1)
+        assert retry_after_seconds(formatdate(now - 30, usegmt=True), now) == 0
+
+    def test_backoff_is_jittered_and_capped(self):
+        random.seed(7)
+        scheduler = OutboundScheduler(backoff_base=0.5, backoff_max=4)
+        delays = [[scheduler.backoff(attempt) for _ in range(200)] for attempt in range(6)]
+        for attempt, samples in enumerate(delays):
+            assert 0 <= min(samples) and max(samples) <= min(4, 0.5 * 2 ** attempt)
+        assert len(set(delays[2])) == 200
+        assert max(delays[5]) > 2
+
+    def test_retry_delay(self):
+        scheduler = OutboundScheduler(max_retries=2, backoff_base=0.1)
+        assert scheduler.retry_delay("api.test", 200, 0) is None
+        assert scheduler.retry_delay("api.test", 404, 0) is None
+        assert 0 <= scheduler.retry_delay("api.test", 502, 0) <= 0.1
+        assert scheduler.retry_delay("api.test", None, 1) <= 0.2
+        assert scheduler.retry_delay("api.test", 502, 2) is None
+        # Throttling pauses the host instead of the caller
+        assert scheduler.retry_delay("api.test", 429, 0, "5") == 0
+        assert scheduler.host("api.test").paused_until - time.monotonic() == pytest.approx(5, abs=0.1)
+        assert scheduler.stats()["retries"] == 3 and scheduler.stats()["throttled"] == 1
+
+class TestScheduling:
+    """Token buckets and the priority queue"""
+
+    def test_rate_per_host(self):
+        scheduler = OutboundScheduler("slow.test=20:1,fast.test=1000")
+
+        async def run():
+            started = time.perf_counter()
+            await asyncio.gather(*(scheduler.acquire("slow.test") for _ in range(6)))
+            slow = time.perf_counter() - started
+            started = time.perf_counter()
+            await asyncio.gather(*(scheduler.acquire("fast.test") for _ in range(50)))
+            return slow, time.perf_counter() - started
+        slow, fast = asyncio.run(run())
+        # One token at once, then one every 50 ms
+        assert 0.24 < slow < 0.5
+        assert fast < 0.05
+
+    def test_interactive_overtakes_bulk(self):
+        scheduler = OutboundScheduler("api.test=50:1")
+        granted = []
+
+        async def request(name, priority):
+            await scheduler.acquire("api.test", priority)
+            granted.append(name)
+
+        async def run():
+            await scheduler.acquire("api.test")
+            bulk = [asyncio.ensure_future(request(f"bulk{n}", PRIORITY_BULK)) for n in range(3)]
+            await asyncio.sleep(0)
+            await request("interactive", PRIORITY_INTERACTIVE)
+            await asyncio.gather(*bulk)
+        asyncio.run(run())
+        assert granted == ["interactive", "bulk0", "bulk1", "bulk2"]
+
+    def test_cancelled_waiters_are_skipped(self):
+        scheduler = OutboundScheduler("api.test=20:1")
+
+        async def run():
+            await scheduler.acquire("api.test")
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.acquire("api.test"), 0.01)
+            started = time.perf_counter()
+            await scheduler.acquire("api.test")
+            return time.perf_counter() - started
+        assert asyncio.run(run()) < 0.1
+        assert scheduler.stats()["queued"] == 0
+
+    def test_pause_holds_the_host(self):
+        scheduler = OutboundScheduler("api.test=1000")
+        scheduler.host("api.test").pause(time.monotonic() + 0.2)
+
+        async def run():
+            waited = await scheduler.acquire("api.test")
+            await scheduler.acquire("other.test")
+            return waited
+        assert 0.18 < asyncio.run(run()) < 0.4
+
+    def test_blocking_acquire_shares_the_bucket(self):
+        scheduler = OutboundScheduler("api.test=20:1")
+        started = time.perf_counter()
+        for _ in range(4):
+            scheduler.acquire_blocking("api.test")
+        assert 0.14 < time.perf_counter() - started < 0.4
+
+    def test_queue_wait_metrics(self):
+        scheduler = OutboundScheduler("api.test=20:1")
+
+        async def run():
+            await asyncio.gather(*(scheduler.acquire("api.test") for _ in range(3)))
+        asyncio.run(run())
+        lines = scheduler.queue_wait.render()
+        assert 'lyrics_outbound_queue_wait_seconds_count{host="api.test"} 3' in lines
+        assert scheduler.stats() == {"requests": 3, "retries": 0, "throttled": 0, "queued": 0}
+
+class StubMusicBrainz:
+    """MusicBrainz stand-in answering with the queued statuses, then 200"""
+
+    def __init__(self, statuses=(), headers=None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append(time.perf_counter())
+        if self.statuses:
+            return web.json_response({"error": "stub"}, status=self.statuses.pop(0), headers=self.headers)
+        return web.json_response(MUSICBRAINZ)
+
+    @asynccontextmanager
+    async def agent(self, scheduler):
+        """An agent whose MusicBrainz requests go to this stub through ``scheduler``"""
+        app = web.Application()
+        app.router.add_get("/ws/2/recording", self.handle)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            endpoints = {"musicbrainz": str(server.make_url("/ws/2/recording"))}
+            async with AsyncMusicResearchAgent(endpoints=endpoints, scheduler=scheduler) as agent:
+                yield agent
+        finally:
+            await server.close()
+
+    async def search(self, scheduler):
+        async with self.agent(scheduler) as agent:
+            return await agent.search_musicbrainz("Midnight City", "M83")
+
+class TestAgentRequests:
+    """The research agents retry through the scheduler instead of losing data"""
+
+    def test_retry_after_is_honoured(self):
+        stub = StubMusicBrainz([503], {"Retry-After": "1"})
+        scheduler = OutboundScheduler(default_rate=1000)
+        result = asyncio.run(stub.search(scheduler))
+        assert result["musicbrainz_id"] == "mb-1"
+        assert stub.requests[1] - stub.requests[0] >= 0.95
+        assert scheduler.stats()["throttled"] == 1
+        lines = scheduler.responses.render()
+        assert any('status="503"' in line and line.endswith(" 1") for line in lines)
+
+    def test_server_errors_back_off_then_succeed(self):
+        stub = StubMusicBrainz([500, 502])
+        scheduler = OutboundScheduler(default_rate=1000, backoff_base=0.01)
+        assert "error" not in asyncio.run(stub.search(scheduler))
+        assert len(stub.requests) == 3 and scheduler.stats()["retries"] == 2
+
+    def test_exhausted_retries_are_errors_not_empty_results(self):
+        scheduler = OutboundScheduler(default_rate=1000, max_retries=1, backoff_base=0.01)
+        result = asyncio.run(StubMusicBrainz([503, 503], {"Retry-After": "0"}).search(scheduler))
+        assert result == {"source": "musicbrainz", "error": "HTTP 503"}
+        result = asyncio.run(StubMusicBrainz([404]).search(scheduler))
+        assert result == {"source": "musicbrainz", "error": "No results found"}
+
+    def test_bulk_research_keeps_to_the_rate(self):
+        stub = StubMusicBrainz()
+        scheduler = OutboundScheduler("127.0.0.1=20:1")
+
+        async def no_data(title, artist=""):
+            return {"source": "wikipedia", "error": "No relevant Wikipedia page found"}
+
+        async def run():
+            async with stub.agent(scheduler) as agent:
+                agent.search_wikipedia = agent.search_songbpm = no_data
+                songs = [(f"Song {n}", "Artist") for n in range(10)]
+                return [item async for item in agent.research_many(songs, use_gpt_fallback=False)]
+        items = asyncio.run(run())
+        assert all(item.profile.sources == ["musicbrainz"] for item in items)
+        gaps = [later - earlier for earlier, later in zip(stub.requests, stub.requests[1:])]
+        assert min(gaps) > 0.04
+        assert sum(series[-1] for series in scheduler.queue_wait.values.values()) > 0.3
+
+class TestMetricsEndpoint:
+    def test_outbound_metrics_are_exported(self):
+        body = TestClient(main.app, base_url="http://localhost").get("/metrics").text
+        assert "lyrics_outbound_requests_total" in body
+        assert "lyrics_outbound_queued" in body
+        assert "# TYPE lyrics_outbound_queue_wait_seconds histogram" in body
@@ -0,0 +1,129 @@
+"""
+Tests for the shared token-bucket rate-limit store
+"""
+
+import multiprocessing
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import main_secure
+from main_secure import create_access_token, rate_limit_key
+from rate_limit_store import SQLiteStorage, TokenBucketRateLimiter, sqlite_path
+
+WORKERS = 8
+WORKER_ATTEMPTS = 40
+
+def hammer(uri, limit, attempts):
+    """Worker process: hit one shared limit ``attempts`` times, count grants"""
+    limiter = TokenBucketRateLimiter(SQLiteStorage(uri))
+    item = parse(limit)
+    return sum(limiter.hit(item, "client", "/shared") for _ in range(attempts))
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(f"sqlite:///{tmp_path / 'limits.db'}")
+
+class TestBuckets:
+    """Token accounting in the SQLite store"""
+
+    def test_sqlite_uri(self, tmp_path):
+        assert sqlite_path("sqlite:///./limits.db") == "./limits.db"
+        assert sqlite_path("sqlite:////tmp/limits.db") == "/tmp/limits.db"
+        assert isinstance(storage_from_string(f"sqlite:///{tmp_path / 'x.db'}"), SQLiteStorage)
+
+    def test_refill_and_denials_are_free(self, storage):
+        grants = [storage.acquire_bucket("k", 3, 1.0, now=100.0)[0] for _ in range(5)]
+        assert grants == [True, True, True, False, False]
+        # Denied requests took nothing, so one second buys exactly one token
+        assert storage.acquire_bucket("k", 3, 1.0, now=101.0) == (True, 0.0)
+        assert storage.acquire_bucket("k", 3, 1.0, now=101.5)[0] is False
+        assert storage.bucket_tokens("k", 3, 1.0, now=150.0) == 3
+
+    def test_cost_larger_than_capacity(self, storage):
+        assert storage.acquire_bucket("big", 2, 1.0, cost=5, now=0.0) == (False, 2)
+
+    def test_counters_for_standard_strategies(self, storage):
+        limiter = FixedWindowRateLimiter(storage)
+        item = parse("2/minute")
+        assert [limiter.hit(item, "a") for _ in range(3)] == [True, True, False]
+        assert limiter.get_window_stats(item, "a").remaining == 0
+        assert limiter.hit(item, "b")
+
+class TestLimiter:
+    """TokenBucketRateLimiter as slowapi uses it"""
+
+    def test_limit_is_exact_across_processes(self, tmp_path):
+        uri = f"sqlite:///{tmp_path / 'shared.db'}"
+        SQLiteStorage(uri).check()  # create the schema before the workers race
+        with multiprocessing.get_context("spawn").Pool(WORKERS) as pool:
+            granted = pool.starmap(hammer, [(uri, "50/hour", WORKER_ATTEMPTS)] * WORKERS)
+        # 320 attempts against 50 tokens; a per-process limit would grant 8 x 40
+        assert sum(granted) == 50
+
+    def test_empty_bucket_is_rejected_locally(self, storage, monkeypatch):
+        limiter = TokenBucketRateLimiter(storage)
+        item = parse("2/hour")
+        assert limiter.hit(item, "c") and limiter.hit(item, "c")
+        assert not limiter.hit(item, "c")
+
+        def unexpected(*args, **kwargs):
+            raise AssertionError("an empty bucket should not reach storage")
+        monkeypatch.setattr(storage, "acquire_bucket", unexpected)
+        assert not limiter.hit(item, "c")
+        stats = limiter.get_window_stats(item, "c")
+        assert stats.remaining == 0
+
+    def test_reset_clears_local_state(self, storage):
+        limiter = TokenBucketRateLimiter(storage)
+        item = parse("1/hour")
+        assert limiter.hit(item, "d") and not limiter.hit(item, "d")
+        storage.reset()
+        assert limiter.hit(item, "d")
+
+    def test_requires_bucket_storage(self):
+        with pytest.raises(TypeError, match="sqlite"):
+            TokenBucketRateLimiter(storage_from_string("memory://"))
+
+class TestKeys:
+    """With RATE_LIMIT_KEY=user, limits follow the authenticated user rather than the address"""
+
+    @pytest.fixture(autouse=True)
+    def per_user_keys(self, monkeypatch):
+        monkeypatch.setattr(main_secure, "RATE_LIMIT_KEY", "user")
+
+    def request(self, headers):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        return client.get("/", headers=headers)
+
+    def test_rate_limit_key(self, monkeypatch):
+        class FakeRequest:
+            def __init__(self, headers):
+                self.headers = headers
+                self.client = type("Client", (), {"host": "10.0.0.1"})()
+        token = create_access_token({"sub": "alice"})
+        assert rate_limit_key(FakeRequest({"Authorization": f"Bearer {token}"})) == "user:alice"
+        assert rate_limit_key(FakeRequest({"Authorization": "Bearer forged"})) == "10.0.0.1"
+        key_identity = main_secure.api_keys.identity(main_secure.API_KEY)
+        assert rate_limit_key(FakeRequest({main_secure.API_KEY_HEADER: main_secure.API_KEY})) == f"api-key:{key_identity}"
+        assert rate_limit_key(FakeRequest({})) == "10.0.0.1"
+        # Every /token caller shares the demo subject, so it does not get a bucket of its own
+        demo = create_access_token({"sub": main_secure.DEMO_SUBJECT})
+        assert rate_limit_key(FakeRequest({"Authorization": f"Bearer {demo}"})) == "10.0.0.1"
+        monkeypatch.setattr(main_secure, "RATE_LIMIT_KEY", "ip")
+        assert rate_limit_key(FakeRequest({"Authorization": f"Bearer {token}"})) == "10.0.0.1"
+
+    def test_users_behind_one_address_have_their_own_limits(self):
+        alice = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+        bob = {"Authorization": f"Bearer {create_access_token({'sub': 'bob'})}"}
+        # "/" allows 10 requests a minute
+        statuses = [self.request(alice).status_code for _ in range(11)]
+        assert statuses == [200] * 10 + [429]
+        assert self.request(bob).status_code == 200
+        assert self.request({}).status_code == 200
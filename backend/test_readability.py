@@ -0,0 +1,112 @@
+"""
+Tests for the in-house readability formulas, validated against textstat
+"""
+
+import dataclasses
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import main
+from benchmark import synthetic_lyrics
+from lyric_document import LyricDocument
+from readability import (
+    ReadabilityCounts, SentenceRuns, automated_readability_index, coleman_liau_index,
+    document_counts, flesch_kincaid_grade, flesch_reading_ease, readability_scores,
+    sentence_runs, smog_index, total_counts,
+)
+
+textstat = pytest.importorskip("textstat")
+
+PIECES = (
+    "love night fire desire beautiful everything tonight miracle the a we run don't "
+    "well-known Hallelujah unbelievable naïve café — ... ! ? . oh yeah! why? end. now...wait "
+    "so!what 'til you're"
+).split()
+FORMULAS = [
+    (flesch_reading_ease, textstat.flesch_reading_ease),
+    (flesch_kincaid_grade, textstat.flesch_kincaid_grade),
+    (smog_index, textstat.smog_index),
+    (coleman_liau_index, textstat.coleman_liau_index),
+    (automated_readability_index, textstat.automated_readability_index),
+]
+
+def random_text(rng):
+    return "\n".join(" ".join(rng.choice(PIECES) for _ in range(rng.randint(1, 9)))
+                     for _ in range(rng.randint(1, 14)))
+
+def texts():
+    rng = random.Random(18)
+    return [random_text(rng) for _ in range(300)]
+
+def counts_of(text):
+    return document_counts(LyricDocument(text, main.count_syllables))
+
+@pytest.fixture(autouse=True, scope="module")
+def unrounded_textstat():
+    # textstat has no getter for its (process-wide) rounding
+    previous = getattr(textstat.textstat, "_textstatistics__round_points", None)
+    textstat.set_rounding_points(None)
+    yield
+    textstat.set_rounding_points(previous)
+
+class TestCounts:
+    """Words, sentences and characters are counted exactly as textstat counts them"""
+
+    def test_counts_match_textstat(self):
+        for text in texts():
+            counts = counts_of(text)
+            assert counts.words == textstat.lexicon_count(text), text
+            assert counts.sentences == textstat.sentence_count(text), text
+            assert counts.letters == textstat.letter_count(text), text
+            assert counts.characters == textstat.char_count(text), text
+
+    def test_formulas_match_textstat_given_its_syllables(self):
+        # Only the syllable engine differs; with textstat's syllable counts the
+        # formulas agree to rounding error
+        for text in texts():
+            counts = dataclasses.replace(
+                counts_of(text),
+                syllables=textstat.syllable_count(text),
+                polysyllables=textstat.polysyllabcount(text),
+            )
+            for ours, theirs in FORMULAS:
+                assert ours(counts) == pytest.approx(theirs(text), abs=1e-9), (ours.__name__, text)
+
+    def test_scores_within_tolerance(self):
+        # The syllable engine and textstat disagree on a few words ("fire" is
+        # one syllable or two), never by more than ~0.15 syllables per word
+        for size in (100, 1000, 10000):
+            for seed in range(3):
+                text = synthetic_lyrics(size, seed)
+                counts = counts_of(text)
+                assert flesch_reading_ease(counts) == pytest.approx(textstat.flesch_reading_ease(text), abs=13)
+                assert flesch_kincaid_grade(counts) == pytest.approx(textstat.flesch_kincaid_grade(text), abs=1.8)
+                assert smog_index(counts) == pytest.approx(textstat.smog_index(text), abs=3)
+
+    def test_empty(self):
+        counts = ReadabilityCounts()
+        assert counts.sentences == 0
+        assert set(readability_scores(counts).values()) == {0.0}
+
+class TestComposition:
+    """Per-line counts combine into the counts of the whole text"""
+
+    def test_sentence_runs_are_associative(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            parts = [sentence_runs(random_text(rng).split()) for _ in range(3)]
+            assert (parts[0] + parts[1]) + parts[2] == parts[0] + (parts[1] + parts[2])
+
+    def test_lines_add_up_to_document(self):
+        for text in texts():
+            lines = [line for line in text.split("\n") if line.strip()]
+            assert total_counts(map(counts_of, lines)) == counts_of(text), text
+
+    def test_sentence_spanning_lines(self):
+        runs = sentence_runs("we run and".split()) + sentence_runs("fall. oh yeah!".split())
+        assert runs == SentenceRuns(opening=4, sentences=0, trailing=0, closed=True)
+        assert runs.count == 1
@@ -0,0 +1,223 @@
+"""
+Tests for the persistent music research cache
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import asdict
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import async_music_agent
+from async_music_agent import AsyncMusicResearchAgent
+from music_agent import MusicResearchAgent
+from outbound_scheduler import PRIORITY_BULK
+from research_cache import ResearchCache, main, read_songs, song_key, warm
+
+FOUND = {
+    "wikipedia": {"source": "wikipedia", "title": "Blinding Lights", "genre": "synth-pop",
+                  "url": "https://en.wikipedia.org/wiki/Blinding_Lights", "summary": "A song."},
+    "songbpm": {"source": "songbpm", "bpm": 171, "key": "F Minor"},
+    "musicbrainz": {"source": "musicbrainz", "error": "No results found"},
+}
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResearchCache(str(tmp_path / "research.db"))
+
+def fake_sources(agent, results=FOUND, delay=0.0):
+    """Replace the agent's searches with canned results; returns the call log"""
+    calls = []
+
+    def make(source):
+        def search(title, artist=""):
+            calls.append(source)
+            time.sleep(delay)
+            return dict(results[source])
+
+        async def search_async(title, artist=""):
+            calls.append(source)
+            await asyncio.sleep(delay)
+            return dict(results[source])
+        return search_async if isinstance(agent, AsyncMusicResearchAgent) else search
+    for source in results:
+        setattr(agent, f"search_{source}", make(source))
+    return calls
+
+class TestEntries:
+    """Keys, TTLs and expiry"""
+
+    def test_song_key(self):
+        assert song_key("Blinding Lights!", "The  Weeknd") == song_key(" blinding lights", "the weeknd")
+        assert song_key("Café", "") == song_key("CAFÉ") == "café|"
+        assert song_key("A", "B") != song_key("A B")
+
+    def test_ttls(self, cache):
+        assert cache.result_ttl(FOUND["songbpm"]) == cache.source_ttls["songbpm"]
+        assert cache.result_ttl(FOUND["musicbrainz"]) == cache.negative_ttl
+        assert cache.result_ttl({"source": "songbpm", "error": "Timed out after 6s"}) == cache.error_ttl
+        assert cache.result_ttl({"source": "songbpm", "error": "API key not provided"}) == 0
+        assert cache.result_ttl({"source": "songbpm", "error": "Deadline exceeded"}) == 0
+
+    def test_expiry_and_negative_entries(self, cache):
+        cache.negative_ttl = 0.05
+        cache.put_result("Blinding Lights", "The Weeknd", FOUND["songbpm"])
+        cache.put_result("Blinding Lights", "The Weeknd", FOUND["musicbrainz"])
+        cache.put_result("Blinding Lights", "The Weeknd", {"source": "wikipedia", "error": "Deadline exceeded"})
+        assert cache.get_result("songbpm", "blinding lights", "the weeknd") == FOUND["songbpm"]
+        assert cache.get_result("musicbrainz", "Blinding Lights", "The Weeknd") == FOUND["musicbrainz"]
+        assert cache.get_result("wikipedia", "Blinding Lights", "The Weeknd") is None
+        assert cache.stats()["negativeHits"] == 1
+        time.sleep(0.06)
+        assert cache.get_result("musicbrainz", "Blinding Lights", "The Weeknd") is None
+        assert cache.purge_expired() == 1
+        assert cache.stats()["entries"] == 1
+
+    def test_profile_lives_as_long_as_its_results(self, cache):
+        profile = {"title": "Blinding Lights", "artist": "The Weeknd"}
+        cache.put_profile("Blinding Lights", "The Weeknd", False, profile,
+                          [FOUND["songbpm"], {"source": "songbpm", "error": "API key not provided"}])
+        cache.put_profile("Save Your Tears", "The Weeknd", False, profile,
+                          [FOUND["songbpm"], {"source": "wikipedia", "error": "Deadline exceeded"}])
+        entries = {(r["song"], r["kind"]): r["expires"] - r["stored"] for r in cache.export()}
+        assert entries[(song_key("Blinding Lights", "The Weeknd"), "profile")] == pytest.approx(cache.profile_ttl)
+        assert entries[(song_key("Save Your Tears", "The Weeknd"), "profile")] == pytest.approx(cache.error_ttl)
+        assert cache.get_profile("Blinding Lights", "The Weeknd", use_gpt=True) is None
+
+    def test_shared_across_connections(self, cache):
+        cache.put_result("Blinding Lights", "The Weeknd", FOUND["songbpm"])
+        assert ResearchCache(cache.path).get_result("songbpm", "Blinding Lights", "The Weeknd") == FOUND["songbpm"]
+
+class TestAgents:
+    """Repeat research is served from the cache"""
+
+    def test_sync_repeat_lookup(self, cache):
+        agent = MusicResearchAgent(cache=cache)
+        calls = fake_sources(agent, delay=0.05)
+        first = agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+        started = time.perf_counter()
+        again = MusicResearchAgent(cache=cache).research_song("blinding lights", "the weeknd", use_gpt_fallback=False)
+        assert time.perf_counter() - started < 0.05
+        assert calls == ["wikipedia", "songbpm", "musicbrainz"]
+        assert asdict(again) == asdict(first)
+        assert first.bpm == 171 and first.sources == ["wikipedia", "songbpm"]
+
+    def test_results_reused_when_profile_is_missing(self, cache):
+        agent = MusicResearchAgent(cache=cache)
+        calls = fake_sources(agent)
+        agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+        cache.clear()
+        cache.put_result("Blinding Lights", "The Weeknd", {**FOUND["songbpm"], "bpm": 172})
+        profile = agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+        assert profile.bpm == 172
+        assert calls == ["wikipedia", "songbpm", "musicbrainz", "wikipedia", "musicbrainz"]
+
+    def test_async_repeat_lookup(self, cache):
+        async def run():
+            async with AsyncMusicResearchAgent(cache=cache) as agent:
+                calls = fake_sources(agent, delay=0.05)
+                first = await agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+                started = time.perf_counter()
+                again = await agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+                return first, again, time.perf_counter() - started, calls
+        first, again, elapsed, calls = asyncio.run(run())
+        assert elapsed < 0.05
+        assert len(calls) == 3
+        assert asdict(again) == asdict(first)
+
+    def test_deadline_results_are_not_cached(self, cache):
+        async def run():
+            async with AsyncMusicResearchAgent(cache=cache, deadline=0.2) as agent:
+                fake_sources(agent)
+                fake_sources(agent, {"wikipedia": FOUND["wikipedia"]}, delay=2)
+                return await agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+        assert asyncio.run(run()).bpm == 171
+        assert cache.get_result("wikipedia", "Blinding Lights", "The Weeknd") is None
+        assert cache.get_result("songbpm", "Blinding Lights", "The Weeknd") == FOUND["songbpm"]
+
+    def test_gpt_result_is_cached(self, cache, monkeypatch):
+        monkeypatch.setattr(async_music_agent, "GPT_AVAILABLE", True)
+        gpt_calls = []
+
+        def fake_gpt(search_results, title, artist=""):
+            gpt_calls.append(title)
+            return {"source": "gpt", "album": "After Hours"}
+
+        async def run():
+            async with AsyncMusicResearchAgent(cache=cache) as agent:
+                fake_sources(agent)
+                agent.gpt_extract_metadata = fake_gpt
+                await agent.research_song("Blinding Lights", "The Weeknd")
+                cache.clear()
+                cache.put_result("Blinding Lights", "The Weeknd", {"source": "gpt", "album": "Single"})
+                return await agent.research_song("Blinding Lights", "The Weeknd")
+        assert asyncio.run(run()).additional_metadata["album"] == "Single"
+        assert gpt_calls == ["Blinding Lights"]
+
+class TestCommands:
+    """Bulk warm, export and load"""
+
+    def test_export_and_load(self, cache, tmp_path, capsys):
+        agent = MusicResearchAgent(cache=cache)
+        fake_sources(agent)
+        agent.research_song("Blinding Lights", "The Weeknd", use_gpt_fallback=False)
+        export_path = tmp_path / "export.jsonl"
+        assert main(["--path", cache.path, "export", str(export_path)]) == 0
+        records = [json.loads(line) for line in export_path.read_text().splitlines()]
+        assert {r["kind"] for r in records} == {"wikipedia", "songbpm", "musicbrainz", "profile"}
+
+        copy = tmp_path / "copy.db"
+        assert main(["--path", str(copy), "load", str(export_path)]) == 0
+        assert list(ResearchCache(str(copy)).export()) == list(cache.export())
+        capsys.readouterr()
+        assert main(["--path", str(copy), "stats"]) == 0
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["entries"] == 4 and stats["negativeEntries"] == 1
+
+    def test_load_keeps_newer_entries(self, cache):
+        cache.put_result("Blinding Lights", "The Weeknd", FOUND["songbpm"])
+        old = [dict(r, payload={**r["payload"], "bpm": 1}, stored=r["stored"] - 10) for r in cache.export()]
+        assert cache.load(old) == 1
+        assert cache.get_result("songbpm", "Blinding Lights", "The Weeknd")["bpm"] == 171
+
+    def test_failed_load_rolls_back(self, cache):
+        cache.put_result("Blinding Lights", "The Weeknd", FOUND["songbpm"])
+        records = list(cache.export())
+        bad = [dict(records[0], song="another song"), dict(records[0], song=None)]
+        with pytest.raises(sqlite3.IntegrityError):
+            cache.load(bad)
+        assert [r["song"] for r in cache.export()] == [records[0]["song"]]
+        # The connection is usable again
+        assert cache.load([dict(records[0], song="another song")]) == 1
+
+    def test_warm(self, cache, monkeypatch, capsys):
+        researched = []
+        research = AsyncMusicResearchAgent._research
+
+        async def fake_research(self, title, artist, use_gpt_fallback, deadline=None):
+            researched.append((title, async_music_agent._request_priority.get()))
+            await asyncio.sleep(0.1)
+            if title == "Levitating":
+                raise RuntimeError("boom")
+            self.cache.put_profile(title, artist, False, {"title": title, "artist": artist})
+            return await research(self, title, artist, use_gpt_fallback, deadline)
+        monkeypatch.setattr(AsyncMusicResearchAgent, "_research", fake_research)
+        monkeypatch.setattr(async_music_agent, "GPT_AVAILABLE", False)
+        songs = read_songs(["# title<TAB>artist", "Blinding Lights\tThe Weeknd", "", "Midnight City\tM83",
+                            "blinding lights!\tthe weeknd", "Levitating\tDua Lipa"])
+        assert len(songs) == 4
+        started = time.perf_counter()
+        assert asyncio.run(warm(cache, songs)) == 2
+        # Researched side by side, not one after another
+        assert time.perf_counter() - started < 0.25
+        assert sorted(researched) == [(title, PRIORITY_BULK) for title in
+                                      ("Blinding Lights", "Levitating", "Midnight City")]
+        assert "Levitating" in capsys.readouterr().err
+        # Only the failed song is tried again
+        assert asyncio.run(warm(cache, songs)) == 0
+        assert researched[3:] == [("Levitating", PRIORITY_BULK)]
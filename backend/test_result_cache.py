@@ -0,0 +1,128 @@
+"""
+Tests for the content-addressed result cache and ETag handling
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main_secure
+from main_secure import app, advanced_analysis, CACHE_NAMESPACE
+from result_cache import ResultCache, content_key, etag_for, etag_matches, normalize_lyrics
+
+client = TestClient(app, base_url="http://localhost")
+
+VALID_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right
+The bugs keep coming but I stay strong
+I'll keep debugging through the morning light
+"""
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    main_secure.limiter.reset()
+    main_secure.result_cache.clear()
+    yield
+
+class TestNormalization:
+    """Test that normalization never changes the analysis"""
+    
+    def test_whitespace_variants_share_a_key(self):
+        variant = "\n\n  " + VALID_LYRICS.replace(" ", "   ").replace("\n", " \r\n\t") + "\n\n"
+        assert content_key(VALID_LYRICS, "v1") == content_key(variant, "v1")
+        strip = lambda a: {k: v for k, v in a.items() if k not in ("metadata", "security")}
+        assert strip(advanced_analysis(VALID_LYRICS)) == strip(advanced_analysis(variant))
+    
+    def test_version_changes_key(self):
+        assert content_key(VALID_LYRICS, "v1") != content_key(VALID_LYRICS, "v2")
+    
+    def test_normalize_lyrics(self):
+        assert normalize_lyrics("  a   b \n\n c\t\n") == "a b\n\nc"
+        assert normalize_lyrics("\n a\n \n\t\n\nb\n\n") == "a\n\nb"
+    
+    def test_stanza_breaks_change_key(self):
+        one_stanza = "night\nlight\nday\naway"
+        two_stanzas = "night\nlight\n\nday\naway"
+        assert content_key(one_stanza, "v1") != content_key(two_stanzas, "v1")
+        assert content_key(two_stanzas, "v1") == content_key("night\nlight\n \n\n\nday\naway", "v1")
+        schemes = lambda lyrics: advanced_analysis(lyrics)["flow"]["rhymeSchemes"]
+        assert schemes(one_stanza) != schemes(two_stanzas)
+
+class TestResultCache:
+    """Test LRU, TTL and memory budget behaviour"""
+    
+    def test_hit_and_miss_counters(self):
+        cache = ResultCache()
+        assert cache.get("k") is None
+        cache.put("k", {"a": 1})
+        assert cache.get("k") == {"a": 1}
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_memory_budget_evicts_least_recent(self):
+        cache = ResultCache(max_bytes=40)
+        cache.put("a", {"v": "x" * 10})
+        cache.put("b", {"v": "y" * 10})
+        cache.get("a")
+        cache.put("c", {"v": "z" * 10})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.bytes <= 40
+        assert cache.stats()["evictions"] == 1
+    
+    def test_ttl_expiry(self):
+        cache = ResultCache(ttl=0.01)
+        cache.put("k", {"a": 1})
+        time.sleep(0.02)
+        assert cache.get("k") is None
+        assert len(cache) == 0
+    
+    def test_etag_matching(self):
+        etag = etag_for("abc")
+        assert etag_matches('W/"abc"', etag)
+        assert etag_matches('"other", "abc"', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"abcd"', etag)
+        assert not etag_matches(None, etag)
+
+class TestConditionalRequests:
+    """Test ETag / If-None-Match on the analysis endpoints"""
+    
+    def test_etag_and_not_modified(self):
+        request_data = {"lyrics": VALID_LYRICS, "title": "Cache Test"}
+        first = client.post("/api/analyze", json=request_data)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag == etag_for(content_key(VALID_LYRICS, CACHE_NAMESPACE))
+        
+        second = client.post("/api/analyze", json=request_data, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.headers["ETag"] == etag
+        assert second.content == b""
+    
+    def test_cache_hit_refreshes_time_varying_fields(self):
+        request_data = {"lyrics": VALID_LYRICS}
+        first = client.post("/api/analyze/simple", json=request_data).json()
+        hits = main_secure.result_cache.stats()["hits"]
+        time.sleep(0.01)
+        variant = {"lyrics": VALID_LYRICS.replace("night long", "night   long")}
+        second = client.post("/api/analyze/simple", json=variant).json()
+        
+        assert main_secure.result_cache.stats()["hits"] == hits + 1
+        assert second["dashboard"] == first["dashboard"]
+        assert second["metadata"]["analysisDate"] > first["metadata"]["analysisDate"]
+        assert second["security"]["timestamp"] > first["security"]["timestamp"]
+        # The hash still identifies the exact submitted lyrics
+        assert second["security"]["analysisHash"] != first["security"]["analysisHash"]
+    
+    def test_cached_entry_not_mutated_by_protected_endpoint(self):
+        token = client.post("/token").json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.post("/api/analyze/protected", json={"lyrics": VALID_LYRICS}, headers=headers)
+        data = client.post("/api/analyze/simple", json={"lyrics": VALID_LYRICS}).json()
+        assert "authenticatedUser" not in data["security"]
@@ -0,0 +1,95 @@
+"""
+Tests for phonetic rhyme keys and rhyme-scheme detection
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main
+import main_secure
+from rhyme_engine import (
+    DEFAULT_RHYME_TABLE_PATH, RhymeEngine, RhymeKeyTable, phonetic_rhyme_key, phonetic_vowels,
+    rhyme_scheme, rhyming_lines, spelling_rhyme_key, stanza_schemes, write_rhyme_table
+)
+
+class TestRhymeKeys:
+    """Test key derivation and the memory-mapped table"""
+    
+    def test_phonetic_key_from_last_stressed_vowel(self):
+        assert phonetic_rhyme_key(["T", "AH0", "N", "AY1", "T"]) == "AY T"
+        assert phonetic_rhyme_key(["D", "IY0", "B", "AH1", "G", "IH0", "NG"]) == "AH G IH NG"
+        assert phonetic_rhyme_key(["AH0"]) == "AH"
+        assert phonetic_rhyme_key(["HH", "M"]) is None
+        assert phonetic_vowels(["L", "IH1", "R", "IH0", "K", "AH0", "L"]) == "IH IH AH"
+    
+    def test_spelling_fallback(self):
+        assert spelling_rhyme_key("zorblight") == "~ight"
+        assert spelling_rhyme_key("brr") == "~brr"
+        assert spelling_rhyme_key("") is None
+    
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "rhymes.bin")
+        words = {"night": ("AY T", "AY"), "tonight": ("AY T", "AH AY"), "café": ("EY", "AE EY"), "a": ("AH", "AH")}
+        write_rhyme_table(path, words)
+        table = RhymeKeyTable(path)
+        try:
+            assert len(table) == len(words)
+            for word, (key, vowels) in words.items():
+                assert table.get(word) == key
+                assert table.vowels(word) == vowels
+            assert table.get("missing") is None
+            assert table.vowels("missing") is None
+        finally:
+            table.close()
+    
+    def test_shipped_table(self):
+        assert os.path.exists(DEFAULT_RHYME_TABLE_PATH)
+        engine = RhymeEngine()
+        assert engine.key("night") == engine.key("tonight") == engine.key("light")
+        assert engine.key("go") == engine.key("though")
+        # Spelling-based suffixes would call these rhymes
+        assert engine.key("though") != engine.key("through")
+        assert engine.key("dont") == engine.key("won't".replace("'", ""))
+        assert engine.key("") is None
+        assert engine.vowels("lyrical") == ("IH", "IH", "AH")
+        assert engine.vowels("zorblight") == ("~o", "~i")
+    
+    def test_missing_table_falls_back_to_spelling(self, tmp_path):
+        engine = RhymeEngine(str(tmp_path / "missing.bin"))
+        assert engine.key("night") == engine.key("light") == "~ight"
+        assert engine.stats()["fallbacks"] == 2
+
+class TestSchemes:
+    """Test window rhyme counting and scheme lettering"""
+    
+    def test_rhyming_lines(self):
+        assert rhyming_lines(["a", "a", "b", "b"]) == 2   # AABB
+        assert rhyming_lines(["a", "b", "a", "b"]) == 2   # ABAB
+        assert rhyming_lines(["a", "b", "c", "b"]) == 1   # ABCB
+        assert rhyming_lines(["a", "b", "b", "a"]) == 2   # ABBA
+        assert rhyming_lines(["a", "b", "c", "d", "a"]) == 0   # outside the window
+        assert rhyming_lines([None, None]) == 0
+    
+    def test_rhyme_scheme(self):
+        assert rhyme_scheme(["x", "x", "y", "y"]) == "AABB"
+        assert rhyme_scheme(["x", "y", "z", "y"]) == "ABCB"
+        assert rhyme_scheme([None, None, "x"]) == "ABC"
+        assert rhyme_scheme([str(i) for i in range(60)]).endswith("*")
+    
+    def test_stanza_schemes(self):
+        keys = ["a", "a", "b", "b", "c", "d", "c", "d"]
+        assert stanza_schemes(keys, [0, 4]) == ["AABB", "ABAB"]
+        assert stanza_schemes([], []) == []
+
+class TestAnalysisRhymes:
+    """Test rhyme output of both APIs"""
+    
+    LYRICS = "Roses in the night\nWalking through the fire\nShining very bright\nLifting me up higher\n\nI know you said though\nI walked the whole way through\n"
+    
+    def test_alternate_rhymes_are_scored(self):
+        for app_module in (main, main_secure):
+            analysis = app_module.advanced_analysis(self.LYRICS)
+            assert analysis["flow"]["rhymeSchemes"] == ["ABAB", "AB"]
+            # Lines 3 and 4 rhyme with lines 1 and 2; though/through does not count
+            assert analysis["dashboard"]["rhymeScore"] == round(2 / 5 * 100)
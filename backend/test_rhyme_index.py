@@ -0,0 +1,151 @@
+"""
+Tests for suffix-automaton based internal and multisyllabic rhyme detection
+"""
+
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import main_secure
+from rhyme_index import SuffixAutomaton, build_rhyme_index
+
+MULTIS = """I'm so lyrical, it's a miracle
+Spiritual, never hit a typical
+The fire and desire took me higher"""
+
+def substring_ends(sequence, length):
+    ends = {}
+    for end in range(length - 1, len(sequence)):
+        ends.setdefault(tuple(sequence[end - length + 1:end + 1]), set()).add(end)
+    return ends
+
+class TestSuffixAutomaton:
+    """The automaton must agree with brute-force substring counting"""
+
+    def test_occurrences_match_brute_force(self):
+        rng = random.Random(3)
+        for _ in range(30):
+            sequence = [rng.choice("abc") for _ in range(rng.randint(1, 40))]
+            automaton = SuffixAutomaton(sequence)
+            positions, first, stop = automaton.end_positions()
+            for length in range(1, len(sequence) + 1):
+                for substring, ends in substring_ends(sequence, length).items():
+                    state = 0
+                    for symbol in substring:
+                        state = automaton.next[state][symbol]
+                    assert automaton.counts[state] == len(ends)
+                    assert sorted(positions[first[state]:stop[state]]) == sorted(ends)
+
+    def test_maximal_repeats_match_brute_force(self):
+        rng = random.Random(5)
+        for _ in range(30):
+            sequence = [rng.choice("ab") for _ in range(rng.randint(2, 30))]
+            automaton = SuffixAutomaton(sequence)
+            positions, first, _ = automaton.end_positions()
+            found = set()
+            for state in automaton.maximal_repeats(1):
+                end = positions[first[state]]
+                found.add(tuple(sequence[end - automaton.length[state] + 1:end + 1]))
+
+            expected = set()
+            for length in range(1, len(sequence)):
+                for substring, ends in substring_ends(sequence, length).items():
+                    if len(ends) < 2:
+                        continue
+                    before = {sequence[end - length] if end - length >= 0 else None for end in ends}
+                    after = {sequence[end + 1] if end + 1 < len(sequence) else None for end in ends}
+                    left_maximal = len(before) > 1 or None in before
+                    right_maximal = len(after) > 1 or None in after
+                    if left_maximal and right_maximal:
+                        expected.add(substring)
+            assert found == expected
+
+    def test_state_count_is_linear(self):
+        sequence = [random.Random(1).randint(0, 15) for _ in range(5000)]
+        assert len(SuffixAutomaton(sequence)) < 2 * len(sequence)
+
+class TestRhymeChains:
+    """Chains, positions, internal rhymes and density"""
+
+    def test_multisyllabic_chain_with_positions(self):
+        index = build_rhyme_index(MULTIS)
+        chain = index.to_dict()["chains"][0]
+        assert chain["syllables"] == 5
+        assert chain["occurrences"] == [
+            {"line": 1, "column": 16, "endColumn": 30, "text": "it's a miracle"},
+            {"line": 2, "column": 17, "endColumn": 30, "text": "hit a typical"},
+        ]
+
+    def test_chains_do_not_cross_lines(self):
+        index = build_rhyme_index(MULTIS + "\n\n" + MULTIS.lower())
+        for chain in index.chains:
+            for first, last in chain.occurrences:
+                assert index.words[first].line == index.words[last].line
+
+    def test_repeated_words_are_not_rhymes(self):
+        index = build_rhyme_index("baby baby baby oh\n" * 50)
+        assert index.chains == []
+        assert index.density == 0.0
+
+    def test_distant_matches_are_ignored(self):
+        filler = "\n".join(["oh"] * 10)
+        assert build_rhyme_index(f"lyrical\n{filler}\nmiracle").chains == []
+        assert build_rhyme_index(f"lyrical\noh\nmiracle").chains != []
+
+    def test_internal_rhymes(self):
+        result = build_rhyme_index(MULTIS).to_dict()
+        assert result["internalRhymes"] == [{
+            "line": 3,
+            "words": [
+                {"column": 4, "text": "fire"},
+                {"column": 13, "text": "desire"},
+                {"column": 28, "text": "higher"},
+            ],
+        }]
+
+    def test_density(self):
+        result = build_rhyme_index(MULTIS).to_dict()
+        assert 0 < result["rhymedSyllables"] <= result["syllables"]
+        assert result["density"] == round(result["rhymedSyllables"] / result["syllables"] * 100, 1)
+        assert build_rhyme_index("").to_dict()["density"] == 0
+
+    def test_maximum_request_size_stays_fast(self):
+        rng = random.Random(2)
+        vocabulary = "love night light fire desire higher lyrical miracle spiritual money honey the a to my".split()
+        lines = [" ".join(rng.choice(vocabulary) for _ in range(8)) for _ in range(1200)]
+        text = "\n".join(lines)[:50000]
+        started = time.perf_counter()
+        index = build_rhyme_index(text)
+        assert time.perf_counter() - started < 5
+        assert index.chains
+        # A single 50 KB line of one syllable is the worst case for repeats
+        started = time.perf_counter()
+        build_rhyme_index("la " * 16000)
+        assert time.perf_counter() - started < 5
+
+class TestRhymeEndpoint:
+    """Test /api/analyze/rhymes"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_rhymes_endpoint(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        response = client.post("/api/analyze/rhymes", json={"lyrics": MULTIS})
+        assert response.status_code == 200
+        data = response.json()
+        occurrence = data["chains"][0]["occurrences"][0]
+        assert occurrence["text"] == "it's a miracle"
+        # Columns point into the lyrics as sent, apostrophes included
+        line = MULTIS.split("\n")[occurrence["line"] - 1]
+        assert line[occurrence["column"]:occurrence["endColumn"]] == "it's a miracle"
+        assert data["internalRhymes"][0]["line"] == 3
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_empty_lyrics_rejected(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        assert client.post("/api/analyze/rhymes", json={"lyrics": "   "}).status_code in (400, 422)
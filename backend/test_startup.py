@@ -0,0 +1,99 @@
+"""
+Tests for deferred imports, /warmup and the cold-start import budget
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import main_secure
+from analysis_executor import AnalysisExecutor
+from lazy_imports import LazyModule, lazy_import, module_available, warm_modules
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Seconds allowed to import an app module in a fresh interpreter; generous for
+# slow CI machines, still well under the cost of the deferred dependencies
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "3.0"))
+DEFERRED_MODULES = ("nltk", "textstat", "openai", "wikipedia")
+
+def cold_import(module_name):
+    """Import ``module_name`` in a fresh interpreter; returns (seconds, deferred modules loaded)"""
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps([elapsed, [m for m in {DEFERRED_MODULES!r} if m in sys.modules]]))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    elapsed, loaded = json.loads(output.strip().splitlines()[-1])
+    return elapsed, loaded
+
+class TestLazyImports:
+    """LazyModule and availability checks"""
+
+    def test_module_available(self):
+        assert module_available("json")
+        assert not module_available("surely_not_an_installed_module")
+
+    def test_loads_on_first_attribute_access(self):
+        module = LazyModule("colorsys")
+        assert not module.loaded
+        assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert module.loaded
+        assert module.load_seconds is not None
+
+    def test_lazy_import_is_shared(self):
+        assert lazy_import("colorsys") is lazy_import("colorsys")
+
+    def test_warm_modules(self):
+        timings = warm_modules("calendar", "surely_not_an_installed_module")
+        assert timings["calendar"] >= 0
+        assert timings["surely_not_an_installed_module"] == -1
+        assert warm_modules("calendar")["calendar"] == 0
+
+class TestImportBudget:
+    """Importing an app must not pull in the deferred dependencies"""
+
+    @pytest.mark.parametrize("module_name", ["main", "main_secure", "music_agent", "async_music_agent"])
+    def test_cold_import(self, module_name):
+        elapsed, loaded = cold_import(module_name)
+        assert loaded == []
+        assert elapsed < IMPORT_TIME_BUDGET
+
+class TestWarmup:
+    """The /warmup hook loads what the first request would otherwise pay for"""
+
+    def test_executor_warmup_starts_workers(self):
+        executor = AnalysisExecutor(mode="process", max_workers=2, max_queue=2)
+        try:
+            assert 1 <= asyncio.run(executor.warmup()) <= 2
+        finally:
+            executor.shutdown()
+        assert asyncio.run(AnalysisExecutor(mode="inline").warmup()) == 0
+
+    def test_warmup_endpoint(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        response = client.get("/warmup")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "warm"
+        assert data["workers"] >= 0
+        assert set(data) == {"status", "workers", "modules", "elapsedMs"}
+        assert set(data["modules"]) == set(main.WARMUP_MODULES)
+        assert all(lazy_import(name).loaded for name in main.WARMUP_MODULES)
+
+    def test_secure_warmup_endpoint(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        response = client.get("/warmup")
+        assert response.status_code == 200
+        assert response.json()["status"] == "warm"
@@ -0,0 +1,123 @@
+"""
+Tests for the streaming NDJSON and Server-Sent Events analysis endpoints
+"""
+
+import asyncio
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import main_secure
+from streaming import StreamFormatError, iter_records, stream_results
+
+VALID_LYRICS = """
+I've been working on this code all night long
+Trying to make the functions work just right
+The bugs keep coming but I stay strong
+I'll keep debugging through the morning light
+"""
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records) + "\n"
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+class TestRecordReader:
+    """Test splitting request bodies into records"""
+
+    def test_records_split_across_chunks(self):
+        body = b'{"a": 1}\n\n  \n{"b": 2}\n{"c": 3}'
+        for size in (1, 3, 7, len(body)):
+            records = asyncio.run(collect(iter_records(chunked(body, size))))
+            assert records == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+    def test_oversized_record_is_rejected(self):
+        body = b'{"lyrics": "' + b"x" * 100 + b'"}'
+        with pytest.raises(StreamFormatError):
+            asyncio.run(collect(iter_records(chunked(body, 16), max_record_bytes=64)))
+
+class TestStreamResults:
+    """Test the bounded processing window"""
+
+    def test_window_bounds_in_flight_records(self):
+        in_flight = 0
+        peak = 0
+
+        async def handle(index, line):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001 * (index % 3))
+            in_flight -= 1
+            return {"index": index}
+
+        body = b"".join(b"{}\n" for _ in range(50))
+        results = asyncio.run(collect(stream_results(iter_records(chunked(body, 10)), handle, window=4)))
+        assert sorted(result["index"] for result in results) == list(range(50))
+        assert peak <= 4
+
+class TestStreamEndpoints:
+    """Test /api/analyze/stream and /api/analyze/stream/events"""
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_ndjson_stream(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        body = ndjson({"lyrics": VALID_LYRICS}, {"title": "missing lyrics"}, {"lyrics": VALID_LYRICS.upper()})
+        body += "not json\n"
+        response = client.post("/api/analyze/stream", content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        records = {record["index"]: record for record in map(json.loads, response.text.splitlines())}
+        assert sorted(records) == [0, 1, 2, 3]
+        assert [records[i]["status"] for i in range(4)] == ["ok", "error", "ok", "error"]
+        analysis = records[0]["analysis"]
+        expected = app_module.advanced_analysis(VALID_LYRICS)
+        assert analysis["dashboard"] == expected["dashboard"]
+        assert set(app_module.AnalysisResponse.model_fields) <= set(analysis)
+
+    def test_secure_stream_checks_integrity(self):
+        client = TestClient(main_secure.app, base_url="http://localhost")
+        body = ndjson({"lyrics": VALID_LYRICS}, {"lyrics": "<script>alert('x')</script> javascript:void(0)"})
+        records = [json.loads(line) for line in client.post("/api/analyze/stream", content=body).text.splitlines()]
+        statuses = {record["index"]: record["status"] for record in records}
+        assert statuses == {0: "ok", 1: "error"}
+
+    def test_oversized_record_ends_stream(self):
+        client = TestClient(main.app, base_url="http://localhost")
+        body = ndjson({"lyrics": VALID_LYRICS}) + '{"lyrics": "' + "x" * (128 * 1024)
+        records = [json.loads(line) for line in client.post("/api/analyze/stream", content=body).text.splitlines()]
+        assert records[0]["status"] == "ok"
+        assert records[-1]["fatal"] is True
+
+    @pytest.mark.parametrize("app_module", [main, main_secure])
+    def test_sse_progress(self, app_module):
+        client = TestClient(app_module.app, base_url="http://localhost")
+        body = ndjson({"lyrics": VALID_LYRICS}, {"lyrics": VALID_LYRICS + "\nOne more line"}, {"lyrics": ""})
+        response = client.post("/api/analyze/stream/events", content=body)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_events(response.text)
+        assert [name for name, _ in events].count("result") == 3
+        progress = [data for name, data in events if name == "progress"]
+        assert [data["completed"] for data in progress] == [1, 2, 3]
+        assert events[-1] == ("done", {"completed": 3, "succeeded": 2, "failed": 1})
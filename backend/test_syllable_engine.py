@@ -0,0 +1,74 @@
+"""
+Tests for the memoized, table-backed syllable engine
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import syllapy
+
+from syllable_engine import (
+    DEFAULT_TABLE_PATH, SyllableEngine, SyllableTable, heuristic_syllables, write_table
+)
+
+class TestSyllableTable:
+    """Test the memory-mapped table format"""
+    
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "table.bin")
+        words = {"love": 1, "comprehend": 3, "café": 2, "a": 1, "zebra": 2}
+        write_table(path, words)
+        table = SyllableTable(path)
+        try:
+            assert len(table) == len(words)
+            for word, count in words.items():
+                assert table.get(word) == count
+            assert table.get("missing") is None
+            assert table.get("") is None
+        finally:
+            table.close()
+    
+    def test_shipped_table_agrees_with_syllapy(self):
+        table = SyllableTable(DEFAULT_TABLE_PATH)
+        try:
+            for word, count in list(syllapy.WORD_DICT.items())[:2000]:
+                if word.isalpha():
+                    assert table.get(word) == count, word
+        finally:
+            table.close()
+
+class TestSyllableEngine:
+    """Test caching and fallback order"""
+    
+    def test_counts_are_cached(self):
+        engine = SyllableEngine()
+        assert engine.count("debugging") == 3
+        assert engine.count("debugging") == 3
+        stats = engine.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["tableHits"] == 1
+    
+    def test_cache_is_bounded(self):
+        engine = SyllableEngine(cache_size=2)
+        for word in ["one", "two", "three", "four"]:
+            engine.count(word)
+        assert engine.stats()["size"] == 2
+    
+    def test_unknown_words_fall_back_to_syllapy(self):
+        engine = SyllableEngine()
+        assert engine.count("xyzzyq") == syllapy.count("xyzzyq")
+        assert engine.count("42nd") == 0
+        assert engine.count("") == 0
+        assert engine.stats()["fallbacks"] == 3
+    
+    def test_missing_table_uses_syllapy(self, tmp_path):
+        engine = SyllableEngine(table_path=str(tmp_path / "missing.bin"))
+        assert engine.table is None
+        assert engine.count("comprehend") == syllapy.count("comprehend")
+    
+    def test_heuristic(self):
+        assert heuristic_syllables("fire") == 1
+        assert heuristic_syllables("happy") == 2
+        assert heuristic_syllables("") == 1
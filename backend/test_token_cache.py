@@ -0,0 +1,156 @@
+"""
+Tests for the verified-token cache and API-key set
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from jose import JWTError
+
+import main_secure
+from main_secure import app, create_access_token, invalidate_user, revoke_token, token_subject
+from rate_limit_store import SQLiteStorage
+from token_cache import ApiKeySet, TokenRevoked, VerifiedTokenCache, credential_digest
+
+client = TestClient(app, base_url="http://localhost")
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    main_secure.limiter.reset()
+    main_secure.token_cache.clear()
+    yield
+
+def analyze(token):
+    return client.post("/api/analyze/protected", json={"lyrics": "we run all night\nwe fight"},
+                       headers={"Authorization": f"Bearer {token}"})
+
+class TestVerifiedTokenCache:
+    """Entries are bounded, expire with the token and can be dropped at once"""
+
+    def test_expires_with_token(self):
+        cache = VerifiedTokenCache(max_ttl=60)
+        cache.put("short", "alice", expires_at=time.time() + 0.05)
+        cache.put("expired", "alice", expires_at=time.time() - 1)
+        assert cache.get("short") == "alice"
+        assert cache.get("expired") is None
+        time.sleep(0.06)
+        assert cache.get("short") is None
+        assert len(cache) == 0
+
+    def test_max_ttl_caps_long_tokens(self):
+        cache = VerifiedTokenCache(max_ttl=0.05)
+        cache.put("long", "alice", expires_at=time.time() + 3600)
+        time.sleep(0.06)
+        assert cache.get("long") is None
+
+    def test_lru_bound(self):
+        cache = VerifiedTokenCache(max_entries=2)
+        cache.put("a", 1, subject="x")
+        cache.put("b", 2, subject="y")
+        cache.get("a")
+        cache.put("c", 3, subject="z")
+        assert [cache.get(token) for token in "abc"] == [1, None, 3]
+        assert cache.stats()["evictions"] == 1
+        assert cache.invalidate_subject("y") == 0
+
+    def test_invalidation_hooks(self):
+        cache = VerifiedTokenCache()
+        cache.put("t1", "alice", subject="alice")
+        cache.put("t2", "alice", subject="alice")
+        cache.put("t3", "bob", subject="bob")
+        assert cache.invalidate("t3") and not cache.invalidate("t3")
+        assert cache.invalidate_subject("alice") == 2
+        assert len(cache) == 0
+
+    def test_revoked_until_expiry(self):
+        cache = VerifiedTokenCache()
+        cache.put("t", "alice", subject="alice")
+        cache.revoke("t", expires_at=time.time() + 0.05)
+        with pytest.raises(TokenRevoked):
+            cache.get("t")
+        cache.put("t", "alice")  # a racing verification must not un-revoke it
+        with pytest.raises(TokenRevoked):
+            cache.get("t")
+        time.sleep(0.06)
+        assert cache.get("t") is None
+        assert cache.stats()["revoked"] == 0
+
+    def test_revocation_reaches_every_worker(self, tmp_path):
+        uri = f"sqlite:///{tmp_path / 'limits.db'}"
+        first = VerifiedTokenCache(revocations=SQLiteStorage(uri))
+        second = VerifiedTokenCache(revocations=SQLiteStorage(uri))
+        second.put("t", "alice", subject="alice")
+        assert second.get("t") == "alice"
+        first.revoke("t", expires_at=time.time() + 60)
+        # Cached and signature-valid in the other worker, yet rejected at once
+        with pytest.raises(TokenRevoked):
+            second.get("t")
+        assert len(second) == 0
+        second.clear()
+        assert second.get("t") is None
+
+    def test_keeps_only_digests(self):
+        cache = VerifiedTokenCache()
+        cache.put("secret-token", "alice")
+        assert list(cache._entries) == [credential_digest("secret-token")]
+
+class TestApiKeySet:
+    """API keys are checked by digest"""
+
+    def test_lookup_and_revoke(self):
+        keys = ApiKeySet(["k1", "k2", ""])
+        assert len(keys) == 2
+        assert "k1" in keys and "k2" in keys
+        assert "k3" not in keys and None not in keys and "" not in keys
+        assert keys.identity("k1") != keys.identity("k2")
+        assert "k1" not in keys.identity("k1")
+        assert keys.revoke("k1") and not keys.revoke("k1")
+        assert "k1" not in keys
+
+    def test_metrics_endpoint_uses_key_set(self, monkeypatch):
+        headers = {main_secure.API_KEY_HEADER: main_secure.API_KEY}
+        assert client.get("/metrics", headers=headers).status_code == 200
+        monkeypatch.setattr(main_secure, "api_keys", ApiKeySet(["rotated"]))
+        assert client.get("/metrics", headers=headers).status_code == 401
+        headers[main_secure.API_KEY_HEADER] = "rotated"
+        assert client.get("/metrics", headers=headers).status_code == 200
+
+class TestProtectedEndpoint:
+    """Bearer tokens are verified once, then served from the cache"""
+
+    def test_second_use_skips_verification(self, monkeypatch):
+        token = create_access_token({"sub": "alice"})
+        assert analyze(token).status_code == 200
+        assert token_subject(token) == "alice"
+        def unexpected(*args, **kwargs):
+            raise AssertionError("a cached token should not be decoded")
+        monkeypatch.setattr(main_secure.jwt, "decode", unexpected)
+        assert analyze(token).status_code == 200
+        assert main_secure.token_cache.stats()["hits"] >= 2
+
+    def test_invalid_and_expired_tokens_are_not_cached(self):
+        assert analyze("forged").status_code == 401
+        expired = create_access_token({"sub": "alice"}, timedelta(seconds=-1))
+        assert analyze(expired).status_code == 401
+        assert len(main_secure.token_cache) == 0
+        with pytest.raises(JWTError):
+            token_subject(expired)
+
+    def test_revoked_token_is_rejected(self):
+        token = create_access_token({"sub": "alice"})
+        assert analyze(token).status_code == 200
+        revoke_token(token)
+        assert analyze(token).status_code == 401
+        assert analyze(create_access_token({"sub": "alice", "n": 2})).status_code == 200
+
+    def test_invalidate_user(self):
+        token = create_access_token({"sub": "bob"})
+        assert analyze(token).status_code == 200
+        assert invalidate_user("bob") == 1
+        assert len(main_secure.token_cache) == 0
+        assert analyze(token).status_code == 200
@@ -0,0 +1,122 @@
+"""
+Tests for Wikipedia candidate ranking, infobox parsing and batched page resolution
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from wikipedia_resolver import (
+    WikipediaResolver, infobox_fields, infobox_metadata, lead_section, page_params, search_params,
+)
+
+WIKITEXT = """{{Short description|2011 single by M83}}
+{{Infobox song
+| name       = Midnight City
+| cover      = M83 - Midnight City.jpg <!-- cover art -->
+| artist     = [[M83 (band)|M83]]
+| album      = [[Hurry Up, We're Dreaming]]
+| released   = {{Start date|2011|08|16|df=y}}<ref>{{cite web|url=https://example.org|title=Release}}</ref>
+| genre      = {{hlist|[[Synth-pop]]|[[electropop]]<ref name="pf" />|[[dream pop]]}}
+| label      = {{flatlist|
+* [[Mute Records|Mute]]
+* Naïve
+}}
+}}
+'''Midnight City''' is a song by French electronic band [[M83 (band)|M83]].
+"""
+
+def song_page(title, extract, wikitext=""):
+    return {"title": title, "fullurl": "https://en.wikipedia.org/wiki/" + title.replace(" ", "_"),
+            "extract": extract, "revisions": [{"slots": {"main": {"content": wikitext}}}]}
+
+def search(*titles):
+    return {"query": {"search": [{"title": title, "snippet": snippet} for title, snippet in titles]}}
+
+class TestInfobox:
+    def test_fields(self):
+        fields = infobox_fields(WIKITEXT)
+        assert fields["artist"] == "M83"
+        assert fields["album"] == "Hurry Up, We're Dreaming"
+        assert fields["released"] == "2011, 08, 16"
+        assert fields["genre"] == "Synth-pop, electropop, dream pop"
+        assert fields["label"] == "Mute, Naïve"
+        assert fields["cover"] == "M83 - Midnight City.jpg"
+        assert infobox_fields("'''Midnight''' is the transition between days.") == {}
+
+    def test_metadata(self):
+        assert infobox_metadata(infobox_fields(WIKITEXT)) == {
+            "genre": "synth-pop", "album": "hurry up, we're dreaming", "label": "mute", "year": "2011",
+        }
+
+    def test_requests_ask_for_lead_sections_only(self):
+        params = page_params(["Midnight City (song)", "Midnight"])
+        assert params["titles"] == "Midnight City (song)|Midnight"
+        assert params["exintro"] and params["rvsection"] == 0
+        assert search_params("Midnight City song")["srprop"] == "snippet"
+        assert lead_section("Intro.\n\n== History ==\nMore.") == "Intro."
+
+class TestRanking:
+    def test_song_pages_rank_first(self):
+        resolver = WikipediaResolver("Midnight City", "M83")
+        titles = resolver.rank(search(
+            ("Midnight", "<span class=\"searchmatch\">Midnight</span> is the transition between days"),
+            ("Midnight City (disambiguation)", "may refer to"),
+            ("Hurry Up, We're Dreaming", "sixth studio album by French band <span>M83</span>"),
+            ("Midnight City (film)", "a 2009 film"),
+            ("Midnight City (song)", "&quot;Midnight City&quot; is a song by M83"),
+            ("Weather report", "rain"),
+        ))
+        assert titles == ["Midnight City (song)", "Hurry Up, We're Dreaming", "Midnight City (film)", "Midnight"]
+
+    def test_batch_size_and_tried_titles(self):
+        resolver = WikipediaResolver("Song", batch_size=2)
+        response = search(*[(f"Song ({n} song)", "") for n in range(4)])
+        assert resolver.rank(response) == ["Song (0 song)", "Song (1 song)"]
+        assert resolver.rank(response) == ["Song (2 song)", "Song (3 song)"]
+        assert resolver.rank(response) == []
+
+class TestResolution:
+    def test_confident_match_stops_the_queries(self):
+        resolver = WikipediaResolver("Midnight City", "M83")
+        queries = resolver.queries(["Midnight City M83 song", "Midnight City song", "Midnight City"])
+        assert next(queries) == "Midnight City M83 song"
+        resolver.rank(search(("Hurry Up, We're Dreaming", "album by M83"), ("Midnight City (M83 song)", "")))
+        resolver.add_pages({"query": {
+            "redirects": [{"from": "Midnight City (M83 song)", "to": "Midnight City (song)"}],
+            "pages": [song_page("Hurry Up, We're Dreaming", "An album by M83."),
+                      song_page("Midnight City (song)", "\"Midnight City\" is a song by M83.", WIKITEXT)],
+        }})
+        assert resolver.confident and list(queries) == []
+        assert resolver.match["title"] == "Midnight City (song)"
+        assert resolver.match["infobox"]["genre"].startswith("Synth-pop")
+
+    def test_uncertain_match_is_kept_while_searching_on(self):
+        resolver = WikipediaResolver("Midnight City", "M83")
+        resolver.rank(search(("Midnight City (disambiguation)", ""), ("Midnight City (song)", ""),
+                             ("Hurry Up, We're Dreaming", "album")))
+        resolver.add_pages({"query": {"pages": [
+            {"title": "Midnight City (song)", "missing": True},
+            song_page("Hurry Up, We're Dreaming", "An album by M83."),
+        ]}})
+        assert not resolver.confident
+        assert resolver.match["title"] == "Hurry Up, We're Dreaming"
+
+    def test_same_title_by_another_artist_is_not_confident(self):
+        resolver = WikipediaResolver("Midnight City", "M83")
+        resolver.rank(search(("Midnight City (song)", "")))
+        resolver.add_pages({"query": {
+            "normalized": [{"from": "Midnight City (song)", "to": "Midnight City (song)"}],
+            "pages": [song_page("Midnight City (song)", "\"Midnight City\" is a 1980 song by The Other Band.")],
+        }})
+        assert not resolver.confident and resolver.match["title"] == "Midnight City (song)"
+
+    def test_non_music_and_disambiguation_pages_are_skipped(self):
+        resolver = WikipediaResolver("Midnight")
+        resolver.rank(search(("Midnight", ""), ("Midnight (album)", "")))
+        resolver.add_pages({"query": {"pages": [
+            song_page("Midnight", "Midnight is the transition between days."),
+            dict(song_page("Midnight (album)", "Midnight may refer to an album."),
+                 pageprops={"disambiguation": ""}),
+        ]}})
+        assert resolver.match is None
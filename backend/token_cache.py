@@ -0,0 +1,202 @@
+"""
+Verified-credential cache for bearer tokens and API keys
+A credential seen before costs one SHA-256 and a dict lookup instead of a signature verification
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Upper bound on how long a verified token is trusted without re-verifying;
+# tokens are also dropped at their own "exp"
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "1800"))
+
+
+def credential_digest(credential: str) -> bytes:
+    """SHA-256 of a token or key; raw credentials are never kept in memory"""
+    return hashlib.sha256(credential.encode("utf-8")).digest()
+
+
+class TokenRevoked(Exception):
+    """The token was revoked before it expired"""
+
+
+class VerifiedTokenCache:
+    """Thread-safe LRU of verified tokens, keyed by their digest
+
+    Each entry holds what verification produced (e.g. the subject) and
+    expires with the token. Hooks act at once on every worker thread:
+    invalidate() forgets a token so it is verified again, invalidate_subject()
+    forgets all of a user's tokens, and revoke() rejects a token until it
+    expires even though its signature is valid.
+
+    Revocations are kept in ``revocations`` when given (a store with
+    revoke(), revoked_until() and clear_revoked(), e.g.
+    rate_limit_store.SQLiteStorage), so a token revoked in one worker process
+    is rejected by all of them from its next use: every lookup then also
+    reads the store. Without one they only reach this process.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, max_ttl: float = TOKEN_CACHE_MAX_TTL,
+                 revocations: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.revocations = revocations
+        self._entries: "OrderedDict[bytes, Tuple[float, Optional[str], Any]]" = OrderedDict()
+        self._subjects: Dict[str, Set[bytes]] = {}
+        self._revoked: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, digest: bytes) -> None:
+        _, subject, _ = self._entries.pop(digest)
+        if subject is not None:
+            digests = self._subjects[subject]
+            digests.discard(digest)
+            if not digests:
+                del self._subjects[subject]
+
+    def get(self, token: str) -> Optional[Any]:
+        """The cached verification result, or None if the token must be verified
+
+        Raises TokenRevoked for a revoked, unexpired token.
+        """
+        digest = credential_digest(token)
+        now = time.time()
+        if self.revocations is not None:
+            revoked_until = self.revocations.revoked_until(digest)
+            if revoked_until is not None and revoked_until > now:
+                self.invalidate(token)
+                raise TokenRevoked()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[2]
+                self._drop(digest)
+            self.misses += 1
+            revoked_until = self._revoked.get(digest)
+            if revoked_until is not None:
+                if revoked_until > now:
+                    raise TokenRevoked()
+                del self._revoked[digest]
+            return None
+
+    def put(self, token: str, value: Any, subject: Optional[str] = None,
+            expires_at: Optional[float] = None) -> None:
+        """Remember a verified token until ``expires_at`` (its "exp"), at most max_ttl"""
+        now = time.time()
+        expires = now + self.max_ttl
+        if expires_at is not None:
+            expires = min(expires, float(expires_at))
+        if expires <= now or self.max_entries <= 0:
+            return
+        digest = credential_digest(token)
+        with self._lock:
+            if digest in self._revoked:
+                return
+            if digest in self._entries:
+                self._drop(digest)
+            while len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[digest] = (expires, subject, value)
+            if subject is not None:
+                self._subjects.setdefault(subject, set()).add(digest)
+
+    def invalidate(self, token: str) -> bool:
+        """Forget a token; the next use verifies it again"""
+        digest = credential_digest(token)
+        with self._lock:
+            if digest not in self._entries:
+                return False
+            self._drop(digest)
+            return True
+
+    def invalidate_subject(self, subject: str) -> int:
+        """Forget every cached token of ``subject``; returns how many"""
+        with self._lock:
+            digests = list(self._subjects.get(subject, ()))
+            for digest in digests:
+                self._drop(digest)
+            return len(digests)
+
+    def revoke(self, token: str, expires_at: Optional[float] = None) -> None:
+        """Reject ``token`` until ``expires_at`` (its "exp"), however valid its signature"""
+        digest = credential_digest(token)
+        until = float(expires_at) if expires_at is not None else time.time() + self.max_ttl
+        if self.revocations is not None:
+            self.revocations.revoke(digest, until)
+        with self._lock:
+            if digest in self._entries:
+                self._drop(digest)
+            now = time.time()
+            for expired in [d for d, t in self._revoked.items() if t <= now]:
+                del self._revoked[expired]
+            self._revoked[digest] = until
+
+    def clear(self) -> None:
+        """Forget every entry and revocation, in the shared store as well"""
+        if self.revocations is not None:
+            self.revocations.clear_revoked()
+        with self._lock:
+            self._entries.clear()
+            self._subjects.clear()
+            self._revoked.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revoked": len(self._revoked),
+        }
+
+
+class ApiKeySet:
+    """Accepted API keys, held as digests
+
+    Checking a key is one SHA-256 and a set lookup however many keys are
+    configured. Only digests of the presented key are compared, so timing
+    reveals nothing usable about the accepted keys.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._digests: Set[bytes] = {credential_digest(key) for key in keys if key}
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def identity(self, key: Optional[str]) -> Optional[str]:
+        """Stable, non-secret name of an accepted key, or None"""
+        if not key:
+            return None
+        digest = credential_digest(key)
+        return digest.hex()[:12] if digest in self._digests else None
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        return self.identity(key) is not None
+
+    def add(self, key: str) -> None:
+        self._digests.add(credential_digest(key))
+
+    def revoke(self, key: str) -> bool:
+        """Stop accepting ``key`` immediately"""
+        digest = credential_digest(key)
+        if digest not in self._digests:
+            return False
+        self._digests.discard(digest)
+        return True
@@ -0,0 +1,252 @@
+"""
+Wikipedia song page resolution from ranked search candidates
+One search and one batched lead-section and infobox request per query instead of full articles
+"""
+
+import html
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from research_cache import normalize
+
+# Search results ranked per query; snippets are small, so more results cost little
+WIKIPEDIA_SEARCH_LIMIT = int(os.getenv("WIKIPEDIA_SEARCH_LIMIT", "10"))
+# Best-ranked candidates whose lead sections are fetched together per query
+WIKIPEDIA_BATCH_SIZE = int(os.getenv("WIKIPEDIA_BATCH_SIZE", "4"))
+
+# Words that mark a Wikipedia page as being about music
+MUSIC_INDICATORS = ['song', 'album', 'single', 'track', 'music', 'band', 'artist']
+
+# Plain-text extracts mark section headings as "== Heading =="
+_SECTION_HEADING = re.compile(r'\n+==')
+_TAG = re.compile(r'<[^>]+>')
+_QUALIFIER = re.compile(r'\s*\(([^()]*)\)\s*$')
+_SONG_INFOBOX = re.compile(r'\{\{\s*infobox[ _]+(song|single|musical composition)\b', re.IGNORECASE)
+_INFOBOX_START = re.compile(r'\{\{\s*infobox[ _]', re.IGNORECASE)
+_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+_REF = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+_LINK = re.compile(r'\[\[(?:[^|\]]*\|)?([^\]]*)\]\]')
+_TEMPLATE = re.compile(r'\{\{([^{}]*)\}\}')
+_YEAR = re.compile(r'\b(1[89]\d\d|20\d\d)\b')
+
+
+def lead_section(extract: str) -> str:
+    """The introduction of a plain-text Wikipedia extract"""
+    return _SECTION_HEADING.split(extract, 1)[0].strip()
+
+
+def search_params(query: str) -> Dict[str, Any]:
+    """Full-text search returning titles and snippets only"""
+    return {
+        'action': 'query',
+        'list': 'search',
+        'srsearch': query,
+        'srlimit': WIKIPEDIA_SEARCH_LIMIT,
+        'srprop': 'snippet',
+        'format': 'json',
+        'formatversion': 2,
+    }
+
+
+def page_params(titles: List[str]) -> Dict[str, Any]:
+    """Lead-section extract, URL and section-0 wikitext (the infobox) of several pages at once"""
+    return {
+        'action': 'query',
+        'prop': 'extracts|info|pageprops|revisions',
+        'exintro': 1,
+        'explaintext': 1,
+        'exlimit': 'max',
+        'inprop': 'url',
+        'ppprop': 'disambiguation',
+        'rvprop': 'content',
+        'rvslots': 'main',
+        'rvsection': 0,
+        'redirects': 1,
+        'titles': '|'.join(titles),
+        'format': 'json',
+        'formatversion': 2,
+    }
+
+
+def _top_level_split(text: str, separator: str = '|') -> List[str]:
+    """Split on ``separator`` outside nested {{templates}} and [[links]]"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth = max(0, depth - 1)
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _plain(value: str) -> str:
+    """Wikitext value as plain text: links unwrapped, list templates joined"""
+    value = _REF.sub('', _COMMENT.sub('', value))
+    value = _LINK.sub(r'\1', value)
+    # Innermost templates first: {{hlist|a|b}} -> "a, b"; named arguments are dropped
+    while True:
+        replaced = _TEMPLATE.sub(
+            lambda m: ', '.join(arg.strip() for arg in m.group(1).split('|')[1:] if '=' not in arg), value
+        )
+        if replaced == value:
+            break
+        value = replaced
+    value = re.sub(r"'{2,}|^[ \t]*\*[ \t]*", '', value, flags=re.MULTILINE)
+    return re.sub(r'\s*\n\s*', ', ', value.strip()).strip(' ,')
+
+
+def infobox_fields(wikitext: str) -> Dict[str, str]:
+    """{field: plain text} of the first infobox in ``wikitext``"""
+    match = _INFOBOX_START.search(wikitext or '')
+    if match is None:
+        return {}
+    depth, end = 0, len(wikitext)
+    for i in range(match.start(), len(wikitext) - 1):
+        pair = wikitext[i:i + 2]
+        if pair == '{{':
+            depth += 1
+        elif pair == '}}':
+            depth -= 1
+            if depth == 0:
+                end = i
+                break
+    fields = {}
+    for part in _top_level_split(wikitext[match.end():end])[1:]:
+        key, sep, value = part.partition('=')
+        if sep and key.strip():
+            fields[key.strip().lower()] = _plain(value)
+    return fields
+
+
+def infobox_metadata(fields: Dict[str, str]) -> Dict[str, Any]:
+    """Genre, year, album and label from infobox fields, in the regex extractor's format"""
+    metadata = {}
+    for field in ('genre', 'album', 'label'):
+        value = fields.get(field, '').lower()
+        if field != 'album':
+            # List fields: keep the first entry
+            value = value.split(',')[0].strip()
+        if 0 < len(value) < 100:
+            metadata[field] = value
+    year = _YEAR.search(fields.get('released', '') or fields.get('published', ''))
+    if year:
+        metadata['year'] = year.group(1)
+    return metadata
+
+
+class WikipediaResolver:
+    """Finds a song's Wikipedia page with as few and as small requests as possible
+
+    Search results are ranked by how well their title and snippet match the
+    song, and only the best few pages are fetched, in one request, as lead
+    section and infobox. Resolution stops at the first confident match: a
+    music page whose title is the song's and that names the artist. A music
+    page that is less certain is kept in case nothing better turns up.
+
+        resolver = WikipediaResolver(title, artist)
+        for query in resolver.queries(queries):
+            titles = resolver.rank(<search_params(query) response>)
+            if titles:
+                resolver.add_pages(<page_params(titles) response>)
+        page = resolver.match
+    """
+
+    def __init__(self, title: str, artist: str = "", batch_size: int = WIKIPEDIA_BATCH_SIZE):
+        self.title = normalize(title)
+        self.artist = normalize(artist)
+        self.batch_size = batch_size
+        self.match: Optional[Dict[str, Any]] = None
+        self.confident = False
+        self.tried = set()
+        self._batch: List[str] = []
+
+    def queries(self, queries: Iterable[str]) -> Iterator[str]:
+        """``queries`` until a confident match is found"""
+        for query in queries:
+            if self.confident:
+                return
+            yield query
+
+    def score(self, page_title: str, snippet: str = "") -> Optional[float]:
+        """How likely a search result is the song's page; None if it cannot be"""
+        qualifier = _QUALIFIER.search(page_title)
+        base = normalize(page_title[:qualifier.start()] if qualifier else page_title)
+        qualifier = normalize(qualifier.group(1)) if qualifier else ''
+        if 'disambiguation' in qualifier:
+            return None
+        snippet = normalize(_TAG.sub('', html.unescape(snippet)))
+
+        score = 0.0
+        if base == self.title:
+            score += 4
+        elif self.title and (self.title in base or base in self.title):
+            score += 1
+        if any(word in qualifier.split() for word in ('song', 'single')):
+            score += 3
+        elif qualifier:
+            score += 1 if any(word in qualifier for word in MUSIC_INDICATORS) else -2
+        if self.artist and (self.artist in qualifier or self.artist in snippet):
+            score += 2
+        if any(word in snippet.split() for word in MUSIC_INDICATORS):
+            score += 1
+        return score if score > 0 else None
+
+    def rank(self, data: Optional[Dict[str, Any]]) -> List[str]:
+        """The best untried candidates of a search response, best first"""
+        ranked = []
+        for position, result in enumerate(((data or {}).get('query') or {}).get('search', [])):
+            page_title = result.get('title', '')
+            if page_title in self.tried:
+                continue
+            score = self.score(page_title, result.get('snippet', ''))
+            if score is not None:
+                # Ties keep the search engine's order
+                ranked.append((-score, position, page_title))
+        self._batch = [page_title for _, _, page_title in sorted(ranked)[:self.batch_size]]
+        self.tried.update(self._batch)
+        return list(self._batch)
+
+    def add_pages(self, data: Optional[Dict[str, Any]]) -> None:
+        """Check a page_params() response's pages in rank order"""
+        query = (data or {}).get('query') or {}
+        pages = {page.get('title'): page for page in query.get('pages', [])}
+        # Requested titles may come back normalized or redirected
+        renamed = {entry['from']: entry['to'] for entry in query.get('normalized', []) + query.get('redirects', [])}
+        for requested in self._batch:
+            page_title = requested
+            while page_title in renamed:
+                page_title = renamed.pop(page_title)
+            page = pages.pop(page_title, None)
+            if page is None or page.get('missing') or 'disambiguation' in (page.get('pageprops') or {}):
+                continue
+            if self._consider(page):
+                break
+        self._batch = []
+
+    def _consider(self, page: Dict[str, Any]) -> bool:
+        """Keep a music page as the match; True once the match is confident"""
+        revisions = page.get('revisions') or [{}]
+        wikitext = ((revisions[0].get('slots') or {}).get('main') or {}).get('content', '')
+        extract = lead_section(page.get('extract', ''))
+        lead = extract.lower()
+        if not (_SONG_INFOBOX.search(wikitext) or any(indicator in lead for indicator in MUSIC_INDICATORS)):
+            return False
+        candidate = {
+            'title': page.get('title'),
+            'url': page.get('fullurl'),
+            'extract': extract,
+            'infobox': infobox_fields(wikitext),
+        }
+        qualifier = _QUALIFIER.search(page.get('title', ''))
+        base = normalize(page['title'][:qualifier.start()] if qualifier else page.get('title', ''))
+        text = normalize(extract) + ' ' + ' '.join(normalize(value) for value in candidate['infobox'].values())
+        if base == self.title and (not self.artist or self.artist in text):
+            self.match, self.confident = candidate, True
+        elif self.match is None:
+            self.match = candidate
+        return self.confident